@@ -1,20 +1,33 @@
 import streamlit as st
 import pandas as pd
 import logging
-import io
+import time
+import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from config import (
-    GL_FILE_SHEET_NAME, BANK_FILE_SHEET_NAME, OUTSTANDING_CHECK_REPORT_SHEET_NAME,
-    GL_COLUMNS_REQUIRED, GL_COLUMN_TYPES, BANK_COLUMNS_REQUIRED, BANK_COLUMN_TYPES,
-    OUTSTANDING_CHECK_COLUMN_TYPES, EXCEL_OUTPUT_FILENAME, BANK_COMPARISON_KEY_COL
+    EXCEL_OUTPUT_FILENAME, GL_TYPE_COL, CATEGORIZED_GL_SHEET_NAME,
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS
 )
-from reconciliation_core import run_full_reconciliation
-from category_gl import gl_type  # Ensures reload if updated
-from stBankGL import clean_and_prepare_gl_bank_data, rename_bank_trn_type, create_bank_comparison_key
+from reconciliation_core import run_full_reconciliation, categorize_gl_with_bank
+from category_gl import restore_categorized_gl_types
+from stMoney import money_columns_to_cents, money_columns_to_dollars
+from stReadXl import read_gl_workbook, read_bank_workbook, GL_WORKBOOK_SHEETS, BANK_WORKBOOK_SHEETS
+from stUploadCache import read_with_cache, file_content_hash
+from stExportXl import dataframe_to_bytes
+from stProfile import run_profile, write_run_profile, profile_steps_frame
 
 
 logger = logging.getLogger(__name__)
 
+# Download formats of the categorized GL: extension -> (label, mime type)
+DOWNLOAD_FORMATS = {
+    'csv': ("CSV", "text/csv"),
+    'parquet': ("Parquet", "application/vnd.apache.parquet"),
+    'xlsx': ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+EXPORT_POLL_SECONDS = 1
+
 def initialize_session_state():
     if 'gl_data' not in st.session_state:
         st.session_state.gl_data = None
@@ -24,10 +37,16 @@ def initialize_session_state():
         st.session_state.outstanding_check_data = None
     if 'categorized_gl' not in st.session_state:
         st.session_state.categorized_gl = None
+    if 'categorized_gl_upload_memo' not in st.session_state:
+        st.session_state.categorized_gl_upload_memo = None
+    if 'categorized_gl_exports' not in st.session_state:
+        st.session_state.categorized_gl_exports = None
     if 'reconciliation_excel_buffer' not in st.session_state:
         st.session_state.reconciliation_excel_buffer = None
     if 'reconciliation_results' not in st.session_state:
         st.session_state.reconciliation_results = None
+    if 'run_profiles' not in st.session_state:
+        st.session_state.run_profiles = {}
     logger.info("Session state initialized.")
 
 def display_app_header():
@@ -118,12 +137,14 @@ def tab_file_upload():
         if gl_file and bank_file:
             with st.spinner("Processing uploaded files..."):
                 try:
-                    gl_raw_df = pd.read_excel(gl_file, sheet_name=GL_FILE_SHEET_NAME, dtype=str)
-                    bank_raw_df = pd.read_excel(bank_file, sheet_name=BANK_FILE_SHEET_NAME, dtype=str)
-                    outstanding_raw_df = pd.read_excel(gl_file, sheet_name=OUTSTANDING_CHECK_REPORT_SHEET_NAME, dtype=str)
-                    gl_processed_df = gl_raw_df[GL_COLUMNS_REQUIRED].astype(GL_COLUMN_TYPES)
-                    bank_processed_df = bank_raw_df[BANK_COLUMNS_REQUIRED].astype(BANK_COLUMN_TYPES)
-                    outstanding_processed_df = outstanding_raw_df.astype(OUTSTANDING_CHECK_COLUMN_TYPES)
+                    # One streaming pass per workbook; only the required columns are read and typed.
+                    # Re-uploads of identical bytes load the typed frames from the upload cache.
+                    gl_processed_df, outstanding_processed_df = read_with_cache(gl_file, read_gl_workbook, GL_WORKBOOK_SHEETS)
+                    bank_processed_df = read_with_cache(bank_file, read_bank_workbook, BANK_WORKBOOK_SHEETS)
+                    if MONEY_IN_CENTS:
+                        gl_processed_df = money_columns_to_cents(gl_processed_df, GL_MONEY_COLUMNS)
+                        bank_processed_df = money_columns_to_cents(bank_processed_df, BANK_MONEY_COLUMNS)
+                        outstanding_processed_df = money_columns_to_cents(outstanding_processed_df, OUTSTANDING_MONEY_COLUMNS)
                     st.session_state.gl_data = gl_processed_df
                     st.session_state.bank_data = bank_processed_df
                     st.session_state.outstanding_check_data = outstanding_processed_df
@@ -155,72 +176,239 @@ def tab_categorization():
                 with st.spinner("Categorizing GL using SOP logic..."):
                     try:
                         
-                        gl_cleaned, bank_cleaned = clean_and_prepare_gl_bank_data(st.session_state.gl_data.copy(), st.session_state.bank_data.copy())
-                        bank_cleaned = rename_bank_trn_type(bank_cleaned)
-                        bank_cleaned[BANK_COMPARISON_KEY_COL] = bank_cleaned.apply(create_bank_comparison_key, axis=1)
-                        
-                        categorized_gl = gl_type(gl_cleaned, bank_cleaned)
+                        with run_profile('categorization') as profile:
+                            categorized_gl = categorize_gl_with_bank(st.session_state.gl_data, st.session_state.bank_data)
+                        save_run_profile(profile)
 
-                        # Save result in session
+                        # Save result in session; reconciliation consumes it directly, dtypes intact
                         st.session_state.categorized_gl = categorized_gl
 
-                        # Convert to Excel for download
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                            categorized_gl.to_excel(writer, sheet_name="Categorized_GL", index=False)
-                        output.seek(0)
-
                         st.success("✅ GL categorization completed successfully!")
-                        st.download_button(
-                            label="📥 Download Categorized GL (Excel)",
-                            data=output,
-                            file_name=f"gl_categorized_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                        st.info("The categorized GL is kept in memory; you can go straight to the Reconciliation tab. "
+                                "Download it only if you want to edit categories by hand and upload it there.")
                     except ValueError as ve:
                         st.error(f"❌ Required columns missing:\n{ve}")
                         logger.error(f"Column validation failed: {ve}", exc_info=True)
                     except Exception as e:
                         st.error(f"❌ An error occurred during categorization:\n{e}")
                         logger.error("Unexpected error in categorization", exc_info=True)
+        if st.session_state.categorized_gl is not None:
+            categorized_gl_downloads()
     else:
         st.info("Please upload and process both GL and Bank files first.")
 
 
+def save_run_profile(profile: dict):
+    """Keeps the latest profile of each run in the session and writes it as a JSON run report."""
+    st.session_state.run_profiles[profile['run']] = profile
+    try:
+        write_run_profile(profile)
+    except OSError as e:
+        logger.warning(f"Could not write the {profile['run']} run profile: {e}")
+
+
+def run_profile_panel():
+    """Shows the per-step wall time, rows and memory of the latest categorization and reconciliation runs."""
+    if not st.session_state.run_profiles:
+        return
+    with st.expander("📊 Run profile"):
+        for run in ('reconciliation', 'categorization'):
+            profile = st.session_state.run_profiles.get(run)
+            if profile is None:
+                continue
+            peak = f", peak RSS {profile['peak_rss_mb']:,.0f} MB" if profile['peak_rss_mb'] is not None else ""
+            st.markdown(f"**{run.capitalize()}** ({profile['started_at']}): {profile['total_seconds']:.2f}s{peak}")
+            st.dataframe(profile_steps_frame(profile), hide_index=True, use_container_width=True)
+            st.download_button(
+                label=f"📥 Download {run} profile (JSON)",
+                data=json.dumps(profile, indent=2, default=str),
+                file_name=f"{run}_profile.json",
+                mime="application/json",
+                key=f"{run}_profile_download"
+            )
+
+
+@st.cache_resource
+def get_export_executor() -> ThreadPoolExecutor:
+    """Single background worker, shared across sessions, that builds Excel downloads."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="excel-export")
+
+
+def build_categorized_gl_download(categorized_gl: pd.DataFrame, file_format: str) -> bytes:
+    """
+    Serializes the categorized GL for download, with money columns back in dollars.
+    Runs in the background worker for Excel, so it must not call Streamlit.
+
+    Args:
+        categorized_gl (pd.DataFrame): The categorized GL.
+        file_format (str): 'xlsx', 'csv' or 'parquet'.
+
+    Returns:
+        bytes: The file content.
+    """
+    start = time.perf_counter()
+    export_df = money_columns_to_dollars(categorized_gl, GL_MONEY_COLUMNS) if MONEY_IN_CENTS else categorized_gl
+    data = dataframe_to_bytes(export_df, file_format, sheet_name=CATEGORIZED_GL_SHEET_NAME)
+    logger.info(f"Categorized GL {file_format} download built in {time.perf_counter() - start:.2f}s ({len(data) / 1024 ** 2:.1f} MB).")
+    return data
+
+
+def get_categorized_gl_exports() -> dict:
+    """
+    Returns the download cache of the current categorized GL, starting a new one
+    when the categorized frame has been replaced (e.g. categorization ran again).
+    """
+    exports = st.session_state.categorized_gl_exports
+    if exports is None or exports['frame'] is not st.session_state.categorized_gl:
+        exports = {
+            'frame': st.session_state.categorized_gl,
+            'stamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+            'files': {},
+            'pending': None,
+        }
+        st.session_state.categorized_gl_exports = exports
+    return exports
+
+
+def excel_build_status():
+    """Polls the background Excel build and reruns the app once it has finished."""
+    exports = get_categorized_gl_exports()
+    future = exports['pending']
+    if future is None or not future.done():
+        st.caption("⏳ Building the Excel workbook in the background...")
+        return
+    exports['pending'] = None
+    try:
+        exports['files']['xlsx'] = future.result()
+    except Exception as e:
+        exports['error'] = str(e)
+        logger.error("Categorized GL Excel build failed", exc_info=True)
+    st.rerun()
+
+
+def categorized_gl_downloads():
+    """
+    Optional downloads of the categorized GL. Nothing is serialized until the user asks:
+    CSV and Parquet are built on request, the Excel workbook in a background worker.
+    Built files are kept until the categorized frame changes.
+    """
+    exports = get_categorized_gl_exports()
+    categorized_gl = exports['frame']
+    st.markdown("#### 📥 Download Categorized GL (optional)")
+    columns = st.columns(len(DOWNLOAD_FORMATS))
+    for column, (file_format, (label, mime)) in zip(columns, DOWNLOAD_FORMATS.items()):
+        with column:
+            if file_format in exports['files']:
+                st.download_button(
+                    label=f"📥 Download {label}",
+                    data=exports['files'][file_format],
+                    file_name=f"gl_categorized_{exports['stamp']}.{file_format}",
+                    mime=mime,
+                    key=f"download_categorized_gl_{file_format}"
+                )
+            elif file_format == 'xlsx' and exports['pending'] is not None:
+                st.fragment(excel_build_status, run_every=EXPORT_POLL_SECONDS)()
+            elif st.button(f"Prepare {label}", key=f"prepare_categorized_gl_{file_format}"):
+                if file_format == 'xlsx':
+                    exports.pop('error', None)
+                    exports['pending'] = get_export_executor().submit(build_categorized_gl_download, categorized_gl, file_format)
+                else:
+                    with st.spinner(f"Building {label}..."):
+                        exports['files'][file_format] = build_categorized_gl_download(categorized_gl, file_format)
+                st.rerun()
+    if exports.get('error'):
+        st.error(f"❌ Excel download could not be built: {exports['error']}")
+
+
+def load_categorized_gl_upload(uploaded_file) -> tuple[pd.DataFrame, bool]:
+    """
+    Returns the parsed categorized GL upload, parsing it only once per upload.
+
+    Streamlit reruns the whole script on every widget interaction, so the parsed frame
+    is memoized in session state against the upload's file_id. A new file_id with the
+    same content hash (the same file uploaded again) reuses the parsed frame too.
+    The upload is retyped like the in-memory categorized GL (GL column types, money in cents).
+
+    Args:
+        uploaded_file: The Streamlit UploadedFile of the categorized GL.
+
+    Returns:
+        tuple[pd.DataFrame, bool]: The parsed GL and whether it was parsed in this rerun.
+    """
+    memo = st.session_state.categorized_gl_upload_memo
+    if memo is not None and memo['file_id'] == uploaded_file.file_id:
+        return memo['df'], False
+
+    content_hash = file_content_hash(uploaded_file)
+    if memo is not None and memo['hash'] == content_hash:
+        memo['file_id'] = uploaded_file.file_id
+        return memo['df'], False
+
+    start = time.perf_counter()
+    df = restore_categorized_gl_types(pd.read_excel(uploaded_file, dtype=str))
+    if MONEY_IN_CENTS:
+        df = money_columns_to_cents(df, GL_MONEY_COLUMNS)
+    parse_seconds = time.perf_counter() - start
+    st.session_state.categorized_gl_upload_memo = {
+        'file_id': uploaded_file.file_id, 'hash': content_hash, 'df': df, 'parse_seconds': parse_seconds
+    }
+    logger.info(f"Categorized GL upload '{uploaded_file.name}' parsed in {parse_seconds:.2f}s ({len(df)} rows).")
+    return df, True
+
+
 def tab_reconciliation():
     st.markdown('<div class="section-header"><h2>⚖️ Reconciliation</h2></div>', unsafe_allow_html=True)
 
-    st.markdown("#### 📂 Upload Categorized GL File")
+    st.markdown("#### 📂 Categorized GL")
+    if st.session_state.categorized_gl is not None:
+        st.info(
+            f"Using the categorized GL from the Categorization tab ({len(st.session_state.categorized_gl):,} rows). "
+            "Upload a file below only if you have edited categories by hand."
+        )
     categorized_gl_file = st.file_uploader(
-        "Upload your categorized GL file (Excel format with 'Type' column)",
+        "Optional: upload a hand-edited categorized GL file (Excel format with 'Type' column)",
         type=['xlsx'],
         key="categorized_gl_upload",
-        help="Ensure the GL file is already categorized before uploading."
+        help="Only needed when categories were edited outside the app; otherwise the categorized GL is used directly."
     )
 
+    # The in-memory result of gl_type keeps its dtypes; an upload replaces it only while it is present
+    categorized_gl = st.session_state.categorized_gl
     if categorized_gl_file:
         try:
-            df = pd.read_excel(categorized_gl_file, dtype=str)
-            if "Type" not in df.columns:
+            start = time.perf_counter()
+            df, parsed = load_categorized_gl_upload(categorized_gl_file)
+            load_ms = (time.perf_counter() - start) * 1000
+            if GL_TYPE_COL not in df.columns:
                 st.error("❌ 'Type' column not found in uploaded GL file. Reconciliation requires it.")
                 return
-            st.session_state.categorized_gl = df
-            st.success("✅ Categorized GL uploaded successfully!")
+            categorized_gl = df
+            st.success("✅ Hand-edited categorized GL uploaded successfully! It will be used for reconciliation.")
+            parse_seconds = st.session_state.categorized_gl_upload_memo['parse_seconds']
+            if parsed:
+                st.caption(f"⏱️ Parsed {len(df):,} rows in {parse_seconds:.2f}s.")
+            else:
+                st.caption(f"⏱️ Reused the parsed upload: {load_ms:.1f} ms this rerun (initial parse took {parse_seconds:.2f}s).")
         except Exception as e:
             st.error(f"❌ Failed to read uploaded file: {str(e)}")
             return
 
-    if st.session_state.categorized_gl is not None and st.session_state.bank_data is not None:
+    if categorized_gl is not None and st.session_state.bank_data is not None:
         if st.button("⚙️ Run Reconciliation"):
             with st.spinner("Running reconciliation..."):
                 try:
-                    excel_buffer = run_full_reconciliation(
-                        st.session_state.categorized_gl,
-                        st.session_state.bank_data,
-                        st.session_state.outstanding_check_data
-                    )
+                    with run_profile('reconciliation') as profile:
+                        excel_buffer = run_full_reconciliation(
+                            categorized_gl,
+                            st.session_state.bank_data,
+                            st.session_state.outstanding_check_data
+                        )
+                    save_run_profile(profile)
                     st.session_state.reconciliation_excel_buffer = excel_buffer
-                    st.success("✅ Reconciliation completed!")
+                    if excel_buffer is None:
+                        st.error("❌ Reconciliation failed while building the report. See the log for details.")
+                    else:
+                        st.success("✅ Reconciliation completed!")
                 except Exception as e:
                     st.error(f"❌ Reconciliation failed: {str(e)}")
                     logger.error("Reconciliation failed", exc_info=True)
@@ -232,8 +420,9 @@ def tab_reconciliation():
                 file_name=EXCEL_OUTPUT_FILENAME,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+        run_profile_panel()
     else:
-        st.info("Please upload the categorized GL file and process Bank file before running reconciliation.")
+        st.info("Please run GL categorization (or upload a categorized GL file) and process the Bank file before running reconciliation.")
 
 def display_footer():
     st.markdown("---")
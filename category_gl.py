@@ -7,16 +7,192 @@ from config import (BANK_COMPARISON_KEY_COL, BANK_TRN_TYPE_COL, GL_TYPE_COL,
                     PAYROLL_JOURNAL_SEARCH,AUTODEBIT_JOURNAL_SEARCH,EFTPS_JOURNAL_SEARCH,
                     VIBEE_JOURNAL_SEARCH,STRIPE_JOURNAL_SEARCH,SQUARE_DESC_JOURNAL_SEARCH,
                     PARTYNAME_COL,TICKET_PARTY_SEARCH1,TICKET_PARTY_SEARCH2,BATCHNAME_COL,
-                    AR_BATCH_SEARCH,WIRE_BATCH_SEARCH,BRINKS_JOURNAL_SEARCH, TRANS_CHECK_SEARCH2, TRANS_CHECK_SEARCH1) 
+                    AR_BATCH_SEARCH,WIRE_BATCH_SEARCH,BRINKS_JOURNAL_SEARCH, TRANS_CHECK_SEARCH2, TRANS_CHECK_SEARCH1,
+                    GL_TYPE_DEDUPE_INPUTS, GL_COLUMN_TYPES) 
+from stKeywordMatch import build_keyword_hit_codes, keyword_mask
+from stProfile import profiled
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def gl_type(gl:pd.DataFrame, bank:pd.DataFrame) -> pd.DataFrame:
+GL_NO_CATEGORY = 'NoCategory'
+
+# SOP rules for GL rows that have no bank based type, in priority order.
+# Each rule is (Type, conditions); a row gets the Type of the first rule whose
+# conditions all hold. A condition is (columns, operation, value) and holds when
+# the operation is true on any of the listed columns. 'contains' conditions take
+# a list of keywords and hold when any of them occurs (case-insensitive).
+GL_TYPE_RULES = [
+    (BANK_CATEGORY_LIST[3], [ #index 3 has type Checks
+        ((GL_TRANSACTION_NUMBER_COL,), 'max_length', 9),
+        ((GL_TRANSACTION_NUMBER_COL,), 'startswith', (TRANS_CHECK_SEARCH1, TRANS_CHECK_SEARCH2)),
+    ]),
+    (BANK_CATEGORY_LIST[6], [ #index 6 holds LN ACH
+        ((GL_TRANSACTION_NUMBER_COL,), 'startswith', (ACH_TRANSNO_SEARCH,)),
+    ]),
+    (BANK_CATEGORY_LIST[5], [ #index 5 holds interest
+        ((JOURNAL_COL,), 'contains', [ZBA_JOURNAL_SEARCH]),
+        ((DESCRIPTION_COL,), 'contains', [INTEREST_DESC_SEARCH]),
+    ]),
+    (BANK_CATEGORY_LIST[15], [ #index 15 holds ZBA
+        ((JOURNAL_COL,), 'contains', [ZBA_JOURNAL_SEARCH]),
+    ]),
+    (BANK_CATEGORY_LIST[8], [((JOURNAL_COL,), 'contains', [PAYROLL_JOURNAL_SEARCH])]), #index 8 holds payroll
+    (BANK_CATEGORY_LIST[1], [((JOURNAL_COL,), 'contains', [AUTODEBIT_JOURNAL_SEARCH])]), #index 1 holds autodebit
+    (BANK_CATEGORY_LIST[4], [((JOURNAL_COL,), 'contains', [EFTPS_JOURNAL_SEARCH])]), #index 4 holds eftps
+    (BANK_CATEGORY_LIST[13], [((JOURNAL_COL,), 'contains', [VIBEE_JOURNAL_SEARCH])]), #index 13 holds vibee
+    (BANK_CATEGORY_LIST[11], [((JOURNAL_COL,), 'contains', [STRIPE_JOURNAL_SEARCH])]), #index 11 holds stripe
+    (BANK_CATEGORY_LIST[2], [((JOURNAL_COL,), 'contains', [BRINKS_JOURNAL_SEARCH])]), #index 2 holds brinks
+    (BANK_CATEGORY_LIST[10], [ #index 10 holds square
+        ((JOURNAL_COL, DESCRIPTION_COL), 'contains', [SQUARE_DESC_JOURNAL_SEARCH]),
+    ]),
+    (BANK_CATEGORY_LIST[12], [ #index 12 holds ticketing
+        ((PARTYNAME_COL,), 'contains', [TICKET_PARTY_SEARCH1, TICKET_PARTY_SEARCH2]),
+    ]),
+    (BANK_CATEGORY_LIST[14], [ #index 14 holds wire
+        ((BATCHNAME_COL,), 'contains', WIRE_BATCH_SEARCH),
+    ]),
+    (BANK_CATEGORY_LIST[0], [ #index 0 holds AR
+        ((BATCHNAME_COL,), 'contains', AR_BATCH_SEARCH),
+    ]),
+]
+
+
+def compile_gl_type_rules(rules: list) -> tuple[list, dict]:
+    """
+    Compiles the declarative rule table into a form that can be evaluated directly.
+    All 'contains' keywords of a column are gathered into one keyword list, so each
+    text column is matched in a single pass; conditions keep only a bit mask into
+    that column's hit codes.
+
+    Args:
+        rules (list): Rule table in the GL_TYPE_RULES format.
+
+    Returns:
+        tuple[list, dict]: (Type, conditions) pairs with compiled condition values,
+                           and the keyword list per text column.
+    """
+    column_keywords = {}
+    for gl_category, conditions in rules:
+        for columns, operation, value in conditions:
+            if operation == 'contains':
+                for col in columns:
+                    keywords = column_keywords.setdefault(col, [])
+                    keywords.extend(k for k in value if k.lower() not in [kw.lower() for kw in keywords])
+            elif operation not in ('startswith', 'max_length'):
+                raise ValueError(f"Unknown GL type rule operation '{operation}' for '{gl_category}'.")
+
+    compiled_rules = []
+    for gl_category, conditions in rules:
+        compiled_conditions = []
+        for columns, operation, value in conditions:
+            if operation == 'contains':
+                value = {col: keyword_mask(column_keywords[col], value) for col in columns}
+            compiled_conditions.append((columns, operation, value))
+        compiled_rules.append((gl_category, compiled_conditions))
+    return compiled_rules, column_keywords
+
+
+def evaluate_gl_type_conditions(gl: pd.DataFrame, rows: np.ndarray, conditions: list, hit_codes: dict) -> np.ndarray:
+    """
+    Evaluates one compiled rule on a subset of GL rows.
+
+    Args:
+        gl (pd.DataFrame): The GL DataFrame.
+        rows (np.ndarray): Integer positions of the rows to test.
+        conditions (list): Compiled conditions of the rule.
+        hit_codes (dict): Keyword hit codes per text column, from build_keyword_hit_codes.
+
+    Returns:
+        np.ndarray: Boolean array aligned to rows, True where all conditions hold.
+    """
+    matched = np.ones(len(rows), dtype=bool)
+    for columns, operation, value in conditions:
+        # Only rows that are still candidates for this rule are tested
+        candidates = rows[matched]
+        if len(candidates) == 0:
+            break
+        holds = np.zeros(len(candidates), dtype=bool)
+        for col in columns:
+            if operation == 'contains':
+                holds |= (hit_codes[col][candidates] & value[col]) != 0
+                continue
+            values = gl[col].iloc[candidates]
+            if operation == 'startswith':
+                result = values.str.startswith(value, na=False)
+            else:
+                result = values.str.len() <= value
+            holds |= result.fillna(False).to_numpy(dtype=bool)
+        matched[matched] = holds
+    return matched
+
+
+@profiled()
+def factorize_gl_type_inputs(gl: pd.DataFrame, columns: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Factorizes the combination of the given columns into one integer code per row.
+
+    Args:
+        gl (pd.DataFrame): The GL DataFrame.
+        columns (list): Columns whose value combination identifies a row's inputs.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Code per row (0..k-1, in order of first appearance)
+                                       and the position of the first row of each code.
+    """
+    combined = np.zeros(len(gl), dtype=np.int64)
+    for col in columns:
+        col_codes, col_uniques = pd.factorize(gl[col], use_na_sentinel=False)
+        # Re-factorize after each column so the combined code stays small and cannot overflow
+        combined, combined_uniques = pd.factorize(combined * len(col_uniques) + col_codes)
+    first_positions = np.unique(combined, return_index=True)[1]
+    return combined, first_positions
+
+
+@profiled()
+def assign_gl_types(gl: pd.DataFrame, bank: pd.DataFrame) -> np.ndarray:
+    """
+    Resolves the Type of every GL row: the bank based type first, then GL_TYPE_RULES.
+
+    Args:
+        gl (pd.DataFrame): The GL DataFrame (at least the categorization input columns).
+        bank (pd.DataFrame): The bank DataFrame with comparison key and TRN TYPE.
+
+    Returns:
+        np.ndarray: Object array with the Type of each GL row.
+    """
+    # 1. Map GL transactions to bank types using transaction number
+    comparison_map = dict(zip(bank[BANK_COMPARISON_KEY_COL], bank[BANK_TRN_TYPE_COL]))
+    bank_based_type = gl[GL_TRANSACTION_NUMBER_COL].map(comparison_map).fillna(GL_NO_CATEGORY)
+    gl_types = bank_based_type.to_numpy(dtype=object, copy=True)
+    logger.info("Identified the GL Category based on the bank Transaction")
+
+    # 2. Apply the SOP rules, in priority order, to the rows without a bank based type
+    unassigned = np.flatnonzero(gl_types == GL_NO_CATEGORY)
+    compiled_rules, column_keywords = compile_gl_type_rules(GL_TYPE_RULES)
+    hit_codes = build_keyword_hit_codes(gl, column_keywords)
+    logger.info(f"Matched SOP keywords in {list(column_keywords)}")
+    for gl_category, conditions in compiled_rules:
+        if len(unassigned) == 0:
+            break
+        matched = evaluate_gl_type_conditions(gl, unassigned, conditions, hit_codes)
+        gl_types[unassigned[matched]] = gl_category
+        unassigned = unassigned[~matched]
+        logger.info(f"Filled {int(matched.sum())} rows as '{gl_category}' based on SOP")
+
+    # 3. Rows no rule matched keep NoCategory
+    return gl_types
+
+
+@profiled()
+def gl_type(gl:pd.DataFrame, bank:pd.DataFrame, dedupe_inputs: bool = GL_TYPE_DEDUPE_INPUTS) -> pd.DataFrame:
     """
     Classifies GL transactions by type using bank data and transaction patterns.
-    Adds a final type column and removes intermediate classification columns.
+    Rows without a bank based type are resolved with GL_TYPE_RULES, each rule only
+    testing the rows no earlier rule has claimed. Adds the final type column.
+    With dedupe_inputs, only the distinct combinations of the input columns are
+    categorized and the result is broadcast back to the rows.
     Throws an error log if required columns are missing.
     """
     try:
@@ -38,166 +214,16 @@ def gl_type(gl:pd.DataFrame, bank:pd.DataFrame) -> pd.DataFrame:
 
         logger.info("Starting GL type classification.")
 
-        # 1. Map GL transactions to bank types using transaction number
-        comparison_map = dict(zip(bank[BANK_COMPARISON_KEY_COL], bank[BANK_TRN_TYPE_COL]))
-        gl['BankTransaction_BasedType'] = gl[GL_TRANSACTION_NUMBER_COL].map(comparison_map).fillna('NoCategory')
-
-        
-        logger.info("Identified the GL Category based on the bank Transaction")
-
-        # 2. Classify checks by transaction number pattern
-        logger.info("Fill Checks based on the SOP")
-        gl['IsCheck'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            (gl[GL_TRANSACTION_NUMBER_COL].str.len() <= 9) &
-            (gl[GL_TRANSACTION_NUMBER_COL].str.startswith(TRANS_CHECK_SEARCH1) | gl[GL_TRANSACTION_NUMBER_COL].str.startswith(TRANS_CHECK_SEARCH2)),
-            BANK_CATEGORY_LIST[3], # index 3 has type Checks
-            '' #return empty if it is not checks
-        )
-        logger.info("Checks filled based on SOP")
-
-        # 3. Classify ACH transactions
-        logger.info("Fill ACH based on SOP")
-        gl['IsACH'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            gl[GL_TRANSACTION_NUMBER_COL].str.startswith(ACH_TRANSNO_SEARCH),
-            BANK_CATEGORY_LIST[6], #index 6 holds LN ACH
-            '' #return empty if it is not ACH checks
-        )
-        logger.info("ACH filled based on SOP")
-
-
-
-        # 4. Classify ZBA and Interest transactions
-        logger.info("Fill ZBA/Interest based on SOP")
-        gl['IsZBA/Interest'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            (gl[JOURNAL_COL].str.contains(ZBA_JOURNAL_SEARCH, case=False, na=False)) &
-            (gl[DESCRIPTION_COL].str.contains(INTEREST_DESC_SEARCH, case=False, na=False)),
-            BANK_CATEGORY_LIST[5], #index 5 holds interest,
-            np.where(
-                gl[JOURNAL_COL].str.contains(ZBA_JOURNAL_SEARCH, case=False, na=False)&
-                ~gl[DESCRIPTION_COL].str.contains(INTEREST_DESC_SEARCH, case=False, na=False),
-                BANK_CATEGORY_LIST[15], #index 5 holds ZBA,
-                ''
-            )
-        )
-        logger.info("Filled ZBA/Interest based on SOP")
-
-
-        logger.info("Fill payroll,autodebit,eftps,vibee,stripe based on SOP")
-        # 5. Classify Payroll, Autodebit, EFTPS, Vibee AR by journal name keywords
-        def categorize_transaction(text):
-            text_lower = str(text).lower()
-            if PAYROLL_JOURNAL_SEARCH in text_lower:
-                return BANK_CATEGORY_LIST[8] #index 8 holds payroll
-            elif AUTODEBIT_JOURNAL_SEARCH in text_lower:
-                return BANK_CATEGORY_LIST[1] #index 1 holds autodebit
-            elif EFTPS_JOURNAL_SEARCH in text_lower:
-                return BANK_CATEGORY_LIST[4] #index 4 holds eftps
-            elif VIBEE_JOURNAL_SEARCH  in text_lower:
-                return BANK_CATEGORY_LIST[13] #index 13 holds vibee
-            elif STRIPE_JOURNAL_SEARCH in text_lower:
-                return BANK_CATEGORY_LIST[11] #index 11 holds stripe
-            elif BRINKS_JOURNAL_SEARCH in text_lower:
-                return BANK_CATEGORY_LIST[2] #index 2 holds brinks
-            else:
-                return ''
-        gl['Is_P_AD_EF_VB_ST'] = gl[JOURNAL_COL].apply(categorize_transaction)
-
-        logger.info("Filled payroll,autodebit,eftps,vibee,stripe based on SOP")
-
-        # 6. Classify Square transactions by journal name and description
-
-        logger.info("Fill square based on SOP")
-        gl['IsSquare'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            ((gl[JOURNAL_COL].str.contains(SQUARE_DESC_JOURNAL_SEARCH, case=False, na=False)) |
-            (gl[DESCRIPTION_COL].str.contains(SQUARE_DESC_JOURNAL_SEARCH, case=False, na=False))),
-            BANK_CATEGORY_LIST[10], #index 10 holds square
-            ''
-        )
-        logger.info("Filled square based on SOP")
-
-
-        # 8. Classify Ticketing transactions by party name
-        logger.info("Fill ticketing based on SOP")
-        gl['IsTicketing'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            (gl[PARTYNAME_COL].str.contains(TICKET_PARTY_SEARCH1, case=False, na=False)) |
-            (gl[PARTYNAME_COL].str.contains(TICKET_PARTY_SEARCH2, case=False, na=False)),
-            BANK_CATEGORY_LIST[12], #index 12 holds ticketing
-            ''
-        )
-        logger.info("Filled ticketing based on SOP")
-
-        #7. Classify AR transaction based on Batch name
-        logger.info("Fill AR based on Batch name")
-        AR_Pattern = '|'.join(AR_BATCH_SEARCH)
-        gl['Is_AR'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            (gl[BATCHNAME_COL].str.contains(AR_Pattern, case=False, na=False)),
-            BANK_CATEGORY_LIST[0], #index 10 holds AR
-            ''
-        )
-        logger.info("Filled AR based on Batch name")
-
-        #8.Classify Wire transaction based on batchname with payables
-        logger.info("Fill wire based on Batch name")
-        wire_pattern = '|'.join(WIRE_BATCH_SEARCH)
-        gl['Is_Wire'] = np.where(
-            (gl['BankTransaction_BasedType'] == 'NoCategory') &
-            (gl[BATCHNAME_COL].str.contains(wire_pattern, case=False, na=False)),
-            BANK_CATEGORY_LIST[14], #index 14 holds wire
-            ''
-        )
-        logger.info("Filled wire based on Batch name")
-        # 10. Summarize all type columns into the final type column, in priority order
-        gl[GL_TYPE_COL] = np.where(
-            gl['BankTransaction_BasedType'] != 'NoCategory',
-            gl['BankTransaction_BasedType'],
-            np.where(
-                gl['IsCheck'] != '',
-                gl['IsCheck'],
-                np.where(
-                    gl['IsACH'] != '',
-                    gl['IsACH'],
-                    np.where(
-                        gl['IsZBA/Interest'] != '',
-                        gl['IsZBA/Interest'],
-                        np.where(
-                            gl['Is_P_AD_EF_VB_ST'] != '',
-                            gl['Is_P_AD_EF_VB_ST'],
-                                np.where(
-                                    gl['IsSquare'] != '',
-                                    gl['IsSquare'],
-                                    np.where(
-                                        gl['IsTicketing'] != '',
-                                        gl['IsTicketing'],
-                                        np.where(
-                                            gl['Is_Wire'] != '',
-                                            gl['Is_Wire'],
-                                            np.where(
-                                                gl['Is_AR'] != '',
-                                                gl['Is_AR'],
-                                                'NoCategory'
-                                            )
-                                        )
-                                    )
-                                )
-                            )
-                        )
-                    )
-                )
+        if dedupe_inputs and len(gl) > 0:
+            input_codes, first_positions = factorize_gl_type_inputs(gl, required_gl_cols)
+            logger.info(
+                f"Categorizing {len(first_positions)} distinct input combinations for {len(gl)} GL rows "
+                f"(compression ratio {len(gl) / len(first_positions):.1f}x)."
             )
-        # 11. Drop all intermediate type columns except the final type column
-        type_columns = [
-            'BankTransaction_BasedType', 'IsCheck', 'IsACH', 'IsZBA/Interest',
-            'Is_P_AD_EF_VB_ST','IsSquare', 'IsTicketing', 'Is_AR', 'Is_Wire'
-        ]
-        gl = gl.drop(columns=type_columns)
-
-
+            distinct_inputs = gl[required_gl_cols].iloc[first_positions]
+            gl[GL_TYPE_COL] = assign_gl_types(distinct_inputs, bank)[input_codes]
+        else:
+            gl[GL_TYPE_COL] = assign_gl_types(gl, bank)
 
         logger.info("GL type classification completed successfully.")
         
@@ -208,3 +234,17 @@ def gl_type(gl:pd.DataFrame, bank:pd.DataFrame) -> pd.DataFrame:
         error_message = str(e)
         logger.error(f"An error occurred during gl categorization:{error_message}")
 
+
+def restore_categorized_gl_types(gl: pd.DataFrame) -> pd.DataFrame:
+    """
+    Restores the column types of a categorized GL that was read back from Excel as text,
+    so a hand-edited upload reaches reconciliation typed like the in-memory result of gl_type.
+
+    Args:
+        gl (pd.DataFrame): Categorized GL read with dtype=str.
+
+    Returns:
+        pd.DataFrame: The GL with GL_COLUMN_TYPES applied to the columns it has.
+    """
+    column_types = {col: col_type for col, col_type in GL_COLUMN_TYPES.items() if col in gl.columns}
+    return gl.astype(column_types)
@@ -15,6 +15,7 @@ EXCEL_OUTPUT_FILENAME = 'financial_reconciliation_report.xlsx'
 PIVOT_SHEET_NAME = "pivot"
 GL_VS_BANK_SHEET_NAME = "GLvsBank"
 OUTSTANDING_CHECK_SHEET_NAME = "OutstandingCheck"
+CATEGORIZED_GL_SHEET_NAME = "Categorized_GL"
 
 # --- GL Columns ---
 #--- Modified as part of GL Categorization---
@@ -38,6 +39,7 @@ GL_COLUMN_TYPES = {
 
 GL_COLUMNS_TO_FILL_NA = ['Transaction Date', 'Transaction Amount', 'Party Number', 'Party Name']
 GL_TRANSACTION_NUMBER_COL = 'Transaction Number'
+GL_TRANSACTION_DATE_COL = 'Transaction Date'
 GL_ACCOUNTED_SUM_COL = 'Accounted Sum'
 GL_TYPE_COL = 'Type'
 GL_ACCOUNTED_CR_COL = 'Accounted CR'
@@ -70,6 +72,16 @@ BANK_TRN_TYPE_COL = 'TRN TYPE'
 BANK_REFERENCE_COL = 'Bank reference'
 CUSTOMER_REFERENCE_COL = 'Customer reference'
 BANK_COMPARISON_KEY_COL = 'comparsion_key'
+BANK_VALUE_DATE_COL = 'Value date'
+BANK_POST_DATE_COL = 'Post date'
+
+# --- Bank TRN TYPE fuzzy matching ---
+TRN_TYPE_MATCH_THRESHOLD = 0.80
+TRN_TYPE_NO_CATEGORY = 'NoCategory'
+# Opt-in: JSON file the learned raw TRN TYPE -> category aliases are kept in across runs, e.g. an
+# absolute path. A wrong fuzzy match stays in the file until it is edited or deleted. None keeps
+# the aliases for the current run only.
+TRN_TYPE_ALIAS_FILE = None
 
 
 # -----GL VS Bank Output Columns ------------
@@ -104,6 +116,8 @@ COMMENT_FULL_MATCH = "Full Match"
 COMMENT_PARTIAL_MATCH = "Partial Match"
 COMMENT_GL_NO_BANK_YES = "GL No,Bank yes"
 COMMENT_GL_YES_BANK_NO = "GL Yes,Bank No"
+COMMENT_AMOUNT_DATE_MATCH = "Amount/Date Match"
+COMMENT_BATCH_DEPOSIT_MATCH = "Batch Deposit Match"
 
 COMMENT_TRANS_NOT_IN_BANK = 'Transaction Number not available in bank statement'
 COMMENT_TRANS_MATCH_DIFF_AMT = 'Transaction number matched but the transacted amount is different'
@@ -112,6 +126,21 @@ COMMENT_TRANS_MATCHED = "Transaction Matched"
 GL_NO_TRANS_NUMBER = 'No_Transaction_Number'
 NO_REFERENCE_NUMBER = 'No_Reference_Number'
 
+# Collapse bank lines to one row per comparison key before matching, so the GL vs bank merge cannot fan out
+AGGREGATE_BANK_BEFORE_MATCH = False
+# Second pass over the unmatched residue: 'GL Yes,Bank No' and 'GL No,Bank yes' rows are paired
+# one-to-one by amount and date (GL transaction date vs bank value date)
+AMOUNT_DATE_MATCH_ENABLED = False
+AMOUNT_DATE_MATCH_TOLERANCE_CENTS = 0
+AMOUNT_DATE_MATCH_DAY_WINDOW = 3
+AMOUNT_DATE_MATCH_MAX_CANDIDATES = 8 # bank candidates per GL row and day offset
+# Many-to-one pass: one bank deposit of these types settles several GL receipts of the same Type
+BATCH_DEPOSIT_MATCH_ENABLED = False
+BATCH_DEPOSIT_TYPES = ['Lockbox', 'LN ACH', 'Square', 'Stripe']
+BATCH_DEPOSIT_DAY_WINDOW = 3
+BATCH_DEPOSIT_MAX_CANDIDATES = 24 # GL rows searched per deposit; meet-in-the-middle enumerates 2 x 2**12 subsets
+BATCH_DEPOSIT_TIME_BUDGET_SECONDS = 0.05 # per deposit, so a pathological day cannot stall the run
+
 
 #-----------Added as part of gl categorization--------------
 DESC_CHECK_SEARCH1 = 'manual checks'
@@ -133,6 +162,8 @@ AR_BATCH_SEARCH = ['receivable','ar','ON ACCOUNT','receipt','cash']
 WIRE_BATCH_SEARCH = ['payables','wire']
 TRANS_CHECK_SEARCH1 = '1112'
 TRANS_CHECK_SEARCH2 = '340'
+# Categorize only distinct (Transaction Number, Journal, Description, Batch, Party) combinations
+GL_TYPE_DEDUPE_INPUTS = True
 
 #---------------------------------Added as part of highlighting manual checks in outstanding checks---------------------------
 PARTY_NAME_SEARCH1 = 'manual checks'
@@ -157,6 +188,14 @@ TAB1 = "📁 File Upload"
 TAB2 = "🔄 Categorization"
 TAB3 = "⚖️ Reconciliation"
 
+#---------------Exact money representation---------------
+# When True, money columns are converted once at ingestion to int64 cents;
+# aggregation, variance and pivots run on integers and convert back to dollars at export.
+MONEY_IN_CENTS = True
+GL_MONEY_COLUMNS = ['Accounted DR', 'Accounted CR', 'Accounted Sum']
+BANK_MONEY_COLUMNS = ['Credit amount', 'Debit amount']
+OUTSTANDING_MONEY_COLUMNS = ['Amount']
+
 #---------------Excel formatting currency columns---------------
 CURRENCY_COLUMNS = [
     'GL_Accounted Sum', 'Bnk_Credit amount', 'Bnk_Debit amount', 'Bnk_Accounted Sum', 'variance', # From GL vs Bank sheet
@@ -166,3 +205,82 @@ CURRENCY_COLUMNS = [
     'Bank Sum', 'GL Sum', 'Difference' # From Difference Grid
 
 ]
+
+# Every column that holds cents in money mode and is converted back to dollars at export
+MONEY_EXPORT_COLUMNS = CURRENCY_COLUMNS + BANK_MONEY_COLUMNS
+
+#---------------Streaming workbook reader---------------
+# Cell text read as missing, the same list pd.read_excel uses by default (na_values)
+MISSING_VALUE_TEXT = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+#---------------Parsed upload cache---------------
+# Typed upload frames are cached as Parquet, keyed by file content hash and read schema.
+UPLOAD_CACHE_ENABLED = True
+UPLOAD_CACHE_DIR = '.upload_cache'
+UPLOAD_CACHE_MAX_BYTES = 2 * 1024 ** 3 # least recently used entries are evicted above this size
+
+#---------------Headless batch runner---------------
+BATCH_SUMMARY_FILENAME = 'batch_summary.json'
+BATCH_SUMMARY_WORKBOOK = 'batch_summary.xlsx'
+BATCH_WORKERS = None # worker processes for batch jobs; None uses one per CPU
+# Splitting one GL export into per-account (and optionally per-period) jobs
+BATCH_ACCOUNT_COLUMNS = ['CO', 'AU', 'Acct']
+BATCH_PERIOD_COLUMN = 'Period Name'
+# Bank map CSV: account columns, optional period column, and the files of each partition
+BATCH_MAP_BANK_FILE_COL = 'Bank file'
+BATCH_MAP_OUTSTANDING_FILE_COL = 'Outstanding file'
+
+
+#---------------Reconciliation stage cache---------------
+# Stage outputs of run_full_reconciliation are kept in memory, keyed by a hash of their inputs,
+# so a rerun only recomputes the stages whose inputs changed.
+# Used by the app; batch and CLI runs reconcile each input once and run without it.
+PIPELINE_STAGE_CACHE_ENABLED = True
+PIPELINE_STAGE_CACHE_MAX_ENTRIES = 16 # about two full runs (7 stages each)
+PIPELINE_STAGE_CACHE_MAX_BYTES = 512 * 1024 ** 2 # frames (text included) and report bytes held, across all sessions
+
+#---------------Run profiling---------------
+# Per-step wall time, rows, DataFrame memory and RSS of categorization and reconciliation runs
+RUN_PROFILE_DIR = 'run_profiles'
+RUN_PROFILE_FILENAME = 'run_profile.json' # per job in batch output folders
+RUN_PROFILE_DEEP_MEMORY = False # True also counts the bytes of text values; costs a pass over every text column per step
+
+#---------------Scaling benchmarks---------------
+# GL rows; a 5M-row GL overflows the report's Excel sheets (1,048,576 rows), so its export always fails
+BENCHMARK_SIZES = [10_000, 100_000, 1_000_000]
+BENCHMARK_HISTORY_FILE = 'benchmarks/history.jsonl'
+# A timing regressed when it is slower than the previous run of the same size by this share...
+BENCHMARK_REGRESSION_TOLERANCE = 0.20
+# ...and by at least this many seconds; shorter differences are noise
+BENCHMARK_MIN_REGRESSION_SECONDS = 0.5
+# Bank statement rows of the comparison-key case (vectorized keys vs the row-wise apply)
+BENCHMARK_COMPARISON_KEY_ROWS = 1_000_000
+# Incremental case: a generated month of this many GL rows, replayed in this many daily runs
+BENCHMARK_INCREMENTAL_ROWS = 40_000
+BENCHMARK_INCREMENTAL_DAYS = 20
+
+#---------------Out-of-core (chunked) reconciliation---------------
+# GLs too large for memory are streamed in chunks; only per-transaction sums and the few
+# GL columns the outstanding checks need are kept, with intermediates spilled to Parquet.
+CHUNKED_MEMORY_BUDGET_MB = 1024 # target peak memory of the chunk phase
+CHUNKED_PROBE_ROWS = 10_000 # first chunk, measured to size the others
+CHUNKED_MIN_ROWS = 1_000
+CHUNKED_WORKING_SET_FACTOR = 6 # working memory of a chunk (copies, categorization, groupby) / its own size
+CHUNKED_SPILL_DIR = None # parent folder of the spill files; None uses the system temp folder
+CHUNKED_SPILL_PARTITIONS = 16 # partial sums are hash-partitioned by transaction number and merged per partition
+
+#---------------SQLite reconciliation engine---------------
+# The cleaned data is bulk-loaded into SQLite and matched with indexed SQL; the database
+# can be kept as a queryable store of the run's intermediate and final tables.
+SQLITE_RESULT_FILENAME = 'reconciliation.sqlite' # result store written next to a batch job's report
+SQLITE_INSERT_BATCH_ROWS = 10_000 # rows per INSERT batch while loading
+SQLITE_CACHE_MB = 256 # page cache of the connection
+
+#---------------Incremental reconciliation---------------
+# Daily reruns of the same month keep a SQLite state of the cleaned rows and the matches per
+# key; a run cleans and matches only the rows that are new since the last one.
+INCREMENTAL_STATE_FILENAME = 'reconciliation_state.sqlite' # persisted match state kept next to a batch job's report
+INCREMENTAL_STATE_VERSION = 1 # bump when the state layout changes; older states are rebuilt
@@ -5,11 +5,20 @@ import logging
 # Import functions from other modules
 from stCreatePivot import create_bank_pivot, create_gl_pivot, create_difference_grid
 from stExportXl import write_reconciliation_summary_sheet, export_formatted_excel, get_comment_format_style
-from stBankGL import clean_and_prepare_gl_bank_data, create_bank_comparison_key, calculate_variance_and_comments, rename_bank_trn_type
+from stBankGL import (
+    clean_and_prepare_gl_bank_data, create_bank_comparison_keys, calculate_variance_and_comments, rename_bank_trn_type,
+    aggregate_bank_by_comparison_key, load_trn_type_aliases)
 from stOutstanding import (
     get_party_dimension_table, process_outstanding_bank_checks, get_new_outstanding_from_gl, 
     consolidate_outstanding_checks,update_descriptions_OST,get_manualchecks_format_style)
 from category_gl import gl_type
+from stKeyCodes import analyze_join_cardinality
+from stMoney import money_columns_to_cents, money_columns_to_dollars
+from stTimings import start_stage_clock
+from stPipeline import frame_fingerprint, run_cached_stage
+from stProfile import profiled
+from stAmountDateMatch import gl_transaction_dates, match_residue_by_amount_date
+from stBatchDepositMatch import match_batch_deposits
 
 # Import constants from config.py
 from config import (
@@ -17,180 +26,468 @@ from config import (
     GL_TYPE_COL, BANK_TRN_TYPE_COL, PIVOT_SHEET_NAME, GL_VS_BANK_SHEET_NAME,
     OUTSTANDING_CHECK_SHEET_NAME, HEADER_BG_COLOR_PIVOT, HEADER_TEXT_COLOR_PIVOT,
     DATA_CELL_BORDER_COLOR_PIVOT, HEADER_BG_COLOR_RECON, HEADER_TEXT_COLOR_RECON,
-    BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL, GL_VS_BANK_COL
+    BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL, GL_VS_BANK_COL,
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS, MONEY_EXPORT_COLUMNS,
+    AGGREGATE_BANK_BEFORE_MATCH, PIPELINE_STAGE_CACHE_ENABLED, AMOUNT_DATE_MATCH_ENABLED,
+    AMOUNT_DATE_MATCH_TOLERANCE_CENTS, AMOUNT_DATE_MATCH_DAY_WINDOW, AMOUNT_DATE_MATCH_MAX_CANDIDATES,
+    BATCH_DEPOSIT_MATCH_ENABLED, BATCH_DEPOSIT_TYPES, BATCH_DEPOSIT_DAY_WINDOW, BATCH_DEPOSIT_MAX_CANDIDATES,
+    BATCH_DEPOSIT_TIME_BUDGET_SECONDS
 )
 
 logger = logging.getLogger(__name__)
 
-def run_full_reconciliation(gl_df: pd.DataFrame, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame) -> io.BytesIO | None:
+# The GL accounted amount is summed per account, period, transaction number and type
+GL_AGGREGATE_KEYS = ['CO', 'AU', 'Acct', 'Sub Acct', 'Project', 'Period Name', GL_TRANSACTION_NUMBER_COL, GL_TYPE_COL]
+
+@profiled('categorize')
+def categorize_gl_with_bank(gl_df: pd.DataFrame, bank_df: pd.DataFrame) -> pd.DataFrame | None:
     """
-    Orchestrates the entire bank reconciliation process.
-    Performs data cleaning, matching, pivot table generation, and prepares an Excel report.
+    Cleans GL and bank data and assigns the GL Type column from the bank TRN TYPE and the SOP rules.
 
     Args:
-        gl_df (pd.DataFrame): The raw GL DataFrame.
-        bank_df (pd.DataFrame): The raw Bank DataFrame.
-        outstanding_df (pd.DataFrame): The raw Outstanding Checks DataFrame.
+        gl_df (pd.DataFrame): The typed GL DataFrame. Not modified.
+        bank_df (pd.DataFrame): The typed bank DataFrame. Not modified.
 
     Returns:
-        io.BytesIO | None: BytesIO object of the Excel report if successful, None otherwise.
+        pd.DataFrame | None: The cleaned GL with a 'Type' column, None if categorization failed.
     """
-    logger.info("Starting comprehensive reconciliation process.")
-    try:
-        # 1. Clean and prepare GL and Bank data
-        gl_cleaned, bank_cleaned = clean_and_prepare_gl_bank_data(gl_df, bank_df)
-        bank_cleaned = rename_bank_trn_type(bank_cleaned)
-        bank_cleaned[BANK_COMPARISON_KEY_COL] = bank_cleaned.apply(create_bank_comparison_key, axis=1)
-        
-        # Add Type Column in GL
-        
-        # gl_cleaned = gl_type(gl_cleaned, bank_cleaned)
-        # logger.info(f"Added '{GL_TYPE_COL}' in GL")
-
-        logger.info("GL and Bank data cleaned and prepared.")
-
-        # 2. Aggregate GL data
-        gl_cleaned[GL_ACCOUNTED_SUM_COL] = pd.to_numeric(gl_cleaned[GL_ACCOUNTED_SUM_COL], errors="coerce")
-        
-
-        gl_agg = gl_cleaned.groupby([
-            'CO', 'AU', 'Acct', 'Sub Acct', 'Project', 'Period Name',
-            GL_TRANSACTION_NUMBER_COL, GL_TYPE_COL,
-        ], as_index=False)[GL_ACCOUNTED_SUM_COL].sum()
-        gl_agg = gl_agg[gl_agg[GL_ACCOUNTED_SUM_COL] != 0].copy() # Filter out zero accounted sum
-        logger.info("GL data aggregated.")
-
-          
-        # 3. Merge GL and bank data for matching
-        matched_gl_bank = pd.merge(
-            gl_agg,
-            bank_cleaned,
-            left_on=GL_TRANSACTION_NUMBER_COL,
-            right_on=BANK_COMPARISON_KEY_COL,
-            how='outer'
-        )
-        
-        matched_gl_bank_with_comments = calculate_variance_and_comments(matched_gl_bank)
-        logger.info("GL and Bank data matched and comments generated.")
+    gl_cleaned, bank_cleaned = clean_and_prepare_gl_bank_data(gl_df.copy(), bank_df.copy())
+    bank_cleaned = rename_bank_trn_type(bank_cleaned)
+    bank_cleaned[BANK_COMPARISON_KEY_COL] = create_bank_comparison_keys(bank_cleaned)
+    return gl_type(gl_cleaned, bank_cleaned)
 
 
-        # 4. Format matched GL and bank data for export
-        matched_gl_bank_formatted = matched_gl_bank_with_comments.copy()
-        # Drop columns that are no longer needed or will be consolidated
-        matched_gl_bank_formatted.drop(columns=[BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL], errors='ignore', inplace=True)
-        
-        # Consolidate 'Type' and 'TRN TYPE' into 'Key_Type'
-        matched_gl_bank_formatted[GL_TYPE_COL] = matched_gl_bank_formatted[GL_TYPE_COL].fillna(matched_gl_bank_formatted[BANK_TRN_TYPE_COL])
-        matched_gl_bank_formatted.drop(columns=[BANK_TRN_TYPE_COL], errors='ignore', inplace=True)
+@profiled('clean')
+def clean_stage(gl_df: pd.DataFrame, bank_df: pd.DataFrame, money_in_cents: bool) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stage 'clean': converts money to cents, cleans GL and bank data, renames bank
+    TRN TYPEs and builds the bank comparison keys.
 
-        # Rename columns for clarity in the output report
-        matched_gl_bank_formatted.columns = [
-            'GL_CO', 'GL_AU', 'GL_Acct', 'GL_Sub Acct', 'GL_Project',
-            'GL_Period Name','Key_Transaction Number','Key_Type', 'GL_Accounted Sum', 'Bnk_TRN status',
-            'Bnk_Value date', 'Bnk_Credit amount', 'Bnk_Debit amount','Bnk_Time', 'Bnk_Post date', 
-            'Bnk_Comparsion_Key','Bnk_Accounted Sum','variance', 'comment'
-        ]
+    Args:
+        gl_df (pd.DataFrame): The raw GL DataFrame. Not modified.
+        bank_df (pd.DataFrame): The raw Bank DataFrame. Not modified.
+        money_in_cents (bool): Convert money columns to exact int64 cents first.
 
-        # Reorder columns for clarity in the output report
-        matched_gl_bank_formatted = matched_gl_bank_formatted.reindex(columns=GL_VS_BANK_COL, fill_value='')
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Cleaned GL and Bank DataFrames.
+    """
+    # 0. Convert money columns to exact cents (no-op for columns that already hold cents)
+    if money_in_cents:
+        gl_df = money_columns_to_cents(gl_df, GL_MONEY_COLUMNS)
+        bank_df = money_columns_to_cents(bank_df, BANK_MONEY_COLUMNS)
+        logger.info("Money columns converted to integer cents.")
 
+    # 1. Clean and prepare GL and Bank data
+    # Cleaning replaces whole columns only, so shallow copies keep the caller's frames intact
+    gl_cleaned, bank_cleaned = clean_and_prepare_gl_bank_data(gl_df.copy(deep=False), bank_df.copy(deep=False))
+    bank_cleaned = rename_bank_trn_type(bank_cleaned)
+    bank_cleaned[BANK_COMPARISON_KEY_COL] = create_bank_comparison_keys(bank_cleaned)
 
-        # Apply styling for the 'comment' column
-        styled_matched_gl_bank = matched_gl_bank_formatted.style.map(get_comment_format_style, subset=['comment']) \
-                                .set_properties(**{'border': '1px solid black', 'border-color': 'black'})
-        logger.info("Matched GL and Bank data formatted.")
+    # Add Type Column in GL
 
+    # gl_cleaned = gl_type(gl_cleaned, bank_cleaned)
+    # logger.info(f"Added '{GL_TYPE_COL}' in GL")
 
-        # 5. Process Outstanding Checks
-        # Get party dimension table
-        mrg_final_party_df = get_party_dimension_table(gl_cleaned)
-        
-        # Prepare date posted dim table
+    gl_cleaned[GL_ACCOUNTED_SUM_COL] = pd.to_numeric(gl_cleaned[GL_ACCOUNTED_SUM_COL], errors="coerce")
+    logger.info("GL and Bank data cleaned and prepared.")
+    return gl_cleaned, bank_cleaned
 
-        dateposted_req_cols = gl_cleaned[[GL_TRANSACTION_NUMBER_COL, 'Transaction Date', GL_TYPE_COL]]
-        dateposted_req_cols = dateposted_req_cols[dateposted_req_cols[GL_TYPE_COL] == 'Checks']
-        dateposted_req_cols = dateposted_req_cols[[GL_TRANSACTION_NUMBER_COL, 'Transaction Date']].drop_duplicates()
 
+@profiled('aggregate')
+def aggregate_stage(gl_cleaned: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stage 'aggregate': sums the GL accounted amount per account, period, transaction
+    number and type, dropping zero sums.
 
-        # Process existing outstanding checks against bank data
-        ost_bank_chks = process_outstanding_bank_checks(outstanding_df, bank_cleaned)
+    Args:
+        gl_cleaned (pd.DataFrame): Output of clean_stage.
 
-        # Identify new outstanding checks from GL
-        trans_not_inbank_reqcols_ost = get_new_outstanding_from_gl(matched_gl_bank_with_comments, ost_bank_chks, mrg_final_party_df, dateposted_req_cols)
+    Returns:
+        pd.DataFrame: The aggregated GL.
+    """
+    # 2. Aggregate GL data
+    gl_agg = gl_cleaned.groupby(GL_AGGREGATE_KEYS, as_index=False)[GL_ACCOUNTED_SUM_COL].sum()
+    gl_agg = gl_agg[gl_agg[GL_ACCOUNTED_SUM_COL] != 0].copy() # Filter out zero accounted sum
+    logger.info("GL data aggregated.")
+    return gl_agg
+
+
+@profiled('match')
+def match_stage(gl_agg: pd.DataFrame, bank_cleaned: pd.DataFrame, aggregate_bank: bool, money_in_cents: bool,
+                gl_dates: pd.Series | None = None,
+                amount_date_match: bool = False,
+                batch_deposit_match: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stage 'match': outer merge of the aggregated GL with the bank lines, variance and
+    comments, the passes over the unmatched rows, and the GL vs Bank sheet layout.
 
-        # Consolidate all outstanding checks and merge with dimension tables
-        ost_bank_chks_final = consolidate_outstanding_checks(
-            ost_bank_chks,
-            trans_not_inbank_reqcols_ost #,
-            # mrg_final_party_df,
-            # dateposted_req_cols
-        )
+    Args:
+        gl_agg (pd.DataFrame): Output of aggregate_stage.
+        bank_cleaned (pd.DataFrame): Output of clean_stage.
+        aggregate_bank (bool): Aggregate bank lines per comparison key before matching.
+        money_in_cents (bool): Amounts are cents; the sheet is converted back to dollars.
+        gl_dates (pd.Series | None): Transaction number -> date (see gl_transaction_dates),
+                                     needed by the passes over the unmatched rows.
+        amount_date_match (bool): Pair unmatched rows one-to-one on amount and date.
+        batch_deposit_match (bool): Match unmatched deposits with several GL rows summing to them.
 
-        #********************Added as part of new change on 18-Aug*******************
-        ost_bank_chks_manualchecks = update_descriptions_OST(ost_bank_chks_final , gl_cleaned)
-
-        styled_ost_bank_chks = ost_bank_chks_manualchecks.style \
-                        .map(get_manualchecks_format_style,subset=['Party Name']) \
-            			.set_properties(**{'border': '1px solid black', 'border-color': 'black'})
-        logger.info("Outstanding checks processed and consolidated.")
-
-        # 6. Create Pivot Tables
-        bank_pivot = create_bank_pivot(bank_cleaned)
-        gl_pivot = create_gl_pivot(gl_cleaned)
-        diff_grid = create_difference_grid(bank_pivot, gl_pivot)
-        logger.info("Pivot tables created.")
-
-        # 7. Orchestrate Excel Writing
-        output_buffer = io.BytesIO()
-        writer = pd.ExcelWriter(output_buffer, engine='xlsxwriter')
-
-        # Write the combined reconciliation summary sheet (pivot tables)
-        summary_sheet_write_status = write_reconciliation_summary_sheet(
-            writer,
-            bank_pivot,
-            gl_pivot,
-            diff_grid,
-            sheet_name=PIVOT_SHEET_NAME,
-            header_bg_color=HEADER_BG_COLOR_PIVOT,
-            header_text_color=HEADER_TEXT_COLOR_PIVOT,
-            data_cell_border_color=DATA_CELL_BORDER_COLOR_PIVOT,
-            spacing_rows = 2,
-            spacing_cols = 2,
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The matched rows with comments, and the
+        formatted GL vs Bank sheet.
+    """
+    # 3. Merge GL and bank data for matching
+    cardinality = analyze_join_cardinality(gl_agg[GL_TRANSACTION_NUMBER_COL], bank_cleaned[BANK_COMPARISON_KEY_COL])
+    logger.info(
+        f"Match cardinality: GL {cardinality['left_rows']} rows ({cardinality['left_duplicate_keys']} duplicated keys), "
+        f"bank {cardinality['right_rows']} rows ({cardinality['right_duplicate_keys']} duplicated keys), "
+        f"{cardinality['matched_keys']} matched keys, outer merge will produce {cardinality['outer_merge_rows']} rows."
+    )
+    bank_to_match = bank_cleaned
+    if aggregate_bank:
+        bank_to_match = aggregate_bank_by_comparison_key(bank_cleaned)
+        logger.info(f"Outer merge bounded to at most {len(gl_agg) + len(bank_to_match)} rows.")
+    elif cardinality['fanout_rows'] > 0:
+        logger.warning(
+            f"GL vs bank merge fans out by {cardinality['fanout_rows']} rows on keys duplicated on both sides. "
+            f"Most duplicated bank keys: {cardinality['right_duplicate_examples']}"
         )
-        if summary_sheet_write_status == False:
-            logger.error("Failed to write reconciliation summary sheet.")
-            writer.close()
-            return None
+    matched_gl_bank = pd.merge(
+        gl_agg,
+        bank_to_match,
+        left_on=GL_TRANSACTION_NUMBER_COL,
+        right_on=BANK_COMPARISON_KEY_COL,
+        how='outer'
+    )
+
+    matched_gl_bank_with_comments = calculate_variance_and_comments(matched_gl_bank)
+    matched_gl_bank_with_comments = match_unmatched_rows(matched_gl_bank_with_comments, gl_dates, list(gl_agg.columns),
+                                                         money_in_cents, amount_date_match, batch_deposit_match)
+    logger.info("GL and Bank data matched and comments generated.")
+    return matched_gl_bank_with_comments, format_gl_vs_bank_sheet(matched_gl_bank_with_comments, money_in_cents)
+
+
+def match_unmatched_rows(matched_gl_bank_with_comments: pd.DataFrame, gl_dates: pd.Series | None, gl_columns: list,
+                         money_in_cents: bool, amount_date_match: bool, batch_deposit_match: bool) -> pd.DataFrame:
+    """
+    Runs the passes over the rows the transaction number match left unmatched: one-to-one
+    amount/date pairs first, then batch deposits over what is left.
 
-        # Prepare other dataframes for export
-        #dataframes_to_export = {
-           # GL_VS_BANK_SHEET_NAME: styled_matched_gl_bank,
-           # OUTSTANDING_CHECK_SHEET_NAME: styled_ost_bank_chks
-        #}
+    Args:
+        matched_gl_bank_with_comments (pd.DataFrame): Matched rows with variance and comments.
+        gl_dates (pd.Series | None): Transaction number -> date; may be None when both passes are off.
+        gl_columns (list): Columns of the matched rows that come from the GL.
+        money_in_cents (bool): Amounts are integer cents; otherwise dollars.
+        amount_date_match (bool): Run the amount/date pass.
+        batch_deposit_match (bool): Run the batch deposit pass.
 
-        dataframes_to_export = {
-            GL_VS_BANK_SHEET_NAME: styled_matched_gl_bank,
-            OUTSTANDING_CHECK_SHEET_NAME: styled_ost_bank_chks
-        }
+    Returns:
+        pd.DataFrame: The matched rows after the passes.
+    """
+    if amount_date_match:
+        matched_gl_bank_with_comments = match_residue_by_amount_date(
+            matched_gl_bank_with_comments, gl_dates, gl_columns, money_in_cents)
+    if batch_deposit_match:
+        matched_gl_bank_with_comments = match_batch_deposits(matched_gl_bank_with_comments, gl_dates, money_in_cents)
+    return matched_gl_bank_with_comments
 
 
+def format_gl_vs_bank_sheet(matched_gl_bank_with_comments: pd.DataFrame, money_in_cents: bool) -> pd.DataFrame:
+    """
+    Lays out the matched GL and bank rows as the GL vs Bank sheet.
 
-        # Write other sheets using the same writer
-        other_sheets_export_status = export_formatted_excel(
-            dataframes_to_export,
-            writer_obj=writer,
-            header_bg_color=HEADER_BG_COLOR_RECON,
-            header_text_color=HEADER_TEXT_COLOR_RECON,
-        )
+    Args:
+        matched_gl_bank_with_comments (pd.DataFrame): Matched rows with variance and comments.
+        money_in_cents (bool): Amounts are cents; the sheet is converted back to dollars.
 
-        if other_sheets_export_status == False:
-            logger.error("Failed to export other formatted Excel sheets.")
-            writer.close()
-            return None
+    Returns:
+        pd.DataFrame: The formatted GL vs Bank sheet.
+    """
+    # 4. Format matched GL and bank data for export
+    matched_gl_bank_formatted = matched_gl_bank_with_comments.copy()
+    # Drop columns that are no longer needed or will be consolidated
+    matched_gl_bank_formatted.drop(columns=[BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL], errors='ignore', inplace=True)
+
+    # Consolidate 'Type' and 'TRN TYPE' into 'Key_Type'
+    matched_gl_bank_formatted[GL_TYPE_COL] = matched_gl_bank_formatted[GL_TYPE_COL].fillna(matched_gl_bank_formatted[BANK_TRN_TYPE_COL])
+    matched_gl_bank_formatted.drop(columns=[BANK_TRN_TYPE_COL], errors='ignore', inplace=True)
+
+    # Rename columns for clarity in the output report
+    matched_gl_bank_formatted.columns = [
+        'GL_CO', 'GL_AU', 'GL_Acct', 'GL_Sub Acct', 'GL_Project',
+        'GL_Period Name','Key_Transaction Number','Key_Type', 'GL_Accounted Sum', 'Bnk_TRN status',
+        'Bnk_Value date', 'Bnk_Credit amount', 'Bnk_Debit amount','Bnk_Time', 'Bnk_Post date',
+        'Bnk_Comparsion_Key','Bnk_Accounted Sum','variance', 'comment'
+    ]
+
+    # Reorder columns for clarity in the output report
+    matched_gl_bank_formatted = matched_gl_bank_formatted.reindex(columns=GL_VS_BANK_COL, fill_value='')
+    if money_in_cents:
+        matched_gl_bank_formatted = money_columns_to_dollars(matched_gl_bank_formatted, MONEY_EXPORT_COLUMNS)
+    logger.info("Matched GL and Bank data formatted.")
+    return matched_gl_bank_formatted
+
+
+def gl_outstanding_inputs(gl_cleaned: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    The parts of the cleaned GL the outstanding stage reads.
 
+    Args:
+        gl_cleaned (pd.DataFrame): Output of clean_stage.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: The distinct transaction number /
+        party rows, the distinct transaction dates of checks, and the transaction number and
+        description of every GL row (an outstanding check takes one row per GL line).
+    """
+    party_cols = [col for col in [GL_TRANSACTION_NUMBER_COL, 'Party Number', 'Party Name'] if col in gl_cleaned.columns]
+    party_rows = gl_cleaned[party_cols].drop_duplicates()
+
+    dateposted_req_cols = gl_cleaned[[GL_TRANSACTION_NUMBER_COL, 'Transaction Date', GL_TYPE_COL]]
+    dateposted_req_cols = dateposted_req_cols[dateposted_req_cols[GL_TYPE_COL] == 'Checks']
+    dateposted_req_cols = dateposted_req_cols[[GL_TRANSACTION_NUMBER_COL, 'Transaction Date']].drop_duplicates()
+
+    descriptions = gl_cleaned[[GL_TRANSACTION_NUMBER_COL, 'Description']]
+    return party_rows, dateposted_req_cols, descriptions
+
+
+@profiled('outstanding')
+def outstanding_stage(outstanding_df: pd.DataFrame, gl_outstanding: tuple, bank_cleaned: pd.DataFrame,
+                      matched_gl_bank_with_comments: pd.DataFrame, money_in_cents: bool) -> pd.DataFrame:
+    """
+    Stage 'outstanding': clears existing outstanding checks against the bank, adds the
+    GL checks missing from the bank and fills party names and descriptions.
+
+    Args:
+        outstanding_df (pd.DataFrame): The raw Outstanding Checks DataFrame. Not modified.
+        gl_outstanding (tuple): Output of gl_outstanding_inputs.
+        bank_cleaned (pd.DataFrame): Output of clean_stage.
+        matched_gl_bank_with_comments (pd.DataFrame): First output of match_stage.
+        money_in_cents (bool): Amounts are cents; the sheet is converted back to dollars.
+
+    Returns:
+        pd.DataFrame: The Outstanding Check sheet.
+    """
+    if money_in_cents:
+        outstanding_df = money_columns_to_cents(outstanding_df, OUTSTANDING_MONEY_COLUMNS)
+
+    # 5. Process Outstanding Checks
+    # Party rows, check dates posted and descriptions from the GL
+    party_rows, dateposted_req_cols, gl_descriptions = gl_outstanding
+
+    # Get party dimension table
+    mrg_final_party_df = get_party_dimension_table(party_rows)
+
+    # Process existing outstanding checks against bank data
+    ost_bank_chks = process_outstanding_bank_checks(outstanding_df, bank_cleaned)
+
+    # Identify new outstanding checks from GL
+    trans_not_inbank_reqcols_ost = get_new_outstanding_from_gl(matched_gl_bank_with_comments, ost_bank_chks, mrg_final_party_df, dateposted_req_cols)
+
+    # Consolidate all outstanding checks and merge with dimension tables
+    ost_bank_chks_final = consolidate_outstanding_checks(
+        ost_bank_chks,
+        trans_not_inbank_reqcols_ost #,
+        # mrg_final_party_df,
+        # dateposted_req_cols
+    )
+
+    #********************Added as part of new change on 18-Aug*******************
+    ost_bank_chks_manualchecks = update_descriptions_OST(ost_bank_chks_final , gl_descriptions)
+    if money_in_cents:
+        ost_bank_chks_manualchecks = money_columns_to_dollars(ost_bank_chks_manualchecks, MONEY_EXPORT_COLUMNS)
+    logger.info("Outstanding checks processed and consolidated.")
+    return ost_bank_chks_manualchecks
+
+
+@profiled('pivots')
+def pivots_stage(gl_cleaned: pd.DataFrame, bank_cleaned: pd.DataFrame, money_in_cents: bool) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Stage 'pivots': bank and GL pivots and their difference grid.
+
+    Args:
+        gl_cleaned (pd.DataFrame): Output of clean_stage.
+        bank_cleaned (pd.DataFrame): Output of clean_stage.
+        money_in_cents (bool): Amounts are cents; the pivots are converted back to dollars.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: Bank pivot, GL pivot and difference grid.
+    """
+    # 6. Create Pivot Tables
+    bank_pivot = create_bank_pivot(bank_cleaned)
+    gl_pivot = create_gl_pivot(gl_cleaned)
+    diff_grid = create_difference_grid(bank_pivot, gl_pivot)
+    if money_in_cents:
+        bank_pivot = money_columns_to_dollars(bank_pivot, MONEY_EXPORT_COLUMNS)
+        gl_pivot = money_columns_to_dollars(gl_pivot, MONEY_EXPORT_COLUMNS)
+        diff_grid = money_columns_to_dollars(diff_grid, MONEY_EXPORT_COLUMNS)
+    logger.info("Pivot tables created.")
+    return bank_pivot, gl_pivot, diff_grid
+
+
+@profiled('export')
+def export_stage(matched_gl_bank_formatted: pd.DataFrame, ost_bank_chks_manualchecks: pd.DataFrame,
+                 pivots: tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]) -> bytes | None:
+    """
+    Stage 'export': writes the styled report workbook.
+
+    Args:
+        matched_gl_bank_formatted (pd.DataFrame): Second output of match_stage.
+        ost_bank_chks_manualchecks (pd.DataFrame): Output of outstanding_stage.
+        pivots (tuple): Output of pivots_stage.
+
+    Returns:
+        bytes | None: The Excel report, None if a sheet could not be written.
+    """
+    bank_pivot, gl_pivot, diff_grid = pivots
+
+    # Apply styling for the 'comment' column
+    styled_matched_gl_bank = matched_gl_bank_formatted.style.map(get_comment_format_style, subset=['comment']) \
+                            .set_properties(**{'border': '1px solid black', 'border-color': 'black'})
+    styled_ost_bank_chks = ost_bank_chks_manualchecks.style \
+                    .map(get_manualchecks_format_style,subset=['Party Name']) \
+                    .set_properties(**{'border': '1px solid black', 'border-color': 'black'})
+
+    # 7. Orchestrate Excel Writing
+    output_buffer = io.BytesIO()
+    writer = pd.ExcelWriter(output_buffer, engine='xlsxwriter')
+
+    # Write the combined reconciliation summary sheet (pivot tables)
+    summary_sheet_write_status = write_reconciliation_summary_sheet(
+        writer,
+        bank_pivot,
+        gl_pivot,
+        diff_grid,
+        sheet_name=PIVOT_SHEET_NAME,
+        header_bg_color=HEADER_BG_COLOR_PIVOT,
+        header_text_color=HEADER_TEXT_COLOR_PIVOT,
+        data_cell_border_color=DATA_CELL_BORDER_COLOR_PIVOT,
+        spacing_rows = 2,
+        spacing_cols = 2,
+    )
+    if summary_sheet_write_status == False:
+        logger.error("Failed to write reconciliation summary sheet.")
         writer.close()
-        output_buffer.seek(0)
-        logger.info("Excel report generated successfully.")
+        return None
+
+    dataframes_to_export = {
+        GL_VS_BANK_SHEET_NAME: styled_matched_gl_bank,
+        OUTSTANDING_CHECK_SHEET_NAME: styled_ost_bank_chks
+    }
+
+    # Write other sheets using the same writer
+    other_sheets_export_status = export_formatted_excel(
+        dataframes_to_export,
+        writer_obj=writer,
+        header_bg_color=HEADER_BG_COLOR_RECON,
+        header_text_color=HEADER_TEXT_COLOR_RECON,
+    )
+
+    if other_sheets_export_status == False:
+        logger.error("Failed to export other formatted Excel sheets.")
+        writer.close()
+        return None
+
+    writer.close()
+    logger.info("Excel report generated successfully.")
+    return output_buffer.getvalue()
+
+
+@profiled('reconciliation')
+def run_full_reconciliation(gl_df: pd.DataFrame, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame,
+                            money_in_cents: bool = MONEY_IN_CENTS,
+                            aggregate_bank: bool = AGGREGATE_BANK_BEFORE_MATCH,
+                            amount_date_match: bool = AMOUNT_DATE_MATCH_ENABLED,
+                            batch_deposit_match: bool = BATCH_DEPOSIT_MATCH_ENABLED,
+                            stats: dict | None = None,
+                            use_stage_cache: bool = PIPELINE_STAGE_CACHE_ENABLED) -> io.BytesIO | None:
+    """
+    Orchestrates the entire bank reconciliation process.
+    Performs data cleaning, matching, pivot table generation, and prepares an Excel report.
+
+    The run is a chain of stages (clean, aggregate, match, outstanding,
+    pivots, export). Each stage result is cached under a hash of its inputs, so a
+    rerun only recomputes the stages downstream of an input that changed, e.g. only
+    outstanding and export when just the outstanding check sheet is new.
+
+    Args:
+        gl_df (pd.DataFrame): The raw GL DataFrame.
+        bank_df (pd.DataFrame): The raw Bank DataFrame.
+        outstanding_df (pd.DataFrame): The raw Outstanding Checks DataFrame.
+        money_in_cents (bool): Run amounts as exact int64 cents and convert back to dollars at export.
+        aggregate_bank (bool): Aggregate bank lines per comparison key before matching, so
+                               each GL row matches at most one bank row.
+        amount_date_match (bool): Pair the rows left unmatched by transaction number on amount and date.
+        batch_deposit_match (bool): Match unmatched batch deposits with the GL rows summing to them.
+        stats (dict | None): If given, filled with 'timings' (seconds per stage), 'rows'
+                             (row counts of the inputs and report sheets), 'comments'
+                             (GL vs bank rows per comment) and 'stage_cache' (hit or miss per stage).
+        use_stage_cache (bool): Reuse cached stage results of earlier runs.
+
+    Returns:
+        io.BytesIO | None: BytesIO object of the Excel report if successful, None otherwise.
+    """
+    logger.info("Starting comprehensive reconciliation process.")
+    if stats is not None:
+        stats.update(timings={}, rows={}, comments={}, stage_cache={})
+    lap = start_stage_clock(stats['timings'] if stats is not None else None)
+    cache_log = stats['stage_cache'] if stats is not None else None
+
+    def run_stage(stage, func, input_keys, params=None):
+        return run_cached_stage(stage, func, input_keys, params, enabled=use_stage_cache, cache_log=cache_log)
+
+    try:
+        # Only the root inputs are hashed; downstream stages are keyed by their upstream stage keys
+        gl_key, bank_key = frame_fingerprint(gl_df), frame_fingerprint(bank_df)
+        outstanding_key = frame_fingerprint(outstanding_df)
+        lap('fingerprint')
+
+        # The TRN TYPE aliases change the cleaned bank data, so an edited alias file is a new input
+        (gl_cleaned, bank_cleaned), clean_key = run_stage(
+            'clean', lambda: clean_stage(gl_df, bank_df, money_in_cents),
+            [gl_key, bank_key], {'money_in_cents': money_in_cents, 'trn_type_aliases': load_trn_type_aliases()})
+        lap('clean')
+
+        gl_agg, aggregate_key = run_stage('aggregate', lambda: aggregate_stage(gl_cleaned), [clean_key])
+        lap('aggregate_gl')
+
+        (matched_gl_bank_with_comments, matched_gl_bank_formatted), match_key = run_stage(
+            'match', lambda: match_stage(gl_agg, bank_cleaned, aggregate_bank, money_in_cents,
+                                         gl_transaction_dates(gl_cleaned) if amount_date_match or batch_deposit_match else None,
+                                         amount_date_match, batch_deposit_match),
+            [aggregate_key, clean_key],
+            {'aggregate_bank': aggregate_bank, 'money_in_cents': money_in_cents,
+             'amount_date_match': [AMOUNT_DATE_MATCH_TOLERANCE_CENTS, AMOUNT_DATE_MATCH_DAY_WINDOW,
+                                   AMOUNT_DATE_MATCH_MAX_CANDIDATES] if amount_date_match else None,
+             'batch_deposit_match': [BATCH_DEPOSIT_TYPES, BATCH_DEPOSIT_DAY_WINDOW, BATCH_DEPOSIT_MAX_CANDIDATES,
+                                     BATCH_DEPOSIT_TIME_BUDGET_SECONDS] if batch_deposit_match else None})
+        lap('match')
+
+        ost_bank_chks_manualchecks, outstanding_stage_key = run_stage(
+            'outstanding', lambda: outstanding_stage(outstanding_df, gl_outstanding_inputs(gl_cleaned), bank_cleaned,
+                                                     matched_gl_bank_with_comments, money_in_cents),
+            [outstanding_key, clean_key, match_key], {'money_in_cents': money_in_cents})
+        lap('outstanding')
+
+        pivots, pivots_key = run_stage('pivots', lambda: pivots_stage(gl_cleaned, bank_cleaned, money_in_cents),
+                                       [clean_key], {'money_in_cents': money_in_cents})
+        lap('pivots')
+
+        report_bytes, _ = run_stage(
+            'export', lambda: export_stage(matched_gl_bank_formatted, ost_bank_chks_manualchecks, pivots),
+            [match_key, outstanding_stage_key, pivots_key])
+        if report_bytes is None:
+            return None
+        # Each caller gets its own buffer over the cached bytes
+        output_buffer = io.BytesIO(report_bytes)
+        lap('export')
+        if stats is not None:
+            stats['rows'] = {
+                'gl_input': len(gl_df), 'bank_input': len(bank_df), 'outstanding_input': len(outstanding_df),
+                GL_VS_BANK_SHEET_NAME: len(matched_gl_bank_formatted),
+                OUTSTANDING_CHECK_SHEET_NAME: len(ost_bank_chks_manualchecks),
+            }
+            stats['comments'] = {str(comment): int(count) for comment, count in
+                                 matched_gl_bank_formatted['comment'].value_counts(dropna=False).items()}
         return output_buffer
 
     except Exception as e:
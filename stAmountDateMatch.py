@@ -0,0 +1,275 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from config import (
+    GL_TRANSACTION_NUMBER_COL, GL_ACCOUNTED_SUM_COL, BANK_VALUE_DATE_COL, GL_TRANSACTION_DATE_COL,
+    COMMENT_GL_NO_BANK_YES, COMMENT_GL_YES_BANK_NO, COMMENT_AMOUNT_DATE_MATCH,
+    AMOUNT_DATE_MATCH_TOLERANCE_CENTS, AMOUNT_DATE_MATCH_DAY_WINDOW, AMOUNT_DATE_MATCH_MAX_CANDIDATES
+)
+from stMoney import to_cents
+
+logger = logging.getLogger(__name__)
+
+# Columns of a matched row computed from both sides; the rest belong to the GL or the bank side
+MATCH_RESULT_COLUMNS = ['variance', 'comment']
+
+
+def gl_transaction_dates(gl_rows: pd.DataFrame) -> pd.Series:
+    """
+    The date of each GL transaction number: its earliest transaction date.
+
+    Args:
+        gl_rows (pd.DataFrame): GL lines (or distinct transaction number / date rows).
+
+    Returns:
+        pd.Series: Transaction number -> datetime64; unparseable dates are dropped.
+    """
+    dates = pd.to_datetime(gl_rows[GL_TRANSACTION_DATE_COL], errors='coerce')
+    return dates.groupby(gl_rows[GL_TRANSACTION_NUMBER_COL].to_numpy()).min().dropna()
+
+
+def residue_items(matched: pd.DataFrame, positions: np.ndarray, amount_col: str, dates: pd.Series,
+                  money_in_cents: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Amounts in integer cents and dates as day numbers of some matched rows; rows
+    without an amount or a date are left out.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Row positions, amounts and days.
+    """
+    amounts = matched[amount_col].iloc[positions]
+    amounts = pd.to_numeric(amounts, errors='coerce') if money_in_cents else to_cents(amounts)
+    usable = (amounts.notna() & dates.notna()).to_numpy()
+    days = dates.to_numpy()[usable].astype('datetime64[D]').astype(np.int64)
+    return positions[usable], amounts.to_numpy()[usable].astype(np.int64), days
+
+
+def unmatched_gl_items(matched: pd.DataFrame, gl_dates: pd.Series,
+                       money_in_cents: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions, accounted sums (cents) and transaction days of the 'GL Yes,Bank No' rows."""
+    positions = np.flatnonzero((matched['comment'] == COMMENT_GL_YES_BANK_NO).to_numpy())
+    dates = matched[GL_TRANSACTION_NUMBER_COL].iloc[positions].map(gl_dates)
+    return residue_items(matched, positions, GL_ACCOUNTED_SUM_COL, dates, money_in_cents)
+
+
+def unmatched_bank_items(matched: pd.DataFrame, money_in_cents: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions, bank amounts (cents) and value days of the 'GL No,Bank yes' rows."""
+    positions = np.flatnonzero((matched['comment'] == COMMENT_GL_NO_BANK_YES).to_numpy())
+    dates = pd.to_datetime(matched[BANK_VALUE_DATE_COL].iloc[positions], errors='coerce')
+    return residue_items(matched, positions, 'Bnk Accounted Sum', dates, money_in_cents)
+
+
+def first_positions(values: np.ndarray) -> np.ndarray:
+    """Positions of the first occurrence of each distinct value."""
+    return np.unique(values, return_index=True)[1]
+
+
+def resolve_one_to_one(cand_gl: np.ndarray, cand_bank: np.ndarray, score: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Picks one-to-one pairs from scored candidates, best (lowest) scores first.
+
+    Every round accepts the candidates that are the best remaining one of both their GL
+    and their bank item, then drops the candidates of the items taken. The best
+    remaining candidate always qualifies, so each round makes progress.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: GL and bank positions of the accepted pairs.
+    """
+    order = np.lexsort((cand_bank, cand_gl, score))
+    cand_gl, cand_bank = cand_gl[order], cand_bank[order]
+    gl_taken = np.zeros(cand_gl.max() + 1 if len(cand_gl) else 0, dtype=bool)
+    bank_taken = np.zeros(cand_bank.max() + 1 if len(cand_bank) else 0, dtype=bool)
+    accepted = []
+    alive = np.arange(len(cand_gl))
+    while len(alive):
+        best_of_gl = alive[first_positions(cand_gl[alive])]
+        best_of_bank = alive[first_positions(cand_bank[alive])]
+        pairs = np.intersect1d(best_of_gl, best_of_bank, assume_unique=True)
+        accepted.append(pairs)
+        gl_taken[cand_gl[pairs]] = True
+        bank_taken[cand_bank[pairs]] = True
+        alive = alive[~(gl_taken[cand_gl[alive]] | bank_taken[cand_bank[alive]])]
+    accepted = np.sort(np.concatenate(accepted)) if accepted else np.array([], dtype=np.int64)
+    return cand_gl[accepted], cand_bank[accepted]
+
+
+def occurrence_rank(keys: np.ndarray) -> np.ndarray:
+    """Rank of each item among the items with the same key, in array order (0 for the first)."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    positions = np.arange(len(keys))
+    group_start = np.maximum.accumulate(np.where(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]], positions, 0))
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = positions - group_start
+    return rank
+
+
+def pair_equal_keys(gl_keys: np.ndarray, bank_keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs GL and bank items with equal keys one-to-one: the n-th GL item of a key
+    with the n-th bank item of that key.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Positions of the paired GL and bank items.
+    """
+    bank_order = np.argsort(bank_keys, kind='stable')
+    sorted_keys = bank_keys[bank_order]
+    start = np.searchsorted(sorted_keys, gl_keys, side='left')
+    count = np.searchsorted(sorted_keys, gl_keys, side='right') - start
+    rank = occurrence_rank(gl_keys)
+    paired = np.flatnonzero(rank < count)
+    return paired, bank_order[start[paired] + rank[paired]]
+
+
+def band_candidates(gl_keys: np.ndarray, bank_keys: np.ndarray, offsets: list, amount_span: int,
+                    tolerance: int, max_candidates: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bank candidates of each GL item within the amount tolerance, for each day offset.
+
+    Bank keys are sorted once; the bank items of one day within the tolerance are a
+    contiguous band found by two binary searches. Identical GL items start at different
+    places of their band, so they do not all compete for the same candidates.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: GL positions, bank positions and scores
+        (amount difference, then day difference) of the candidates.
+    """
+    bank_order = np.argsort(bank_keys, kind='stable')
+    sorted_keys = bank_keys[bank_order]
+    gl_rank = occurrence_rank(gl_keys)
+    cand_gl, cand_bank, cand_score = [], [], []
+    for offset in offsets:
+        day_keys = gl_keys + offset * amount_span
+        lo = np.searchsorted(sorted_keys, day_keys - tolerance, side='left')
+        count = np.searchsorted(sorted_keys, day_keys + tolerance, side='right') - lo
+        for k in range(max_candidates):
+            found = np.flatnonzero(count > k)
+            if len(found) == 0:
+                break
+            bank_positions = bank_order[lo[found] + (gl_rank[found] + k) % count[found]]
+            amount_gap = np.abs(bank_keys[bank_positions] - day_keys[found])
+            cand_gl.append(found)
+            cand_bank.append(bank_positions)
+            cand_score.append(amount_gap * (len(offsets) + 1) + abs(offset))
+    if not cand_gl:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(cand_gl), np.concatenate(cand_bank), np.concatenate(cand_score)
+
+
+def match_amount_date_candidates(gl_amounts: np.ndarray, gl_days: np.ndarray,
+                                 bank_amounts: np.ndarray, bank_days: np.ndarray,
+                                 tolerance: int = AMOUNT_DATE_MATCH_TOLERANCE_CENTS,
+                                 day_window: int = AMOUNT_DATE_MATCH_DAY_WINDOW,
+                                 max_candidates: int = AMOUNT_DATE_MATCH_MAX_CANDIDATES) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs GL and bank items one-to-one whose amounts differ by at most tolerance and
+    whose dates are at most day_window days apart.
+
+    Items are keyed on (day, amount) packed into one int64, so every lookup is a binary
+    search over sorted keys instead of a comparison with every item. Exact amounts are
+    paired first, one day offset at a time from the same day outwards (a bank line
+    clears on or after its GL date, so later dates go before earlier ones). With a
+    tolerance, the rest is paired from banded candidate lookups, closest amount first.
+
+    Args:
+        gl_amounts (np.ndarray): GL amounts in integer cents.
+        gl_days (np.ndarray): GL dates as integer day numbers.
+        bank_amounts (np.ndarray): Bank amounts in integer cents.
+        bank_days (np.ndarray): Bank dates as integer day numbers.
+        tolerance (int): Largest amount difference in cents.
+        day_window (int): Largest date difference in days.
+        max_candidates (int): Bank candidates kept per GL item and day offset in the tolerance pass.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Positions of the paired GL and bank items.
+    """
+    empty = np.array([], dtype=np.int64)
+    if len(gl_amounts) == 0 or len(bank_amounts) == 0:
+        return empty, empty
+    gl_amounts, bank_amounts = gl_amounts.astype(np.int64), bank_amounts.astype(np.int64)
+    gl_days, bank_days = gl_days.astype(np.int64), bank_days.astype(np.int64)
+
+    base_day = min(gl_days.min(), bank_days.min()) - day_window
+    base_amount = min(gl_amounts.min(), bank_amounts.min()) - tolerance
+    amount_span = int(max(gl_amounts.max(), bank_amounts.max())) + tolerance - int(base_amount) + 1
+    day_span = int(max(gl_days.max(), bank_days.max())) + day_window - int(base_day) + 1
+    if amount_span * day_span >= 2 ** 62:
+        raise ValueError("Amounts and dates span too wide a range for the composite match key.")
+    gl_keys = (gl_days - base_day) * amount_span + (gl_amounts - base_amount)
+    bank_keys = (bank_days - base_day) * amount_span + (bank_amounts - base_amount)
+
+    gl_left, bank_left = np.arange(len(gl_keys)), np.arange(len(bank_keys))
+    paired_gl, paired_bank = [], []
+
+    def take(gl_positions, bank_positions):
+        nonlocal gl_left, bank_left
+        paired_gl.append(gl_left[gl_positions])
+        paired_bank.append(bank_left[bank_positions])
+        gl_left = np.delete(gl_left, gl_positions)
+        bank_left = np.delete(bank_left, bank_positions)
+
+    offsets = sorted(range(-day_window, day_window + 1), key=lambda offset: (abs(offset), offset < 0))
+    for offset in offsets:
+        if len(gl_left) == 0 or len(bank_left) == 0:
+            break
+        take(*pair_equal_keys(gl_keys[gl_left] + offset * amount_span, bank_keys[bank_left]))
+
+    if tolerance > 0 and len(gl_left) and len(bank_left):
+        cand_gl, cand_bank, score = band_candidates(gl_keys[gl_left], bank_keys[bank_left], offsets,
+                                                    amount_span, tolerance, max_candidates)
+        if len(cand_gl):
+            take(*resolve_one_to_one(cand_gl, cand_bank, score))
+
+    return np.concatenate(paired_gl), np.concatenate(paired_bank)
+
+
+def match_residue_by_amount_date(matched: pd.DataFrame, gl_dates: pd.Series, gl_columns: list,
+                                 money_in_cents: bool,
+                                 tolerance: int = AMOUNT_DATE_MATCH_TOLERANCE_CENTS,
+                                 day_window: int = AMOUNT_DATE_MATCH_DAY_WINDOW,
+                                 max_candidates: int = AMOUNT_DATE_MATCH_MAX_CANDIDATES) -> pd.DataFrame:
+    """
+    Second matching pass over the rows the transaction number match left unmatched.
+    A 'GL Yes,Bank No' row and a 'GL No,Bank yes' row with the same amount (within
+    tolerance) and close dates (GL transaction date vs bank value date) become one row:
+    the GL row takes the bank columns, its variance is recomputed and its comment is
+    'Amount/Date Match'; the bank row is dropped.
+
+    Args:
+        matched (pd.DataFrame): Output of calculate_variance_and_comments. Not modified.
+        gl_dates (pd.Series): Transaction number -> date (see gl_transaction_dates).
+        gl_columns (list): Columns of the matched rows that come from the GL.
+        money_in_cents (bool): Amounts are integer cents; otherwise dollars.
+        tolerance (int): Largest amount difference in cents.
+        day_window (int): Largest date difference in days.
+        max_candidates (int): Bank candidates kept per GL row and day offset.
+
+    Returns:
+        pd.DataFrame: The matched rows with the amount/date pairs merged, or matched itself when none pair.
+    """
+    gl_residue, gl_amounts, gl_days = unmatched_gl_items(matched, gl_dates, money_in_cents)
+    bank_residue, bank_amounts, bank_days = unmatched_bank_items(matched, money_in_cents)
+    if len(gl_residue) == 0 or len(bank_residue) == 0:
+        return matched
+
+    gl_pos, bank_pos = match_amount_date_candidates(gl_amounts, gl_days, bank_amounts, bank_days,
+                                                    tolerance, day_window, max_candidates)
+    logger.info(f"Amount/date pass: {len(gl_pos)} pairs among {len(gl_residue)} unmatched GL "
+                f"and {len(bank_residue)} unmatched bank rows.")
+    if len(gl_pos) == 0:
+        return matched
+
+    gl_rows, bank_rows = gl_residue[gl_pos], bank_residue[bank_pos]
+    result = matched.copy()
+    bank_columns = [col for col in result.columns if col not in gl_columns and col not in MATCH_RESULT_COLUMNS]
+    for col in bank_columns:
+        values = result[col].copy()
+        values.iloc[gl_rows] = result[col].iloc[bank_rows].to_numpy()
+        result[col] = values
+    variance = result['variance'].copy()
+    variance.iloc[gl_rows] = (result[GL_ACCOUNTED_SUM_COL].iloc[gl_rows] - result['Bnk Accounted Sum'].iloc[gl_rows]).to_numpy()
+    result['variance'] = variance
+    result.iloc[gl_rows, result.columns.get_loc('comment')] = COMMENT_AMOUNT_DATE_MATCH
+    return result.drop(index=result.index[bank_rows]).reset_index(drop=True)
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import difflib
 import re
+import os
+import json
 import logging
 
 # Import constants from config.py
@@ -11,8 +13,10 @@ from config import (
     GL_ACCOUNTED_SUM_COL, BANK_COMPARISON_KEY_COL, GL_NO_TRANS_NUMBER,
     NO_REFERENCE_NUMBER, COMMENT_GL_NO_BANK_YES, COMMENT_GL_YES_BANK_NO,
     COMMENT_FULL_MATCH, COMMENT_PARTIAL_MATCH, BANK_TRN_TYPE_COL,BANK_CATEGORY_LIST,
-    DESCRIPTION_COL,DESC_CHECK_SEARCH1,DESC_CHECK_SEARCH2, DESC_TRANSNO_SEARCH1
+    DESCRIPTION_COL,DESC_CHECK_SEARCH1,DESC_CHECK_SEARCH2, DESC_TRANSNO_SEARCH1,
+    TRN_TYPE_MATCH_THRESHOLD, TRN_TYPE_NO_CATEGORY, TRN_TYPE_ALIAS_FILE, BANK_POST_DATE_COL
 )
+from stProfile import profiled
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,6 +27,11 @@ def fill_transaction_number_basedonDesc(df:pd.DataFrame,transCol:str,descCol:str
     Fills transaction number based on the description Manual checks and CK#
     This function is specifically implemented to handle check reversals
 
+    Both rules run as one vectorized stage over the rows whose transaction number
+    is empty: the CK# number (at most 9 characters) when the description mentions
+    manual checks, otherwise the REF# number, otherwise empty. Only the two columns
+    are rebuilt; the rest of the DataFrame is shared with the input, not copied.
+
     Args:
     df : Input data frame
     transCol: transaction number column
@@ -30,39 +39,36 @@ def fill_transaction_number_basedonDesc(df:pd.DataFrame,transCol:str,descCol:str
     """
     logger.info("get transaction number from CK#")
 
-    def extract_ck(desc: str) -> str:
-        lower_desc = desc.lower()
-        if descSearch1.lower() in lower_desc and descSearch2.lower() in lower_desc:
-            match = re.search(pattern, desc,flags=re.IGNORECASE)
-            if match and len(match.group(1).strip()) <= 9:
-                return match.group(1).strip()
-            return None
-            
     if descCol in df.columns and transCol in df.columns:
-        df = df.copy()
-        pattern = rf"{descSearch2}\s*(\S+)"
+        df = df.copy(deep=False)
+        ck_pattern = re.compile(rf"{descSearch2}\s*(\S+)", flags=re.IGNORECASE)
+        ref_pattern = re.compile(rf"{re.escape(descSearch3)}\s*(\S+)", flags=re.IGNORECASE)
+
         # Ensure text data
-        df[transCol] = df[transCol].fillna('').astype(str)
-        df[descCol] = df[descCol].fillna('').astype(str)
-        mask = df[transCol].isin(['', 'No_Transaction_Number']) | df[transCol].isna()
-        extracted = df.loc[mask, descCol].apply(extract_ck)
-        df.loc[mask & extracted.notna(), transCol] = extracted
-        logger.info("Completed CK# extraction and DataFrame update.")
-                
-        # Compile regex
-        pattern1 = re.compile(rf"{re.escape(descSearch3)}\s*(\S+)", flags=re.IGNORECASE)
-
-        # Function to extract transaction number
-        def extract_transaction(text: str) -> str:
-            match = pattern1.search(text)
-            return match.group(1) if match else ""
-
-        # Mask for empty / No_Transaction_Number
-        mask = df[transCol].isin(['', 'No_Transaction_Number'])
-
-        # Apply the function
-        df.loc[mask, transCol] = df.loc[mask, descCol].apply(extract_transaction)
-        logger.info("Completed REF# extraction and DataFrame update.")
+        trans_numbers = df[transCol].fillna('').astype(str)
+        descriptions = df[descCol].fillna('').astype(str)
+
+        mask = trans_numbers.isin(['', GL_NO_TRANS_NUMBER]).to_numpy()
+        empty_descriptions = descriptions[mask]
+
+        # CK# rule: manual check descriptions carrying a short CK# number
+        lower_desc = empty_descriptions.str.lower()
+        is_manual_check = (
+            lower_desc.str.contains(descSearch1.lower(), regex=False) &
+            lower_desc.str.contains(descSearch2.lower(), regex=False)
+        )
+        ck_numbers = empty_descriptions.str.extract(ck_pattern, expand=False).str.strip()
+        use_ck = is_manual_check & ck_numbers.notna() & (ck_numbers.str.len() <= 9)
+        logger.info(f"Completed CK# extraction: {int(use_ck.sum())} transaction numbers found.")
+
+        # REF# rule for the remaining empty rows; no match leaves the number empty
+        ref_numbers = empty_descriptions.str.extract(ref_pattern, expand=False).fillna('')
+        logger.info("Completed REF# extraction.")
+
+        trans_numbers[mask] = ck_numbers.where(use_ck, ref_numbers).to_numpy()
+        df[transCol] = trans_numbers
+        df[descCol] = descriptions
+        logger.info("Completed CK#/REF# DataFrame update.")
         
         return df
 
@@ -70,33 +76,43 @@ def fill_transaction_number_basedonDesc(df:pd.DataFrame,transCol:str,descCol:str
         logger.error(f"Require column '{descCol}' or '{transCol}' not found in DataFrame.")
         return df  
 
-def handle_missing_transaction_numbers(df: pd.DataFrame, col: str, tag: str) -> pd.DataFrame:
+def missing_values_mask(values: pd.Series) -> np.ndarray:
+    """Boolean mask of the missing or empty values of a column."""
+    return (values.isna() | values.eq('')).fillna(True).to_numpy(dtype=bool)
+
+def handle_missing_transaction_numbers(df: pd.DataFrame, col: str, tag: str, copy: bool = True,
+                                       start: int = 1) -> pd.DataFrame:
     """
     
     Fills missing or empty values in a specified column with a generated unique tag.
-    This function operates on a copy of the DataFrame to avoid modifying the original
+    By default this function operates on a copy of the DataFrame to avoid modifying the original
     DataFrame in-place, which is generally better for predictability and testing.
 
     Args:
         df (pd.DataFrame): The input DataFrame.
         col (str): The name of the column to process for missing values.
         tag (str): A tag prefix for the generated missing value string (e.g., "Tr").
+        copy (bool): Copy the DataFrame first. Pass False when the caller already owns
+                     the frame; the column is then replaced on df itself.
+        start (int): Number of the first generated tag. A frame cleaned in chunks
+                     passes the next free number, so tags stay unique across chunks.
 
     Returns:
-        pd.DataFrame: A new DataFrame with missing values handled.
+        pd.DataFrame: A DataFrame with missing values handled.
     """
     logger.info(f"Handling missing elements in column '{col}' with tag '{tag}'.")
-    data_copy = df.copy()
-
-
+    data_copy = df.copy() if copy else df
 
-    missing_indices = data_copy[data_copy[col].isna() | (data_copy[col] == '')].index
+    missing_mask = missing_values_mask(data_copy[col])
+    missing_count = int(missing_mask.sum())
     
-    if not missing_indices.empty:
-        logger.info(f"Found {len(missing_indices)} missing values in '{col}'. Filling them.")
-        # Generate unique missing tags for each missing value
-        for i, index in enumerate(missing_indices):
-            data_copy.at[index, col] = f"Missing {tag} No.{i + 1}"
+    if missing_count:
+        logger.info(f"Found {missing_count} missing values in '{col}'. Filling them.")
+        # Generate unique missing tags, numbered in row order
+        missing_tags = f"Missing {tag} No." + pd.Series(np.arange(start, start + missing_count)).astype(str)
+        filled_col = data_copy[col].copy()
+        filled_col[missing_mask] = missing_tags.to_numpy()
+        data_copy[col] = filled_col
     else:
         logger.info(f"No missing values found in column '{col}'.")
         
@@ -121,6 +137,63 @@ def create_bank_comparison_key(row: pd.Series) -> str:
     else:
         return row[BANK_REFERENCE_COL]
 
+def create_bank_comparison_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Column-level version of create_bank_comparison_key.
+
+    Applies the same precedence with boolean masks: Checks use 'Customer reference',
+    Wires use 'Bank reference', NONREF bank references fall back to 'Customer reference',
+    everything else uses 'Bank reference'.
+
+    Args:
+        df (pd.DataFrame): The bank DataFrame.
+
+    Returns:
+        pd.Series: The comparison key for every row, aligned to df's index.
+    """
+    trn_type = df[BANK_TRN_TYPE_COL]
+    bank_reference = df[BANK_REFERENCE_COL]
+
+    is_check = trn_type.eq(BANK_CATEGORY_LIST[3]).fillna(False).to_numpy(dtype=bool) #condition for checks
+    is_wire = trn_type.eq(BANK_CATEGORY_LIST[14]).fillna(False).to_numpy(dtype=bool) #condition for wire
+    is_nonref = bank_reference.eq("NONREF").fillna(False).to_numpy(dtype=bool)
+    use_customer_reference = is_check | (~is_wire & is_nonref)
+
+    keys = np.where(
+        use_customer_reference,
+        df[CUSTOMER_REFERENCE_COL].to_numpy(dtype=object),
+        bank_reference.to_numpy(dtype=object)
+    )
+    return pd.Series(keys, index=df.index, dtype=object)
+
+def aggregate_bank_by_comparison_key(bank_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapses the bank DataFrame to one row per comparison key, so matching GL
+    against it can never fan out on the bank side.
+
+    Credit and Debit amounts are summed, 'Value date' keeps the first date and
+    'Post date' the last; the other columns keep their first value. Columns keep
+    their original order.
+
+    Args:
+        bank_df (pd.DataFrame): The bank DataFrame with a 'comparsion_key' column.
+
+    Returns:
+        pd.DataFrame: One row per comparison key.
+    """
+    logger.info("Aggregating bank data per comparison key.")
+    amount_cols = [col for col in [BANK_CREDIT_AMOUNT_COL, BANK_DEBIT_AMOUNT_COL] if col in bank_df.columns]
+    aggregations = {col: 'first' for col in bank_df.columns if col not in amount_cols + [BANK_COMPARISON_KEY_COL]}
+    if BANK_POST_DATE_COL in aggregations:
+        aggregations[BANK_POST_DATE_COL] = 'last'
+
+    grouped = bank_df.groupby(BANK_COMPARISON_KEY_COL, sort=False, dropna=False)
+    bank_agg = grouped.agg(aggregations)
+    bank_agg[amount_cols] = grouped[amount_cols].sum(min_count=1)
+    bank_agg = bank_agg.reset_index()[list(bank_df.columns)]
+    logger.info(f"Bank data aggregated from {len(bank_df)} to {len(bank_agg)} rows.")
+    return bank_agg
+
 def filter_dataframe_by_column_values(df: pd.DataFrame, col: str, filter_list: list) -> pd.DataFrame:
     """
     Filters a DataFrame to include only rows where the specified column's value
@@ -204,24 +277,27 @@ def calculate_variance_and_comments(df: pd.DataFrame) -> pd.DataFrame:
     logger.info("Variance and comments calculation complete.")
     return data_copy
 
-def clean_and_prepare_gl_bank_data(gl_df: pd.DataFrame, bank_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+def clean_gl_data(gl_df: pd.DataFrame, missing_start: int = 1) -> tuple[pd.DataFrame, int]:
     """
-    Performs initial cleaning and preparation steps for GL and Bank DataFrames.
+    Cleans GL data: transaction numbers from the descriptions, generated numbers for the
+    rest of the missing ones, 'NA' fills and leading zeroes stripped. Every rule works
+    row by row, so a GL cleaned in chunks gives the same rows as cleaned at once.
 
     Args:
         gl_df (pd.DataFrame): The GL DataFrame.
-        bank_df (pd.DataFrame): The Bank DataFrame.
+        missing_start (int): Number of the first generated missing transaction number.
 
     Returns:
-        tuple[pd.DataFrame, pd.DataFrame]: Cleaned GL and Bank DataFrames.
+        tuple[pd.DataFrame, int]: Cleaned GL and the next free missing transaction number.
     """
-    logger.info("Starting initial cleaning and preparation of GL and Bank data.")
-
     gl_withtrans_basedonDesc = fill_transaction_number_basedonDesc(gl_df,GL_TRANSACTION_NUMBER_COL,DESCRIPTION_COL,
                                                                    DESC_CHECK_SEARCH1,DESC_CHECK_SEARCH2, DESC_TRANSNO_SEARCH1)
+    next_missing = missing_start + int(missing_values_mask(gl_withtrans_basedonDesc[GL_TRANSACTION_NUMBER_COL]).sum())
 
     # Handle missing transaction numbers in GL
-    gl_df_cleaned = handle_missing_transaction_numbers(gl_withtrans_basedonDesc, GL_TRANSACTION_NUMBER_COL, 'Tr')
+    # Skip the defensive copy when fill_transaction_number_basedonDesc already returned a frame of our own
+    gl_df_cleaned = handle_missing_transaction_numbers(gl_withtrans_basedonDesc, GL_TRANSACTION_NUMBER_COL, 'Tr',
+                                                       copy=gl_withtrans_basedonDesc is gl_df, start=missing_start)
 
     # Fill other specified GL missing columns with 'NA'
     for col in GL_COLUMNS_TO_FILL_NA:
@@ -236,64 +312,197 @@ def clean_and_prepare_gl_bank_data(gl_df: pd.DataFrame, bank_df: pd.DataFrame) -
             gl_df_cleaned[col] = gl_df_cleaned[col].astype(str).str.lstrip('0')
         else:
             logger.warning(f"Column '{col}' not found in GL data for stripping leading zeros.")
+    return gl_df_cleaned, next_missing
 
-    
+def clean_bank_data(bank_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans bank data: strips leading zeroes from the reference columns, in place.
 
+    Args:
+        bank_df (pd.DataFrame): The Bank DataFrame.
+
+    Returns:
+        pd.DataFrame: The cleaned Bank DataFrame.
+    """
     for col in [BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL]:
         if col in bank_df.columns:
             bank_df[col] = bank_df[col].astype(str).str.lstrip('0')
         else:
             logger.warning(f"Column '{col}' not found in Bank data for stripping leading zeros.")
+    return bank_df
+
+@profiled()
+def clean_and_prepare_gl_bank_data(gl_df: pd.DataFrame, bank_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Performs initial cleaning and preparation steps for GL and Bank DataFrames.
 
+    Args:
+        gl_df (pd.DataFrame): The GL DataFrame.
+        bank_df (pd.DataFrame): The Bank DataFrame.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Cleaned GL and Bank DataFrames.
+    """
+    logger.info("Starting initial cleaning and preparation of GL and Bank data.")
+    gl_df_cleaned, _ = clean_gl_data(gl_df)
+    bank_df = clean_bank_data(bank_df)
     logger.info("Initial cleaning and preparation complete.")
     return gl_df_cleaned, bank_df
 
-def rename_bank_trn_type(df: pd.DataFrame) -> pd.DataFrame:
+# Batch worker processes read the alias file but never write it
+_alias_saving_enabled = True
+
+def set_trn_type_alias_saving(enabled: bool) -> bool:
+    """
+    Enables or disables writing learned TRN TYPE aliases in this process.
+
+    Args:
+        enabled (bool): Whether rename_bank_trn_type may write the alias file.
+
+    Returns:
+        bool: The previous setting.
+    """
+    global _alias_saving_enabled
+    previous, _alias_saving_enabled = _alias_saving_enabled, enabled
+    return previous
+
+def load_trn_type_aliases(alias_file: str | None = TRN_TYPE_ALIAS_FILE) -> dict:
+    """
+    Loads the persisted raw 'TRN TYPE' -> category alias dictionary.
+
+    The file stores the category list and threshold it was built with; if either
+    differs from the current configuration the stored aliases are discarded,
+    because their fuzzy results would no longer be valid.
+
+    Args:
+        alias_file (str | None): Path to the JSON alias file. None disables persistence.
+
+    Returns:
+        dict: Mapping of raw TRN TYPE strings to their resolved value.
+    """
+    if not alias_file or not os.path.exists(alias_file):
+        return {}
+    try:
+        with open(alias_file, 'r', encoding='utf-8') as fh:
+            stored = json.load(fh)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read TRN TYPE alias file '{alias_file}': {e}. Starting with an empty alias dictionary.")
+        return {}
+
+    if stored.get('categories') != BANK_CATEGORY_LIST or stored.get('threshold') != TRN_TYPE_MATCH_THRESHOLD:
+        logger.info(f"TRN TYPE alias file '{alias_file}' was built with a different category list or threshold. Ignoring it.")
+        return {}
+    return dict(stored.get('aliases', {}))
+
+def save_trn_type_aliases(aliases: dict, alias_file: str | None = TRN_TYPE_ALIAS_FILE) -> None:
+    """
+    Persists the raw 'TRN TYPE' -> category alias dictionary as JSON.
+
+    Args:
+        aliases (dict): Mapping of raw TRN TYPE strings to their resolved value.
+        alias_file (str | None): Path to the JSON alias file. None disables persistence.
+    """
+    if not alias_file:
+        return
+    payload = {
+        'categories': BANK_CATEGORY_LIST,
+        'threshold': TRN_TYPE_MATCH_THRESHOLD,
+        'aliases': dict(sorted(aliases.items())),
+    }
+    tmp_file = f"{alias_file}.tmp{os.getpid()}" # per process, so parallel batch jobs never share a temp file
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, indent=2)
+        os.replace(tmp_file, alias_file)
+    except OSError as e:
+        logger.warning(f"Could not write TRN TYPE alias file '{alias_file}': {e}")
+
+def find_best_trn_type_match(value: str) -> str:
+    """
+    Fuzzy matches a raw 'TRN TYPE' value against BANK_CATEGORY_LIST.
+
+    Args:
+        value (str): The raw TRN TYPE value.
+
+    Returns:
+        str: The best matching category if its ratio reaches the threshold, otherwise the value itself.
+    """
+    best_match = value
+    highest_ratio = 0.0
+
+    for category in BANK_CATEGORY_LIST:
+        ratio = difflib.SequenceMatcher(None, value, category).ratio()
+        if ratio > highest_ratio:
+            highest_ratio = ratio
+            best_match = category
+    if highest_ratio >= TRN_TYPE_MATCH_THRESHOLD:
+        return best_match
+    else:
+        return value
+
+def resolve_trn_type_categories(values, aliases: dict) -> tuple[dict, int, int]:
+    """
+    Resolves each distinct raw 'TRN TYPE' value exactly once.
+
+    Values found in the alias dictionary (or that already are a category) are
+    taken from it; the rest are fuzzy matched and added to the dictionary.
+
+    Args:
+        values: Iterable of distinct raw TRN TYPE values.
+        aliases (dict): Alias dictionary, updated in place with new results.
+
+    Returns:
+        tuple[dict, int, int]: Lookup table for the given values, number of cache hits
+                               and number of values that fell back to fuzzy scoring.
+    """
+    lookup = {}
+    cache_hits = 0
+    fuzzy_scored = 0
+    for value in values:
+        if value in aliases:
+            lookup[value] = aliases[value]
+            cache_hits += 1
+        elif value in BANK_CATEGORY_LIST:
+            lookup[value] = value
+            cache_hits += 1
+        else:
+            lookup[value] = find_best_trn_type_match(value)
+            aliases[value] = lookup[value]
+            fuzzy_scored += 1
+    return lookup, cache_hits, fuzzy_scored
+
+@profiled()
+def rename_bank_trn_type(df: pd.DataFrame, alias_file: str | None = TRN_TYPE_ALIAS_FILE) -> pd.DataFrame:
     """
     Renames specific 'TRN TYPE' values in the bank DataFrame.
 
+    Each distinct value is resolved once (alias dictionary first, fuzzy
+    matching as fallback) and the result is mapped back onto the column.
+
     Args:
         df (pd.DataFrame): The bank DataFrame.
+        alias_file (str | None): Path to the persisted alias dictionary. None disables persistence.
 
     Returns:
         pd.DataFrame: DataFrame with 'TRN TYPE' renamed.
     """
     logger.info("Renaming 'TRN TYPE' in bank data.")
 
-    def find_best_match(value)->str:
-        str_value = value
-        best_match = str_value
-        highest_ratio = 0.0
-
-        for category in category_list_str:
-            ratio = difflib.SequenceMatcher(None,str_value,category).ratio()
-            if ratio > highest_ratio:
-                highest_ratio = ratio
-                best_match = category
-        if highest_ratio >= threshold_match:
-            return best_match
-        else:
-            return value
-        
     data_copy = df.copy()
     if BANK_TRN_TYPE_COL in data_copy.columns:
-        category_list_str = BANK_CATEGORY_LIST
-        threshold_match = 0.80
-
         #Fill empty transaction type with NoCategory
-        data_copy[BANK_TRN_TYPE_COL] = data_copy[BANK_TRN_TYPE_COL].fillna("NoCategory")
-        #Find the best match
-        data_copy[BANK_TRN_TYPE_COL] = data_copy[BANK_TRN_TYPE_COL].apply(find_best_match)
-
-        """"
-        if BANK_TRN_TYPE_COL in data_copy.columns:
-            data_copy[BANK_TRN_TYPE_COL] = np.where(
-            data_copy[BANK_TRN_TYPE_COL] == "AR Module", 'AR',
-            np.where(data_copy[BANK_TRN_TYPE_COL] == "Autodebits", 'Autodebit', data_copy[BANK_TRN_TYPE_COL])
-        )"""
+        trn_types = data_copy[BANK_TRN_TYPE_COL].fillna(TRN_TYPE_NO_CATEGORY)
+
+        #Find the best match for each distinct value and map it back by position
+        codes, uniques = pd.factorize(trn_types)
+        aliases = load_trn_type_aliases(alias_file)
+        lookup, cache_hits, fuzzy_scored = resolve_trn_type_categories(uniques, aliases)
+        resolved = np.array([lookup[value] for value in uniques], dtype=object)
+        data_copy[BANK_TRN_TYPE_COL] = pd.Series(resolved[codes], index=data_copy.index)
+
+        logger.info(f"Resolved {len(uniques)} distinct 'TRN TYPE' values: {cache_hits} from alias cache, {fuzzy_scored} by fuzzy scoring.")
+        if fuzzy_scored and _alias_saving_enabled:
+            save_trn_type_aliases(aliases, alias_file)
     else:
         logger.error(f"Column '{BANK_TRN_TYPE_COL}' not found for renaming TRN types.")
     return data_copy
-
-
-    
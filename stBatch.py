@@ -0,0 +1,610 @@
+"""
+stBatch.py
+
+Headless batch runner for GL vs Bank Statement Reconciliation.
+Runs categorization and reconciliation without Streamlit, for one set of
+files, for every account/period folder under a directory, or for one GL
+export split by account (and period), on a pool of worker processes.
+Writes the reports plus a JSON and an Excel summary with per-stage timings,
+and a JSON run profile (per-step time, rows and memory) per job.
+
+Usage:
+    python stBatch.py --gl GL.xlsx --bank Bank.xlsx [--outstanding Outstanding.xlsx] --out reports/
+    python stBatch.py --batch-dir month_end/ --out reports/ [--workers 8]
+    python stBatch.py --gl GL.xlsx --bank-map banks.csv [--by-period] --out reports/ [--workers 8]
+    python stBatch.py --gl GL.xlsx --bank Bank.xlsx --out reports/ --chunked [--memory-budget-mb 1024]
+    python stBatch.py --gl GL.xlsx --bank Bank.xlsx --out reports/ --sqlite
+    python stBatch.py --batch-dir month_end/ --out reports/ --incremental
+"""
+import os
+import sys
+import json
+import time
+import io
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import openpyxl
+
+from config import (
+    GL_FILE_SHEET_NAME, BANK_FILE_SHEET_NAME, OUTSTANDING_CHECK_REPORT_SHEET_NAME,
+    EXCEL_OUTPUT_FILENAME, BATCH_SUMMARY_FILENAME, LOGGING_LEVEL, LOG_FILE_NAME,
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS,
+    CATEGORIZED_GL_SHEET_NAME, UPLOAD_CACHE_ENABLED, BATCH_SUMMARY_WORKBOOK, BATCH_WORKERS,
+    BATCH_ACCOUNT_COLUMNS, BATCH_PERIOD_COLUMN, BATCH_MAP_BANK_FILE_COL, BATCH_MAP_OUTSTANDING_FILE_COL,
+    RUN_PROFILE_FILENAME, CHUNKED_MEMORY_BUDGET_MB, SQLITE_RESULT_FILENAME, INCREMENTAL_STATE_FILENAME
+)
+from reconciliation_core import run_full_reconciliation, categorize_gl_with_bank
+from stChunked import run_chunked_reconciliation
+from stSqlEngine import run_sqlite_reconciliation
+from stIncremental import run_incremental_reconciliation
+from stReadXl import (
+    read_gl_workbook, read_gl_sheet, read_bank_workbook, read_outstanding_workbook,
+    GL_WORKBOOK_SHEETS, GL_SHEET_ONLY, BANK_WORKBOOK_SHEETS, OUTSTANDING_WORKBOOK_SHEETS
+)
+from stUploadCache import read_with_cache
+from stMoney import money_columns_to_cents, money_columns_to_dollars
+from stExportXl import dataframe_to_bytes, export_formatted_excel
+from stTimings import start_stage_clock
+from stProfile import run_profile, write_run_profile
+from stBankGL import set_trn_type_alias_saving
+
+logger = logging.getLogger(__name__)
+
+
+def classify_workbook(path: str) -> str | None:
+    """
+    Tells GL, bank and outstanding check workbooks apart by their sheet names.
+
+    Args:
+        path (str): Path of an .xlsx file.
+
+    Returns:
+        str | None: 'gl', 'bank' or 'outstanding'; None for other workbooks.
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sheet_names = set(workbook.sheetnames)
+    finally:
+        workbook.close()
+    if GL_FILE_SHEET_NAME in sheet_names:
+        return 'gl'
+    if BANK_FILE_SHEET_NAME in sheet_names:
+        return 'bank'
+    if OUTSTANDING_CHECK_REPORT_SHEET_NAME in sheet_names:
+        return 'outstanding'
+    return None
+
+
+def discover_batch_jobs(batch_dir: str) -> list:
+    """
+    Finds one reconciliation job per folder under batch_dir that holds workbooks,
+    e.g. batch_dir/<account>/<period>/. A job needs exactly one GL and one bank workbook;
+    an outstanding check workbook is optional (otherwise the GL workbook's sheet is used).
+
+    Args:
+        batch_dir (str): Root directory of the batch.
+
+    Returns:
+        list: Job dicts with 'name', 'gl', 'bank', 'outstanding' and, for folders that
+              cannot be run, 'error'.
+    """
+    jobs = []
+    for folder, _, files in sorted(os.walk(batch_dir)):
+        workbooks = sorted(name for name in files if name.lower().endswith('.xlsx') and not name.startswith('~$'))
+        if not workbooks:
+            continue
+        found = {'gl': [], 'bank': [], 'outstanding': []}
+        for name in workbooks:
+            path = os.path.join(folder, name)
+            try:
+                kind = classify_workbook(path)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable workbook {path}: {e}")
+                continue
+            if kind is not None:
+                found[kind].append(path)
+
+        job = {
+            'name': os.path.relpath(folder, batch_dir).replace(os.sep, '/'),
+            'gl': found['gl'][0] if len(found['gl']) == 1 else None,
+            'bank': found['bank'][0] if len(found['bank']) == 1 else None,
+            'outstanding': found['outstanding'][0] if len(found['outstanding']) == 1 else None,
+        }
+        problems = [f"expected one {kind} workbook, found {len(found[kind])}"
+                    for kind in ('gl', 'bank') if len(found[kind]) != 1]
+        if len(found['outstanding']) > 1:
+            problems.append(f"expected at most one outstanding workbook, found {len(found['outstanding'])}")
+        if problems:
+            job['error'] = '; '.join(problems)
+        if found['gl'] or found['bank']:
+            jobs.append(job)
+    logger.info(f"Found {len(jobs)} reconciliation jobs under {batch_dir}.")
+    return jobs
+
+
+def read_typed_workbook(path: str, reader, schema: dict, use_cache: bool, money_columns: list):
+    """Reads one workbook with reader (through the upload cache) and converts its money columns to cents."""
+    result = read_with_cache(path, reader, schema, enabled=use_cache)
+    if not MONEY_IN_CENTS:
+        return result
+    if isinstance(result, pd.DataFrame):
+        return money_columns_to_cents(result, money_columns)
+    return tuple(money_columns_to_cents(df, columns) for df, columns in zip(result, money_columns))
+
+
+def read_job_inputs(job: dict, use_cache: bool) -> tuple:
+    """
+    Reads and types the GL, bank and outstanding check data of a job, in cents when MONEY_IN_CENTS.
+    Frames already in the job ('gl_df', 'outstanding_df', e.g. GL partitions) are used as they are.
+
+    Args:
+        job (dict): Job with 'gl' or 'gl_df', 'bank', and 'outstanding' or 'outstanding_df'.
+                    Without either outstanding entry, the GL workbook's outstanding sheet is read.
+        use_cache (bool): Reuse parsed workbooks from the upload cache.
+
+    Returns:
+        tuple: (gl_df, bank_df, outstanding_df).
+    """
+    gl_df, outstanding_df = job.get('gl_df'), job.get('outstanding_df')
+    if job.get('outstanding'):
+        outstanding_df = read_typed_workbook(job['outstanding'], read_outstanding_workbook, OUTSTANDING_WORKBOOK_SHEETS,
+                                             use_cache, OUTSTANDING_MONEY_COLUMNS)
+    if gl_df is None and outstanding_df is None:
+        gl_df, outstanding_df = read_typed_workbook(job['gl'], read_gl_workbook, GL_WORKBOOK_SHEETS,
+                                                    use_cache, [GL_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS])
+    elif gl_df is None:
+        gl_df = read_typed_workbook(job['gl'], read_gl_sheet, GL_SHEET_ONLY, use_cache, GL_MONEY_COLUMNS)
+    bank_df = read_typed_workbook(job['bank'], read_bank_workbook, BANK_WORKBOOK_SHEETS, use_cache, BANK_MONEY_COLUMNS)
+    return gl_df, bank_df, outstanding_df
+
+
+def run_chunked_job(job: dict, use_cache: bool, summary: dict, lap) -> io.BytesIO | None:
+    """
+    Reconciles a job's GL workbook without loading it: the GL sheet is streamed in chunks
+    that are categorized and reduced one at a time (see run_chunked_reconciliation).
+    With 'sqlite' in the job, the chunks are loaded into a SQLite result store in the
+    job's output folder and matched there instead (see run_sqlite_reconciliation).
+
+    Args:
+        job (dict): Job with 'gl' (path), 'bank', 'out_dir', optionally 'outstanding', 'memory_budget_mb' and 'sqlite'.
+        use_cache (bool): Reuse the parsed bank and outstanding workbooks from the upload cache.
+        summary (dict): Job summary; receives the reconciliation stats.
+        lap: Stage clock of the job.
+
+    Returns:
+        io.BytesIO | None: The Excel report, None if the reconciliation failed.
+    """
+    # Money columns stay in dollars here; the chunked run converts each chunk itself
+    outstanding_df = read_with_cache(job.get('outstanding') or job['gl'], read_outstanding_workbook,
+                                     OUTSTANDING_WORKBOOK_SHEETS, enabled=use_cache)
+    bank_df = read_with_cache(job['bank'], read_bank_workbook, BANK_WORKBOOK_SHEETS, enabled=use_cache)
+    lap('read')
+
+    reconciliation_stats = {}
+    memory_budget_mb = job.get('memory_budget_mb', CHUNKED_MEMORY_BUDGET_MB)
+    if job.get('sqlite'):
+        db_path = os.path.join(job['out_dir'], SQLITE_RESULT_FILENAME)
+        excel_buffer = run_sqlite_reconciliation(job['gl'], bank_df, outstanding_df, db_path=db_path,
+                                                 stats=reconciliation_stats, memory_budget_mb=memory_budget_mb)
+    else:
+        excel_buffer = run_chunked_reconciliation(job['gl'], bank_df, outstanding_df, stats=reconciliation_stats,
+                                                  memory_budget_mb=memory_budget_mb)
+    lap('reconcile')
+    if excel_buffer is not None:
+        summary['rows'] = reconciliation_stats['rows']
+        summary['comments'] = reconciliation_stats['comments']
+        if job.get('sqlite'):
+            summary['outputs']['result_store'] = db_path
+            summary['sqlite_tables'] = reconciliation_stats['sqlite']['tables']
+        else:
+            summary['chunks'] = reconciliation_stats['chunks']
+        summary['reconciliation_timings'] = reconciliation_stats['timings']
+    return excel_buffer
+
+
+def run_incremental_job(job: dict, use_cache: bool, summary: dict, lap) -> io.BytesIO | None:
+    """
+    Reconciles a job against the match state its previous runs left in its output folder,
+    so a daily rerun only cleans and matches what changed (see run_incremental_reconciliation).
+
+    Args:
+        job (dict): Job as for run_reconciliation_job, with 'incremental'.
+        use_cache (bool): Reuse parsed workbooks from the upload cache.
+        summary (dict): Job summary; receives the reconciliation stats.
+        lap: Stage clock of the job.
+
+    Returns:
+        io.BytesIO | None: The Excel report, None if the reconciliation failed.
+    """
+    gl_df, bank_df, outstanding_df = read_job_inputs(job, use_cache)
+    lap('read')
+
+    reconciliation_stats = {}
+    state_path = os.path.join(job['out_dir'], INCREMENTAL_STATE_FILENAME)
+    excel_buffer = run_incremental_reconciliation(gl_df, bank_df, outstanding_df, state_path, stats=reconciliation_stats)
+    lap('reconcile')
+    if excel_buffer is not None:
+        summary['rows'] = reconciliation_stats['rows']
+        summary['comments'] = reconciliation_stats['comments']
+        summary['outputs']['state'] = state_path
+        summary['reconciliation_timings'] = reconciliation_stats['timings']
+    return excel_buffer
+
+
+def run_reconciliation_job(job: dict, use_cache: bool = UPLOAD_CACHE_ENABLED,
+                           categorized_format: str | None = None) -> dict:
+    """
+    Runs categorization and reconciliation for one account/period and writes its reports.
+    Runs in a worker process, so the job and its result must be picklable.
+
+    Args:
+        job (dict): 'name', 'out_dir', 'bank' (path), 'gl' (path) or 'gl_df' (typed GL partition),
+                    and optionally 'outstanding' (path) or 'outstanding_df'. With 'chunked', a
+                    'gl' workbook is streamed in chunks within 'memory_budget_mb'; with 'sqlite'
+                    as well, it is matched in a SQLite result store. With 'incremental', the run
+                    updates the match state kept in out_dir by the job's previous runs.
+        use_cache (bool): Reuse parsed workbooks from the upload cache.
+        categorized_format (str | None): Also write the categorized GL as 'xlsx', 'csv' or 'parquet'.
+
+    Returns:
+        dict: Job summary with status, inputs, outputs, row counts, comment counts and stage timings.
+              The job's run profile is written to RUN_PROFILE_FILENAME in its output folder.
+    """
+    name, out_dir = job['name'], job['out_dir']
+    summary = {
+        'job': name, 'status': 'failed',
+        'inputs': {'gl': job.get('gl'), 'bank': job.get('bank'), 'outstanding': job.get('outstanding')},
+        'outputs': {}, 'timings': {},
+    }
+    start = time.perf_counter()
+    lap = start_stage_clock(summary['timings'])
+    with run_profile(name) as profile:
+        try:
+            if job.get('chunked') and job.get('gl_df') is None:
+                excel_buffer = run_chunked_job(job, use_cache, summary, lap)
+            elif job.get('incremental'):
+                excel_buffer = run_incremental_job(job, use_cache, summary, lap)
+            else:
+                gl_df, bank_df, outstanding_df = read_job_inputs(job, use_cache)
+                lap('read')
+
+                categorized_gl = categorize_gl_with_bank(gl_df, bank_df)
+                if categorized_gl is None:
+                    raise RuntimeError("GL categorization failed.")
+                lap('categorize')
+
+                os.makedirs(out_dir, exist_ok=True)
+                if categorized_format:
+                    export_df = money_columns_to_dollars(categorized_gl, GL_MONEY_COLUMNS) if MONEY_IN_CENTS else categorized_gl
+                    categorized_path = os.path.join(out_dir, f"gl_categorized.{categorized_format}")
+                    with open(categorized_path, 'wb') as handle:
+                        handle.write(dataframe_to_bytes(export_df, categorized_format, sheet_name=CATEGORIZED_GL_SHEET_NAME))
+                    summary['outputs']['categorized_gl'] = categorized_path
+                    lap('write_categorized')
+
+                reconciliation_stats = {}
+                # Each job reconciles its inputs once; cached stages would only hold memory
+                excel_buffer = run_full_reconciliation(categorized_gl, bank_df, outstanding_df, use_stage_cache=False,
+                                                       stats=reconciliation_stats)
+                lap('reconcile')
+                if excel_buffer is not None:
+                    summary['rows'] = reconciliation_stats['rows']
+                    summary['comments'] = reconciliation_stats['comments']
+                    summary['reconciliation_timings'] = reconciliation_stats['timings']
+            if excel_buffer is None:
+                raise RuntimeError("Reconciliation failed; see the log for details.")
+
+            os.makedirs(out_dir, exist_ok=True)
+            report_path = os.path.join(out_dir, EXCEL_OUTPUT_FILENAME)
+            with open(report_path, 'wb') as handle:
+                handle.write(excel_buffer.getvalue())
+            lap('write_report')
+
+            summary['outputs']['report'] = report_path
+            summary['status'] = 'ok'
+        except Exception as e:
+            summary['error'] = str(e)
+            logger.error(f"Job '{name}' failed: {e}", exc_info=True)
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        summary['outputs']['profile'] = write_run_profile(profile, os.path.join(out_dir, RUN_PROFILE_FILENAME))
+    except OSError as e:
+        logger.warning(f"Could not write the run profile of job '{name}': {e}")
+    summary['total_seconds'] = time.perf_counter() - start
+    summary['worker_pid'] = os.getpid()
+    logger.info(f"Job '{name}' finished with status {summary['status']} in {summary['total_seconds']:.2f}s.")
+    return summary
+
+
+def load_bank_map(map_path: str, by_period: bool) -> dict:
+    """
+    Reads the bank map CSV that pairs GL partitions with their bank (and outstanding check) files.
+
+    The CSV has the BATCH_ACCOUNT_COLUMNS, a BATCH_MAP_BANK_FILE_COL column and optionally
+    BATCH_PERIOD_COLUMN and BATCH_MAP_OUTSTANDING_FILE_COL columns. Relative file paths are
+    resolved against the CSV's folder. A row without a period applies to every period.
+
+    Args:
+        map_path (str): Path of the CSV.
+        by_period (bool): Whether partitions are per period.
+
+    Returns:
+        dict: (account values..., period or None) -> {'bank': path, 'outstanding': path or None}.
+    """
+    bank_map = pd.read_csv(map_path, dtype=str, keep_default_na=False)
+    missing = [col for col in BATCH_ACCOUNT_COLUMNS + [BATCH_MAP_BANK_FILE_COL] if col not in bank_map.columns]
+    if missing:
+        raise KeyError(f"{missing} not in bank map '{map_path}'")
+
+    base_dir = os.path.dirname(os.path.abspath(map_path))
+    def resolve(path: str) -> str | None:
+        return os.path.join(base_dir, path) if path else None
+
+    entries = {}
+    for row in bank_map.to_dict('records'):
+        period = (row.get(BATCH_PERIOD_COLUMN) or None) if by_period else None
+        key = tuple(row[col] for col in BATCH_ACCOUNT_COLUMNS) + (period,)
+        entries[key] = {'bank': resolve(row[BATCH_MAP_BANK_FILE_COL]),
+                        'outstanding': resolve(row.get(BATCH_MAP_OUTSTANDING_FILE_COL, ''))}
+    return entries
+
+
+def account_outstanding_checks(outstanding_df: pd.DataFrame, account: tuple) -> pd.DataFrame:
+    """
+    Selects one account's rows of an outstanding check sheet that has the BATCH_ACCOUNT_COLUMNS.
+
+    Args:
+        outstanding_df (pd.DataFrame): Outstanding check sheet covering several accounts.
+        account (tuple): BATCH_ACCOUNT_COLUMNS values as text, missing values as 'NA'.
+
+    Returns:
+        pd.DataFrame: The account's outstanding checks.
+    """
+    in_account = pd.Series(True, index=outstanding_df.index)
+    for col, value in zip(BATCH_ACCOUNT_COLUMNS, account):
+        text = outstanding_df[col].astype(object).map(lambda v: 'NA' if pd.isna(v) else str(v))
+        in_account &= text == value
+    return outstanding_df[in_account].reset_index(drop=True)
+
+
+def split_gl_jobs(gl_path: str, map_path: str, out_dir: str, by_period: bool = False,
+                  use_cache: bool = UPLOAD_CACHE_ENABLED) -> list:
+    """
+    Splits one GL export into one job per account (CO/AU/Acct), or per account and period,
+    and pairs each partition with its bank file from the bank map.
+
+    Partitions without an outstanding check file in the map use their account's rows of
+    the GL workbook's outstanding check sheet. That needs the BATCH_ACCOUNT_COLUMNS in the
+    sheet, unless the GL holds a single account; otherwise the partition gets an 'error'.
+
+    Args:
+        gl_path (str): GL workbook covering several accounts.
+        map_path (str): Bank map CSV, see load_bank_map.
+        out_dir (str): Output root; each job writes to out_dir/<CO-AU-Acct>[/<period>].
+        by_period (bool): Also split by BATCH_PERIOD_COLUMN.
+        use_cache (bool): Reuse the parsed GL workbook from the upload cache.
+
+    Returns:
+        list: Job dicts for run_batch; partitions without a bank file, or without an
+              outstanding check sheet of their own, carry an 'error'.
+    """
+    bank_map = load_bank_map(map_path, by_period)
+    gl_df, outstanding_df = read_typed_workbook(gl_path, read_gl_workbook, GL_WORKBOOK_SHEETS,
+                                                use_cache, [GL_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS])
+    partition_cols = BATCH_ACCOUNT_COLUMNS + ([BATCH_PERIOD_COLUMN] if by_period else [])
+    outstanding_has_accounts = all(col in outstanding_df.columns for col in BATCH_ACCOUNT_COLUMNS)
+    single_account = len(gl_df[BATCH_ACCOUNT_COLUMNS].drop_duplicates()) <= 1
+
+    jobs = []
+    for values, partition in gl_df.groupby(partition_cols, sort=True, dropna=False):
+        values = tuple('NA' if pd.isna(value) else str(value) for value in values)
+        account = values[:len(BATCH_ACCOUNT_COLUMNS)]
+        period = values[-1] if by_period else None
+        name = '-'.join(account) + (f"/{period}" if by_period else '')
+        files = bank_map.get(account + (period,)) or bank_map.get(account + (None,))
+        job = {
+            'name': name,
+            'out_dir': os.path.join(out_dir, *[part.replace(os.sep, '_') for part in name.split('/')]),
+            'gl': gl_path, 'gl_df': partition.reset_index(drop=True),
+            'bank': files['bank'] if files else None,
+            'outstanding': files['outstanding'] if files else None,
+        }
+        if not (files and files['outstanding']):
+            if outstanding_has_accounts:
+                job['outstanding_df'] = account_outstanding_checks(outstanding_df, account)
+            elif single_account:
+                job['outstanding_df'] = outstanding_df
+            else:
+                job['error'] = (f"no outstanding check file mapped for {name}, and the GL workbook's outstanding "
+                                f"check sheet has no {BATCH_ACCOUNT_COLUMNS} columns to split it by account")
+        if not job['bank']:
+            job['error'] = f"no bank file mapped for {name}"
+        jobs.append(job)
+    logger.info(f"Split {len(gl_df)} GL rows into {len(jobs)} jobs by {partition_cols}.")
+    return jobs
+
+
+def skipped_job_summary(job: dict) -> dict:
+    """Summary of a job that could not be started."""
+    logger.error(f"Skipping job '{job['name']}': {job['error']}")
+    return {'job': job['name'], 'status': 'skipped', 'error': job['error'],
+            'inputs': {key: job.get(key) for key in ('gl', 'bank', 'outstanding')}}
+
+
+def configure_logging(level: str) -> None:
+    """Configures console and file logging, in the main process and in each worker process."""
+    logging.basicConfig(
+        level=getattr(logging, level.upper(), logging.INFO),
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(), logging.FileHandler(LOG_FILE_NAME)]
+    )
+
+
+def init_batch_worker(level: str) -> None:
+    """Sets up a batch worker process: logging, and no writes to the shared TRN TYPE alias file."""
+    configure_logging(level)
+    set_trn_type_alias_saving(False)
+
+
+def run_batch(jobs: list, out_dir: str, use_cache: bool = UPLOAD_CACHE_ENABLED,
+              categorized_format: str | None = None, workers: int | None = BATCH_WORKERS,
+              log_level: str = LOGGING_LEVEL) -> list:
+    """
+    Runs the jobs on a pool of worker processes. A failing job is recorded and does not
+    stop the batch. With a single worker the jobs run in this process, one after another.
+    Jobs read the TRN TYPE alias file but do not write it.
+
+    Args:
+        jobs (list): Job dicts as returned by discover_batch_jobs or split_gl_jobs.
+        out_dir (str): Output root; each job writes to out_dir/<job name> unless it has its own 'out_dir'.
+        use_cache (bool): Reuse parsed workbooks from the upload cache.
+        categorized_format (str | None): Also write each categorized GL in this format.
+        workers (int | None): Number of worker processes; None uses one per CPU.
+        log_level (str): Logging level of the worker processes.
+
+    Returns:
+        list: One summary per job, in job order.
+    """
+    job_summaries = [None] * len(jobs)
+    runnable = []
+    for position, job in enumerate(jobs):
+        if job.get('error'):
+            job_summaries[position] = skipped_job_summary(job)
+            continue
+        job = dict(job)
+        job.setdefault('out_dir', os.path.normpath(os.path.join(out_dir, job['name'])))
+        runnable.append((position, job))
+
+    workers = min(workers or os.cpu_count() or 1, max(len(runnable), 1))
+    logger.info(f"Running {len(runnable)} jobs on {workers} worker process(es).")
+    if workers == 1:
+        alias_saving = set_trn_type_alias_saving(False)
+        try:
+            for position, job in runnable:
+                job_summaries[position] = run_reconciliation_job(job, use_cache, categorized_format)
+        finally:
+            set_trn_type_alias_saving(alias_saving)
+        return job_summaries
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker, initargs=(log_level,)) as pool:
+        futures = {position: pool.submit(run_reconciliation_job, job, use_cache, categorized_format)
+                   for position, job in runnable}
+        for position, future in futures.items():
+            try:
+                job_summaries[position] = future.result()
+            except Exception as e:
+                # e.g. a worker process died; the job itself records its own failures
+                name = jobs[position]['name']
+                logger.error(f"Job '{name}' crashed its worker: {e}", exc_info=True)
+                job_summaries[position] = {'job': name, 'status': 'failed', 'error': f"worker crashed: {e}"}
+    return job_summaries
+
+
+def write_batch_summary(job_summaries: list, out_dir: str, total_seconds: float, workers: int | None = None) -> str:
+    """
+    Writes the batch summary as JSON and as a consolidated workbook with one
+    row per job (status, error, row and comment counts, stage timings).
+
+    Args:
+        job_summaries (list): Output of run_reconciliation_job per job.
+        out_dir (str): Output directory of the batch.
+        total_seconds (float): Wall time of the whole batch.
+        workers (int | None): Worker processes used, for the record.
+
+    Returns:
+        str: Path of the JSON summary file.
+    """
+    summary = {
+        'jobs_total': len(job_summaries),
+        'jobs_ok': sum(job['status'] == 'ok' for job in job_summaries),
+        'jobs_failed': sum(job['status'] == 'failed' for job in job_summaries),
+        'jobs_skipped': sum(job['status'] == 'skipped' for job in job_summaries),
+        'workers': workers,
+        'total_seconds': total_seconds,
+        'job_seconds': sum(job.get('total_seconds', 0.0) for job in job_summaries),
+        'jobs': job_summaries,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    summary_path = os.path.join(out_dir, BATCH_SUMMARY_FILENAME)
+    with open(summary_path, 'w', encoding='utf-8') as handle:
+        json.dump(summary, handle, indent=2, default=str)
+
+    jobs_df = pd.json_normalize(job_summaries) if job_summaries else pd.DataFrame(columns=['job', 'status'])
+    leading = [col for col in ['job', 'status', 'error', 'total_seconds'] if col in jobs_df.columns]
+    jobs_df = jobs_df[leading + sorted(col for col in jobs_df.columns if col not in leading)]
+    totals_df = pd.DataFrame({'Metric': [key for key in summary if key != 'jobs'],
+                              'Value': [summary[key] for key in summary if key != 'jobs']})
+    workbook = export_formatted_excel({'Summary': totals_df, 'Jobs': jobs_df})
+    if workbook is not None:
+        with open(os.path.join(out_dir, BATCH_SUMMARY_WORKBOOK), 'wb') as handle:
+            handle.write(workbook.getvalue())
+    logger.info(f"Batch summary written to {summary_path}: {summary['jobs_ok']} ok, "
+                f"{summary['jobs_failed']} failed, {summary['jobs_skipped']} skipped.")
+    return summary_path
+
+
+def parse_args(argv: list | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run GL vs bank reconciliation without the Streamlit app.")
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument('--gl', help="GL workbook (with the outstanding check sheet unless --outstanding is given).")
+    inputs.add_argument('--batch-dir', help="Directory of account/period folders, each holding a GL and a bank workbook.")
+    parser.add_argument('--bank', help="Bank workbook (with --gl).")
+    parser.add_argument('--bank-map', help="CSV pairing accounts (and periods) with bank files; splits the --gl workbook into per-account jobs.")
+    parser.add_argument('--by-period', action='store_true', help=f"With --bank-map, also split by '{BATCH_PERIOD_COLUMN}'.")
+    parser.add_argument('--outstanding', help="Outstanding check workbook (with --gl and --bank, optional).")
+    parser.add_argument('--name', help="Job name in the summary (with --gl and --bank). Defaults to the GL file name.")
+    parser.add_argument('--out', required=True, help="Output directory for reports and the summaries.")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Worker processes (default: one per CPU).")
+    parser.add_argument('--categorized-format', choices=['xlsx', 'csv', 'parquet'],
+                        help="Also write the categorized GL in this format.")
+    parser.add_argument('--chunked', action='store_true',
+                        help="Stream each GL workbook in chunks instead of loading it, for GLs too large for memory.")
+    parser.add_argument('--memory-budget-mb', type=float, default=CHUNKED_MEMORY_BUDGET_MB,
+                        help="With --chunked or --sqlite, memory budget used to size the GL chunks.")
+    parser.add_argument('--sqlite', action='store_true',
+                        help=f"Stream each GL workbook into a SQLite database and match there; the database is kept "
+                             f"as {SQLITE_RESULT_FILENAME} next to the report.")
+    parser.add_argument('--incremental', action='store_true',
+                        help=f"Keep a match state as {INCREMENTAL_STATE_FILENAME} next to each report and, on reruns with "
+                             f"the same --out, only clean and match the GL and bank rows that are new since the last run.")
+    parser.add_argument('--no-cache', action='store_true', help="Always parse workbooks; do not use the upload cache.")
+    parser.add_argument('--log-level', default=LOGGING_LEVEL, help="Logging level (default from config).")
+    args = parser.parse_args(argv)
+    if args.gl and not (args.bank or args.bank_map):
+        parser.error("--bank or --bank-map is required with --gl")
+    if args.bank and args.bank_map:
+        parser.error("--bank and --bank-map cannot be combined")
+    if (args.chunked or args.sqlite) and (args.bank_map or args.categorized_format):
+        parser.error("--chunked and --sqlite cannot be combined with --bank-map or --categorized-format")
+    if args.incremental and (args.chunked or args.sqlite or args.categorized_format):
+        parser.error("--incremental cannot be combined with --chunked, --sqlite or --categorized-format")
+    return args
+
+
+def main(argv: list | None = None) -> int:
+    """Command-line entry point. Returns 0 when every job succeeded, 1 otherwise."""
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+
+    start = time.perf_counter()
+    if args.batch_dir:
+        jobs = discover_batch_jobs(args.batch_dir)
+    elif args.bank_map:
+        jobs = split_gl_jobs(args.gl, args.bank_map, args.out, by_period=args.by_period, use_cache=not args.no_cache)
+    else:
+        name = args.name or os.path.splitext(os.path.basename(args.gl))[0]
+        jobs = [{'name': name, 'gl': args.gl, 'bank': args.bank, 'outstanding': args.outstanding, 'out_dir': args.out}]
+    if args.chunked or args.sqlite:
+        jobs = [dict(job, chunked=True, sqlite=args.sqlite, memory_budget_mb=args.memory_budget_mb) for job in jobs]
+    if args.incremental:
+        jobs = [dict(job, incremental=True) for job in jobs]
+    job_summaries = run_batch(jobs, args.out, use_cache=not args.no_cache, categorized_format=args.categorized_format,
+                              workers=args.workers, log_level=args.log_level)
+    write_batch_summary(job_summaries, args.out, time.perf_counter() - start, workers=args.workers or os.cpu_count())
+    return 0 if job_summaries and all(job['status'] == 'ok' for job in job_summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
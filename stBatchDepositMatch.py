@@ -0,0 +1,182 @@
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+from config import (
+    GL_TYPE_COL, BANK_TRN_TYPE_COL, BANK_COMPARISON_KEY_COL, COMMENT_BATCH_DEPOSIT_MATCH,
+    BATCH_DEPOSIT_TYPES, BATCH_DEPOSIT_DAY_WINDOW, BATCH_DEPOSIT_MAX_CANDIDATES, BATCH_DEPOSIT_TIME_BUDGET_SECONDS
+)
+from stAmountDateMatch import unmatched_gl_items, unmatched_bank_items
+
+logger = logging.getLogger(__name__)
+
+
+def subset_sums(amounts: np.ndarray, deadline: float) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+    """
+    Sums of all 2**n subsets of amounts, built by doubling one item at a time.
+
+    Args:
+        amounts (np.ndarray): Integer cents, at most 62 items.
+        deadline (float): time.perf_counter() value after which to give up.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray] | None: Sums, item bit masks and item
+        counts of the subsets; None when the deadline passed.
+    """
+    sums = np.zeros(1, dtype=np.int64)
+    masks = np.zeros(1, dtype=np.int64)
+    counts = np.zeros(1, dtype=np.int64)
+    for i, amount in enumerate(amounts):
+        if time.perf_counter() > deadline:
+            return None
+        sums = np.concatenate([sums, sums + amount])
+        masks = np.concatenate([masks, masks | (1 << i)])
+        counts = np.concatenate([counts, counts + 1])
+    return sums, masks, counts
+
+
+def find_subset_with_sum(amounts: np.ndarray, target: int, deadline: float) -> np.ndarray | None:
+    """
+    Meet in the middle: the fewest items (at least two) of amounts that sum exactly to target.
+
+    The subset sums of each half are enumerated (2 x 2**(n/2) instead of 2**n), the
+    second half's are sorted by sum and item count, and every first-half subset looks up
+    by binary search the smallest second-half subset with the complementary sum that
+    brings the total to at least two items.
+
+    Args:
+        amounts (np.ndarray): Candidate amounts in integer cents.
+        target (int): Amount to reach, in integer cents.
+        deadline (float): time.perf_counter() value after which to give up.
+
+    Returns:
+        np.ndarray | None: Positions in amounts of the subset; None when there is none or time ran out.
+    """
+    half = len(amounts) // 2
+    first, second = subset_sums(amounts[:half], deadline), subset_sums(amounts[half:], deadline)
+    if first is None or second is None or time.perf_counter() > deadline:
+        return None
+    sums_a, masks_a, counts_a = first
+    sums_b, masks_b, counts_b = second
+    # Equal sums ordered by item count; the sorted key (rank of the sum, item count) lets a
+    # lookup skip the second-half subsets of that sum that are too small (e.g. the empty one)
+    order = np.lexsort((counts_b, sums_b))
+    sums_b, masks_b, counts_b = sums_b[order], masks_b[order], counts_b[order]
+    distinct_b = np.unique(sums_b)
+    width = len(amounts) - half + 1 # counts_b ranges over 0..n-half
+    keys_b = np.searchsorted(distinct_b, sums_b) * width + counts_b
+
+    complement = target - sums_a
+    rank = np.searchsorted(distinct_b, complement)
+    min_counts = np.maximum(2 - counts_a, 0)
+    found = np.minimum(np.searchsorted(keys_b, rank * width + min_counts), len(sums_b) - 1)
+    sizes = counts_a + counts_b[found]
+    hits = np.flatnonzero((sums_b[found] == complement) & (sizes >= 2))
+    if len(hits) == 0:
+        return None
+    best = hits[np.argmin(sizes[hits])]
+    mask_a, mask_b = int(masks_a[best]), int(masks_b[found[best]])
+    return np.array([i for i in range(half) if mask_a >> i & 1]
+                    + [half + i for i in range(len(amounts) - half) if mask_b >> i & 1], dtype=np.int64)
+
+
+def batch_deposit_candidates(gl_amounts: np.ndarray, gl_days: np.ndarray, available: np.ndarray,
+                             target: int, day: int, day_window: int, max_candidates: int) -> np.ndarray:
+    """
+    The GL items that can be part of a deposit: available, within day_window days, same
+    sign and not larger than the deposit; the max_candidates closest in date when more qualify.
+
+    Args:
+        gl_amounts (np.ndarray): GL amounts in integer cents, sorted by gl_days.
+        gl_days (np.ndarray): Sorted GL day numbers.
+        available (np.ndarray): GL items not taken by an earlier deposit.
+
+    Returns:
+        np.ndarray: Positions of the candidates.
+    """
+    lo = np.searchsorted(gl_days, day - day_window, side='left')
+    hi = np.searchsorted(gl_days, day + day_window, side='right')
+    window = np.arange(lo, hi)
+    amounts = gl_amounts[window]
+    keep = available[window] & (np.sign(amounts) == np.sign(target)) & (np.abs(amounts) <= abs(target))
+    window = window[keep]
+    if len(window) > max_candidates:
+        window = window[np.argsort(np.abs(gl_days[window] - day), kind='stable')[:max_candidates]]
+    return window
+
+
+def match_batch_deposits(matched: pd.DataFrame, gl_dates: pd.Series, money_in_cents: bool,
+                         types: list = BATCH_DEPOSIT_TYPES,
+                         day_window: int = BATCH_DEPOSIT_DAY_WINDOW,
+                         max_candidates: int = BATCH_DEPOSIT_MAX_CANDIDATES,
+                         time_budget: float = BATCH_DEPOSIT_TIME_BUDGET_SECONDS) -> pd.DataFrame:
+    """
+    Many-to-one pass over the rows left unmatched: a 'GL No,Bank yes' deposit of a batch
+    type (Lockbox, ACH, card processors) is matched with several 'GL Yes,Bank No' rows
+    of the same Type, dated within day_window days, whose amounts sum exactly to it.
+    The rows of a match keep their places; they are tagged 'Batch Deposit Match' with
+    a variance of 0, and the GL rows take the deposit's comparison key so the group can
+    be filtered together.
+
+    The search per deposit is bounded: candidates are pruned by sign and size and capped
+    at max_candidates (closest dates first), the subsets are searched meet-in-the-middle,
+    and a deposit whose search outlasts time_budget seconds is left unmatched.
+
+    Args:
+        matched (pd.DataFrame): Matched rows with comments. Not modified.
+        gl_dates (pd.Series): Transaction number -> date (see gl_transaction_dates).
+        money_in_cents (bool): Amounts are integer cents; otherwise dollars.
+        types (list): GL Types / bank TRN TYPEs that settle in batches.
+        day_window (int): Largest date difference in days between a GL row and the deposit.
+        max_candidates (int): GL rows searched per deposit.
+        time_budget (float): Seconds allowed per deposit.
+
+    Returns:
+        pd.DataFrame: The matched rows with the batch matches tagged, or matched itself when none match.
+    """
+    gl_rows, gl_amounts, gl_days = unmatched_gl_items(matched, gl_dates, money_in_cents)
+    bank_rows, bank_amounts, bank_days = unmatched_bank_items(matched, money_in_cents)
+    gl_types = matched[GL_TYPE_COL].iloc[gl_rows].astype(str).str.strip().to_numpy()
+    bank_types = matched[BANK_TRN_TYPE_COL].iloc[bank_rows].astype(str).str.strip().to_numpy()
+
+    groups, searched, timed_out = [], 0, 0
+    for batch_type in types:
+        gl_of_type = np.flatnonzero(gl_types == batch_type)
+        bank_of_type = np.flatnonzero(bank_types == batch_type)
+        if len(gl_of_type) < 2 or len(bank_of_type) == 0:
+            continue
+        gl_of_type = gl_of_type[np.argsort(gl_days[gl_of_type], kind='stable')]
+        type_amounts, type_days = gl_amounts[gl_of_type], gl_days[gl_of_type]
+        available = np.ones(len(gl_of_type), dtype=bool)
+        for deposit in bank_of_type[np.argsort(bank_days[bank_of_type], kind='stable')]:
+            candidates = batch_deposit_candidates(type_amounts, type_days, available, int(bank_amounts[deposit]),
+                                                  int(bank_days[deposit]), day_window, max_candidates)
+            if len(candidates) < 2 or abs(type_amounts[candidates].sum()) < abs(bank_amounts[deposit]):
+                continue
+            searched += 1
+            start = time.perf_counter()
+            subset = find_subset_with_sum(type_amounts[candidates], int(bank_amounts[deposit]), start + time_budget)
+            if subset is None:
+                timed_out += time.perf_counter() - start > time_budget
+                continue
+            available[candidates[subset]] = False
+            groups.append((bank_rows[deposit], gl_rows[gl_of_type[candidates[subset]]]))
+
+    logger.info(f"Batch deposit pass: {len(groups)} deposits matched, {searched} searched, "
+                f"{timed_out} over the {time_budget}s budget.")
+    if not groups:
+        return matched
+
+    result = matched.copy()
+    deposit_rows = np.array([deposit for deposit, _ in groups])
+    member_rows = np.concatenate([members for _, members in groups])
+    keys = result[BANK_COMPARISON_KEY_COL].copy()
+    keys.iloc[member_rows] = np.repeat(keys.iloc[deposit_rows].to_numpy(), [len(members) for _, members in groups])
+    result[BANK_COMPARISON_KEY_COL] = keys
+    tagged = np.concatenate([deposit_rows, member_rows])
+    variance = result['variance'].copy()
+    variance.iloc[tagged] = 0
+    result['variance'] = variance
+    result.iloc[tagged, result.columns.get_loc('comment')] = COMMENT_BATCH_DEPOSIT_MATCH
+    return result
@@ -0,0 +1,448 @@
+"""
+stBenchmark.py
+
+Scaling benchmark for GL categorization and reconciliation on synthetic data.
+For each GL size, generates a dataset with stSynthData, runs categorization and
+reconciliation under a run profile in a fresh worker process, and appends the
+per-stage timings and peak memory to a JSON Lines history file. Each result is
+compared with the previous run of the same size on the same machine.
+
+Usage:
+    python stBenchmark.py [--sizes 10000 100000 1000000] [--repeat 3] [--fail-on-regression]
+    python stBenchmark.py --comparison-keys [--key-rows 1000000]
+    python stBenchmark.py --key-codes [--key-rows 1000000]
+    python stBenchmark.py --incremental [--incremental-rows 40000] [--days 20]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from config import (
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS,
+    BENCHMARK_SIZES, BENCHMARK_HISTORY_FILE, BENCHMARK_REGRESSION_TOLERANCE, BENCHMARK_MIN_REGRESSION_SECONDS,
+    BENCHMARK_COMPARISON_KEY_ROWS, GL_TRANSACTION_NUMBER_COL, BANK_COMPARISON_KEY_COL, CUSTOMER_REFERENCE_COL,
+    OUTSTANDING_CHECK_NUMBER_COL, BENCHMARK_INCREMENTAL_ROWS, BENCHMARK_INCREMENTAL_DAYS
+)
+from reconciliation_core import run_full_reconciliation, categorize_gl_with_bank, clean_stage, aggregate_stage
+from stSynthData import generate_dataset
+from stBankGL import (
+    clean_and_prepare_gl_bank_data, rename_bank_trn_type, create_bank_comparison_key, create_bank_comparison_keys)
+from stIncremental import run_incremental_reconciliation
+from stKeyCodes import build_key_dictionary, encode_keys
+from stMoney import money_columns_to_cents
+from stProfile import run_profile
+from stBatch import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark_size(n_gl: int, seed: int = 0, repeat: int = 1, options: dict | None = None) -> dict:
+    """
+    Benchmarks categorization plus reconciliation on one generated dataset.
+    Runs in a worker process, so the result must be picklable.
+
+    Args:
+        n_gl (int): Number of GL rows.
+        seed (int): Seed of the generated data.
+        repeat (int): Runs on the same data; the fastest run is kept.
+        options (dict | None): Extra generate_dataset arguments (ratios, periods, accounts).
+
+    Returns:
+        dict: 'size', 'status', 'rows', 'generate_seconds', 'end_to_end_seconds',
+              'stages' (seconds per profiled step), 'peak_rss_mb' and, on failure, 'error'.
+    """
+    options = options or {}
+    result = {'size': n_gl, 'seed': seed, 'repeat': repeat, 'options': options, 'status': 'failed'}
+    start = time.perf_counter()
+    gl, bank, ost = generate_dataset(n_gl, seed=seed, **options)
+    if MONEY_IN_CENTS: # the app converts at upload, before categorization
+        gl = money_columns_to_cents(gl, GL_MONEY_COLUMNS)
+        bank = money_columns_to_cents(bank, BANK_MONEY_COLUMNS)
+        ost = money_columns_to_cents(ost, OUTSTANDING_MONEY_COLUMNS)
+    result['generate_seconds'] = time.perf_counter() - start
+    result['rows'] = {'gl': len(gl), 'bank': len(bank), 'outstanding': len(ost)}
+
+    best = None
+    try:
+        for _ in range(repeat):
+            with run_profile(f"benchmark_{n_gl}") as profile:
+                categorized_gl = categorize_gl_with_bank(gl, bank)
+                if categorized_gl is None:
+                    raise RuntimeError("GL categorization failed.")
+                # Cached stages would turn repeats into cache lookups
+                if run_full_reconciliation(categorized_gl, bank, ost, use_stage_cache=False) is None:
+                    raise RuntimeError("Reconciliation failed; see the log for details.")
+            if best is None or profile['total_seconds'] < best['total_seconds']:
+                best = profile
+        result['status'] = 'ok'
+    except Exception as e:
+        result['error'] = str(e)
+        logger.error(f"Benchmark of {n_gl} GL rows failed: {e}", exc_info=True)
+        best = best or profile
+
+    result['end_to_end_seconds'] = best['total_seconds']
+    result['stages'] = {step['step']: step.get('seconds') for step in best['steps']}
+    result['peak_rss_mb'] = best['peak_rss_mb'] # of the whole worker process, generated data included
+    logger.info(f"Benchmark of {n_gl} GL rows: {result['status']} in {result['end_to_end_seconds']:.2f}s.")
+    return result
+
+
+def benchmark_comparison_keys(n_bank: int = BENCHMARK_COMPARISON_KEY_ROWS, seed: int = 0,
+                              row_wise: bool = True) -> dict:
+    """
+    Benchmarks the bank comparison keys on a cleaned statement of n_bank rows:
+    create_bank_comparison_keys and, with row_wise, the apply of create_bank_comparison_key
+    it replaced, checking that both give the same keys.
+
+    The statement is a generated one, cleaned and renamed as in categorization, and
+    repeated up to n_bank rows.
+
+    Args:
+        n_bank (int): Bank statement rows.
+        seed (int): Seed of the generated data.
+        row_wise (bool): Also time the row-wise apply (about a minute per 5M rows).
+
+    Returns:
+        dict: 'rows', 'vectorized_seconds' and, with row_wise, 'row_wise_seconds',
+              'speedup' and 'keys_equal'.
+    """
+    gl, bank, _ = generate_dataset(max(n_bank // 10, 1000), seed=seed)
+    _, bank_cleaned = clean_and_prepare_gl_bank_data(gl, bank)
+    bank_cleaned = rename_bank_trn_type(bank_cleaned)
+    positions = np.resize(np.arange(len(bank_cleaned)), n_bank)
+    statement = bank_cleaned.iloc[positions].reset_index(drop=True)
+
+    start = time.perf_counter()
+    keys = create_bank_comparison_keys(statement)
+    result = {'rows': n_bank, 'vectorized_seconds': time.perf_counter() - start}
+    if row_wise:
+        start = time.perf_counter()
+        row_keys = statement.apply(create_bank_comparison_key, axis=1)
+        result['row_wise_seconds'] = time.perf_counter() - start
+        result['speedup'] = result['row_wise_seconds'] / max(result['vectorized_seconds'], 1e-9)
+        result['keys_equal'] = bool(keys.astype(object).equals(row_keys.astype(object)))
+    logger.info(f"Comparison keys of {n_bank} bank rows built in {result['vectorized_seconds']:.2f}s.")
+    return result
+
+
+def benchmark_key_codes(n_gl: int = BENCHMARK_COMPARISON_KEY_ROWS, seed: int = 0) -> dict:
+    """
+    Benchmarks the reconciliation joins on the key strings against joins on int64 codes
+    of one shared key dictionary: the GL vs bank outer merge of the match stage and the
+    outstanding checks vs bank left merge of the outstanding stage.
+
+    The code side includes building the dictionary over GL transaction numbers, bank
+    comparison keys, customer references and outstanding check numbers, and encoding
+    those columns once. Both sides must give the same key columns.
+
+    Args:
+        n_gl (int): GL rows of the generated dataset.
+        seed (int): Seed of the generated data.
+
+    Returns:
+        dict: 'rows', 'string_join_seconds', 'encode_seconds', 'code_join_seconds',
+              'code_total_seconds' and 'keys_equal'.
+    """
+    gl, bank, ost = generate_dataset(n_gl, seed=seed)
+    gl_cleaned, bank_cleaned = clean_stage(categorize_gl_with_bank(gl, bank), bank, MONEY_IN_CENTS)
+    gl_agg = aggregate_stage(gl_cleaned)
+
+    def joins(gl_on: str, bank_on: str, ost_on: str, reference_on: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        matched = pd.merge(gl_agg, bank_cleaned, left_on=gl_on, right_on=bank_on, how='outer')
+        cleared = pd.merge(ost, bank_cleaned, left_on=ost_on, right_on=reference_on, how='left',
+                           suffixes=('_ost', '_bank'))
+        return matched, cleared
+
+    start = time.perf_counter()
+    string_matched, string_cleared = joins(GL_TRANSACTION_NUMBER_COL, BANK_COMPARISON_KEY_COL,
+                                           OUTSTANDING_CHECK_NUMBER_COL, CUSTOMER_REFERENCE_COL)
+    string_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    key_dictionary = build_key_dictionary(gl_cleaned[GL_TRANSACTION_NUMBER_COL], bank_cleaned[BANK_COMPARISON_KEY_COL],
+                                          bank_cleaned[CUSTOMER_REFERENCE_COL], ost[OUTSTANDING_CHECK_NUMBER_COL])
+    gl_agg['gl_code'] = encode_keys(gl_agg[GL_TRANSACTION_NUMBER_COL], key_dictionary)
+    bank_cleaned['bank_code'] = encode_keys(bank_cleaned[BANK_COMPARISON_KEY_COL], key_dictionary)
+    bank_cleaned['reference_code'] = encode_keys(bank_cleaned[CUSTOMER_REFERENCE_COL], key_dictionary)
+    ost['ost_code'] = encode_keys(ost[OUTSTANDING_CHECK_NUMBER_COL], key_dictionary)
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    code_matched, code_cleared = joins('gl_code', 'bank_code', 'ost_code', 'reference_code')
+    code_seconds = time.perf_counter() - start
+
+    key_columns = [GL_TRANSACTION_NUMBER_COL, BANK_COMPARISON_KEY_COL]
+    result = {
+        'rows': n_gl,
+        'string_join_seconds': string_seconds,
+        'encode_seconds': encode_seconds,
+        'code_join_seconds': code_seconds,
+        'code_total_seconds': encode_seconds + code_seconds,
+        'keys_equal': bool(string_matched[key_columns].equals(code_matched[key_columns])
+                           and string_cleared[CUSTOMER_REFERENCE_COL].equals(code_cleared[CUSTOMER_REFERENCE_COL])),
+    }
+    logger.info(f"Key code joins of {n_gl} GL rows: {result['code_total_seconds']:.2f}s "
+                f"against {string_seconds:.2f}s on strings.")
+    return result
+
+
+# Stages of run_incremental_reconciliation that only process the day's delta; the others build the report
+INCREMENTAL_DELTA_STAGES = ['load_state', 'gl_delta', 'bank_delta', 'rematch']
+
+
+def benchmark_incremental(n_gl: int = BENCHMARK_INCREMENTAL_ROWS, days: int = BENCHMARK_INCREMENTAL_DAYS,
+                          seed: int = 0) -> dict:
+    """
+    Benchmarks the daily incremental runs of a month: a generated dataset is replayed as
+    runs on growing prefixes of the GL and the bank statement, followed by one more run
+    on unchanged inputs. Each run's time is split into the stages that process the delta
+    (INCREMENTAL_DELTA_STAGES) and the report stages, which work on the month to date.
+
+    Args:
+        n_gl (int): GL rows of the whole month.
+        days (int): Daily runs to replay the month in.
+        seed (int): Seed of the generated data.
+
+    Returns:
+        dict: 'rows', 'days' and 'runs', one dict per run with 'gl_rows', 'gl_new',
+              'bank_new', 'delta_seconds', 'report_seconds' and 'export_seconds'.
+    """
+    gl, bank, ost = generate_dataset(n_gl, seed=seed)
+    if MONEY_IN_CENTS: # the app converts at upload, before categorization
+        gl = money_columns_to_cents(gl, GL_MONEY_COLUMNS)
+        bank = money_columns_to_cents(bank, BANK_MONEY_COLUMNS)
+        ost = money_columns_to_cents(ost, OUTSTANDING_MONEY_COLUMNS)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_path = os.path.join(state_dir, 'state.sqlite')
+        for day in list(range(1, days + 1)) + [days]: # the last run sees no new rows
+            run_stats = {}
+            if run_incremental_reconciliation(gl.iloc[:len(gl) * day // days], bank.iloc[:len(bank) * day // days],
+                                              ost, state_path, stats=run_stats) is None:
+                raise RuntimeError(f"The incremental run of day {day} failed; see the log for details.")
+            timings = run_stats['timings']
+            delta_seconds = sum(seconds for stage, seconds in timings.items() if stage in INCREMENTAL_DELTA_STAGES)
+            runs.append({
+                'gl_rows': run_stats['rows']['gl_input'],
+                'gl_new': run_stats['rows']['gl_new'],
+                'bank_new': run_stats['rows']['bank_new'],
+                'delta_seconds': delta_seconds,
+                'report_seconds': sum(timings.values()) - delta_seconds,
+                'export_seconds': timings.get('export', 0.0),
+            })
+            logger.info(f"Incremental run {len(runs)}: {delta_seconds:.2f}s delta, "
+                        f"{runs[-1]['report_seconds']:.2f}s report.")
+    return {'rows': n_gl, 'days': days, 'runs': runs}
+
+
+def run_benchmarks(sizes: list, seed: int = 0, repeat: int = 1, options: dict | None = None,
+                   isolate: bool = True, log_level: str = 'WARNING') -> list:
+    """
+    Benchmarks each size in turn. With isolate, every size runs in a fresh worker
+    process, so its peak memory is its own and a crash (e.g. out of memory) is
+    recorded as a failed size instead of ending the suite.
+
+    Args:
+        sizes (list): GL row counts.
+        seed (int): Seed of the generated data.
+        repeat (int): Runs per size; the fastest is kept.
+        options (dict | None): Extra generate_dataset arguments.
+        isolate (bool): Run each size in its own process.
+        log_level (str): Logging level of the worker processes.
+
+    Returns:
+        list: One benchmark_size result per size.
+    """
+    results = []
+    for n_gl in sizes:
+        logger.info(f"Benchmarking {n_gl} GL rows.")
+        if not isolate:
+            results.append(benchmark_size(n_gl, seed, repeat, options))
+            continue
+        try:
+            with ProcessPoolExecutor(max_workers=1, initializer=configure_logging, initargs=(log_level,)) as executor:
+                results.append(executor.submit(benchmark_size, n_gl, seed, repeat, options).result())
+        except Exception as e:
+            logger.error(f"Benchmark worker for {n_gl} GL rows died: {e!r}")
+            results.append({'size': n_gl, 'seed': seed, 'repeat': repeat, 'options': options or {},
+                            'status': 'failed', 'error': repr(e)})
+    return results
+
+
+def benchmark_environment() -> dict:
+    """Describes the code version and machine a benchmark ran on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit, 'host': platform.node(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+    }
+
+
+def load_benchmark_history(path: str = BENCHMARK_HISTORY_FILE) -> list:
+    """Reads the benchmark history, oldest first. A missing file is an empty history."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def append_benchmark_history(results: list, environment: dict, path: str = BENCHMARK_HISTORY_FILE) -> None:
+    """
+    Appends benchmark results to the JSON Lines history, one line per size.
+
+    Args:
+        results (list): Results of run_benchmarks.
+        environment (dict): Output of benchmark_environment.
+        path (str): History file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    run_at = datetime.now().isoformat(timespec='seconds')
+    with open(path, 'a', encoding='utf-8') as handle:
+        for result in results:
+            handle.write(json.dumps({'run_at': run_at, 'environment': environment, **result}, default=str) + '\n')
+    logger.info(f"Appended {len(results)} benchmark results to {path}.")
+
+
+def previous_result(history: list, result: dict, environment: dict) -> dict | None:
+    """
+    Latest successful history entry comparable with result: same size, seed and
+    generator options, measured on the same host.
+    """
+    for entry in reversed(history):
+        if (entry.get('status') == 'ok' and entry.get('size') == result['size']
+                and entry.get('seed') == result['seed'] and entry.get('options') == result['options']
+                and entry.get('environment', {}).get('host') == environment['host']):
+            return entry
+    return None
+
+
+def find_regressions(result: dict, previous: dict | None, tolerance: float = BENCHMARK_REGRESSION_TOLERANCE,
+                     min_seconds: float = BENCHMARK_MIN_REGRESSION_SECONDS) -> list:
+    """
+    Lists the timings of result that are slower than in previous by more than tolerance
+    (as a share) and by at least min_seconds: the end-to-end time and every run stage
+    (steps at most one level deep, e.g. 'reconciliation/match').
+
+    Returns:
+        list: (metric, previous seconds, current seconds) tuples.
+    """
+    if previous is None or result.get('status') != 'ok':
+        return []
+    metrics = [('end_to_end', previous.get('end_to_end_seconds'), result.get('end_to_end_seconds'))]
+    metrics += [(step, previous.get('stages', {}).get(step), seconds)
+                for step, seconds in result.get('stages', {}).items() if step.count('/') <= 1]
+    return [(metric, before, after) for metric, before, after in metrics
+            if before is not None and after is not None
+            and after > before * (1 + tolerance) and after - before >= min_seconds]
+
+
+def format_results(results: list, previous: dict) -> str:
+    """Console table of the results, with the change against the previous run of each size."""
+    rows = []
+    for result in results:
+        before = previous.get(result['size'])
+        seconds = result.get('end_to_end_seconds')
+        stages = {step: s for step, s in result.get('stages', {}).items() if step.count('/') == 1 and s is not None}
+        slowest = sorted(stages.items(), key=lambda item: -item[1])[:3]
+        rows.append({
+            'GL rows': f"{result['size']:,}",
+            'status': result['status'],
+            'seconds': round(seconds, 2) if seconds is not None else None,
+            'previous': round(before['end_to_end_seconds'], 2) if before else None,
+            'change': f"{seconds / before['end_to_end_seconds'] - 1:+.0%}" if before and seconds else '',
+            'peak RSS MB': round(result['peak_rss_mb']) if result.get('peak_rss_mb') is not None else None,
+            'slowest stages': ', '.join(f"{step.split('/')[-1]} {s:.1f}s" for step, s in slowest),
+            'error': result.get('error', ''),
+        })
+    return pd.DataFrame(rows).to_string(index=False)
+
+
+def parse_args(argv: list | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark categorization and reconciliation on synthetic data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES, help="GL row counts to benchmark.")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per size; the fastest is kept.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--periods', type=int, default=1)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--history', default=BENCHMARK_HISTORY_FILE, help="JSON Lines file the results are appended to.")
+    parser.add_argument('--no-history', action='store_true', help="Compare with the history but do not append to it.")
+    parser.add_argument('--in-process', action='store_true', help="Run every size in this process instead of a fresh one.")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with 1 when a size failed or got slower than its previous run.")
+    parser.add_argument('--comparison-keys', action='store_true',
+                        help="Only benchmark the bank comparison keys against the row-wise apply.")
+    parser.add_argument('--key-rows', type=int, default=BENCHMARK_COMPARISON_KEY_ROWS,
+                        help="Bank statement rows of --comparison-keys, GL rows of --key-codes.")
+    parser.add_argument('--key-codes', action='store_true',
+                        help="Only benchmark the reconciliation joins on key strings against int64 key codes.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only benchmark daily incremental runs replaying a generated month.")
+    parser.add_argument('--incremental-rows', type=int, default=BENCHMARK_INCREMENTAL_ROWS,
+                        help="GL rows of the month replayed by --incremental.")
+    parser.add_argument('--days', type=int, default=BENCHMARK_INCREMENTAL_DAYS,
+                        help="Daily runs of --incremental; one more run follows on unchanged inputs.")
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args(argv)
+
+
+def main(argv: list | None = None) -> int:
+    """Command-line entry point. Returns 1 on failures or, with --fail-on-regression, regressions."""
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    if args.comparison_keys:
+        result = benchmark_comparison_keys(args.key_rows, seed=args.seed)
+        print(f"Comparison keys, {result['rows']:,} bank rows: {result['vectorized_seconds']:.2f}s vectorized, "
+              f"{result['row_wise_seconds']:.2f}s row-wise ({result['speedup']:.0f}x), "
+              f"keys {'equal' if result['keys_equal'] else 'DIFFERENT'}")
+        return 0 if result['keys_equal'] else 1
+    if args.key_codes:
+        result = benchmark_key_codes(args.key_rows, seed=args.seed)
+        print(f"Key code joins, {result['rows']:,} GL rows: {result['string_join_seconds']:.2f}s on strings, "
+              f"{result['code_total_seconds']:.2f}s on codes ({result['encode_seconds']:.2f}s encoding + "
+              f"{result['code_join_seconds']:.2f}s joins), keys {'equal' if result['keys_equal'] else 'DIFFERENT'}")
+        return 0 if result['keys_equal'] else 1
+    if args.incremental:
+        result = benchmark_incremental(args.incremental_rows, args.days, seed=args.seed)
+        print(f"Incremental runs, {result['rows']:,} GL rows in {result['days']} days plus a rerun without changes:")
+        print(pd.DataFrame(result['runs']).round(2).rename_axis('run').rename(lambda run: run + 1).to_string())
+        return 0
+
+    options = {'periods': args.periods, 'accounts': args.accounts}
+
+    environment = benchmark_environment()
+    history = load_benchmark_history(args.history)
+    results = run_benchmarks(args.sizes, seed=args.seed, repeat=args.repeat, options=options,
+                             isolate=not args.in_process, log_level=args.log_level)
+    previous = {result['size']: previous_result(history, result, environment) for result in results}
+    if not args.no_history:
+        append_benchmark_history(results, environment, args.history)
+
+    print(format_results(results, previous))
+    regressions = {result['size']: find_regressions(result, previous[result['size']]) for result in results}
+    for size, found in regressions.items():
+        for metric, before, after in found:
+            print(f"Regression at {size:,} GL rows: {metric} {before:.2f}s -> {after:.2f}s")
+
+    failed = any(result['status'] != 'ok' for result in results)
+    regressed = any(regressions.values())
+    return 1 if failed or (args.fail_on_regression and regressed) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
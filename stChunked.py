@@ -0,0 +1,415 @@
+import pandas as pd
+import io
+import os
+import glob
+import shutil
+import logging
+import tempfile
+
+from config import (
+    GL_TRANSACTION_NUMBER_COL, GL_ACCOUNTED_SUM_COL, GL_ACCOUNTED_CR_COL, GL_ACCOUNTED_DR_COL, GL_TYPE_COL,
+    BANK_COMPARISON_KEY_COL, OUTSTANDING_CHECK_NUMBER_COL,
+    GL_COLUMNS_REQUIRED, GL_COLUMN_TYPES, GL_VS_BANK_SHEET_NAME, OUTSTANDING_CHECK_SHEET_NAME,
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS, AGGREGATE_BANK_BEFORE_MATCH,
+    CHUNKED_MEMORY_BUDGET_MB, CHUNKED_PROBE_ROWS, CHUNKED_MIN_ROWS, CHUNKED_WORKING_SET_FACTOR,
+    CHUNKED_SPILL_DIR, CHUNKED_SPILL_PARTITIONS, AMOUNT_DATE_MATCH_ENABLED, BATCH_DEPOSIT_MATCH_ENABLED
+)
+from reconciliation_core import (
+    GL_AGGREGATE_KEYS, gl_outstanding_inputs, match_stage, outstanding_stage, pivots_stage, export_stage,
+    categorize_gl_with_bank, run_full_reconciliation
+)
+from stAmountDateMatch import gl_transaction_dates
+from stBankGL import clean_gl_data, clean_bank_data, rename_bank_trn_type, create_bank_comparison_keys
+from category_gl import gl_type
+from stMoney import money_columns_to_cents
+from stReadXl import iter_gl_sheet_chunks, compare_report_workbooks
+from stTimings import start_stage_clock
+from stProfile import profiled, profile_step, current_rss_bytes, MB
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_rows_for_budget(bytes_per_row: float, memory_budget_mb: float,
+                          working_set_factor: float = CHUNKED_WORKING_SET_FACTOR) -> int:
+    """
+    Rows per GL chunk so that a chunk and its working copies fit the memory budget.
+
+    Args:
+        bytes_per_row (float): Measured memory of one typed GL row, text included.
+        memory_budget_mb (float): Memory budget of the chunk phase in MB.
+        working_set_factor (float): Working memory of a chunk as a multiple of its own size.
+
+    Returns:
+        int: Rows per chunk, at least CHUNKED_MIN_ROWS.
+    """
+    rows = int(memory_budget_mb * MB / max(bytes_per_row * working_set_factor, 1))
+    return max(rows, CHUNKED_MIN_ROWS)
+
+
+def iter_frame_batches(batches, chunk_rows):
+    """
+    Regroups a stream of DataFrames into chunks of chunk_rows rows.
+
+    Args:
+        batches: Iterable of DataFrames with the same columns.
+        chunk_rows (int | Callable[[], int]): Rows per chunk, or a callable asked before each chunk.
+
+    Yields:
+        pd.DataFrame: Chunks of the concatenated stream, indexed by row position.
+    """
+    limit = lambda: chunk_rows() if callable(chunk_rows) else chunk_rows
+    pending, pending_rows, start, target = [], 0, 0, limit()
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += len(batch)
+        while pending_rows >= target:
+            frame = pd.concat(pending, ignore_index=True)
+            chunk, rest = frame.iloc[:target], frame.iloc[target:]
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            yield chunk
+            start += len(chunk)
+            pending, pending_rows, target = [rest], len(rest), limit()
+    if pending_rows or not start:
+        frame = pd.concat(pending, ignore_index=True) if pending else pd.DataFrame(columns=GL_COLUMNS_REQUIRED)
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        yield frame
+
+
+def iter_gl_chunks(gl_source, chunk_rows):
+    """
+    Streams a GL in chunks of typed rows.
+
+    Args:
+        gl_source: Path of a GL workbook (.xlsx) or Parquet file, or a typed GL DataFrame.
+        chunk_rows (int | Callable[[], int]): Rows per chunk, or a callable asked before each chunk.
+
+    Yields:
+        pd.DataFrame: Typed GL chunks, in row order.
+
+    Raises:
+        ValueError: If the source is a file of another type.
+    """
+    if isinstance(gl_source, pd.DataFrame):
+        yield from iter_frame_batches(
+            (gl_source.iloc[start:start + CHUNKED_PROBE_ROWS] for start in range(0, len(gl_source), CHUNKED_PROBE_ROWS)),
+            chunk_rows)
+        return
+    extension = os.path.splitext(str(gl_source))[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        yield from iter_gl_sheet_chunks(gl_source, chunk_rows)
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(gl_source)
+        columns = [col for col in GL_COLUMNS_REQUIRED + [GL_TYPE_COL] if col in parquet_file.schema_arrow.names]
+        batches = (batch.to_pandas().astype({col: dtype for col, dtype in GL_COLUMN_TYPES.items() if col in columns})
+                   for batch in parquet_file.iter_batches(batch_size=CHUNKED_PROBE_ROWS, columns=columns))
+        yield from iter_frame_batches(batches, chunk_rows)
+    else:
+        raise ValueError(f"Cannot stream a GL from '{gl_source}': expected an .xlsx or .parquet file.")
+
+
+def iter_budgeted_gl_chunks(gl_source, memory_budget_mb: float = CHUNKED_MEMORY_BUDGET_MB,
+                            chunk_rows: int | None = None, sizing: dict | None = None):
+    """
+    Streams a GL in chunks sized to a memory budget: the first chunk has
+    CHUNKED_PROBE_ROWS rows and its measured bytes per row size the others.
+
+    Args:
+        gl_source: GL workbook (.xlsx) or Parquet path, or a typed GL DataFrame.
+        memory_budget_mb (float): Memory budget of the chunk phase, used to size the chunks.
+        chunk_rows (int | None): Fixed rows per chunk instead of sizing them from the budget.
+        sizing (dict | None): If given, receives 'rows', the current rows per chunk.
+
+    Yields:
+        pd.DataFrame: Typed GL chunks, in row order.
+    """
+    sizing = sizing if sizing is not None else {}
+    sizing['rows'] = chunk_rows or CHUNKED_PROBE_ROWS
+    for chunk_number, gl_chunk in enumerate(iter_gl_chunks(gl_source, lambda: sizing['rows'])):
+        if chunk_number == 0 and chunk_rows is None and len(gl_chunk):
+            bytes_per_row = gl_chunk.memory_usage(index=True, deep=True).sum() / len(gl_chunk)
+            sizing['rows'] = chunk_rows_for_budget(bytes_per_row, memory_budget_mb)
+            logger.info(f"GL rows take {bytes_per_row:.0f} bytes; reading {sizing['rows']} rows per chunk.")
+        yield gl_chunk
+
+
+def prepare_bank_for_chunks(bank_df: pd.DataFrame, money_in_cents: bool) -> pd.DataFrame:
+    """
+    Cleans the bank statement as the clean stage does. The bank side stays in memory.
+
+    Args:
+        bank_df (pd.DataFrame): The raw Bank DataFrame. Not modified.
+        money_in_cents (bool): Convert money columns to exact int64 cents first.
+
+    Returns:
+        pd.DataFrame: Cleaned bank data with TRN TYPEs renamed and comparison keys.
+    """
+    if money_in_cents:
+        bank_df = money_columns_to_cents(bank_df, BANK_MONEY_COLUMNS)
+    bank_cleaned = clean_bank_data(bank_df.copy(deep=False))
+    bank_cleaned = rename_bank_trn_type(bank_cleaned)
+    bank_cleaned[BANK_COMPARISON_KEY_COL] = create_bank_comparison_keys(bank_cleaned)
+    return bank_cleaned
+
+
+def clean_gl_chunk(gl_chunk: pd.DataFrame, bank_cleaned: pd.DataFrame, missing_start: int,
+                   categorize: bool, money_in_cents: bool) -> tuple[pd.DataFrame, int]:
+    """
+    Cleans (and optionally categorizes) one GL chunk the way the clean stage treats the whole GL.
+
+    Args:
+        gl_chunk (pd.DataFrame): Typed GL rows. Not modified.
+        bank_cleaned (pd.DataFrame): Output of prepare_bank_for_chunks, for categorization.
+        missing_start (int): Next free missing transaction number.
+        categorize (bool): Assign the GL Type column.
+        money_in_cents (bool): Convert money columns to exact int64 cents first.
+
+    Returns:
+        tuple[pd.DataFrame, int]: Cleaned chunk and the next free missing transaction number.
+    """
+    if money_in_cents:
+        gl_chunk = money_columns_to_cents(gl_chunk, GL_MONEY_COLUMNS)
+    gl_cleaned, missing_start = clean_gl_data(gl_chunk.copy(deep=False), missing_start)
+    if categorize:
+        gl_cleaned = gl_type(gl_cleaned, bank_cleaned)
+    gl_cleaned[GL_ACCOUNTED_SUM_COL] = pd.to_numeric(gl_cleaned[GL_ACCOUNTED_SUM_COL], errors="coerce")
+    return gl_cleaned, missing_start
+
+
+def spill_partial_sums(gl_cleaned: pd.DataFrame, spill_dir: str, chunk_number: int, partitions: int) -> int:
+    """
+    Sums one cleaned chunk per aggregate key and writes the partial sums to Parquet,
+    hash-partitioned by transaction number so each partition can be merged on its own.
+
+    Args:
+        gl_cleaned (pd.DataFrame): Cleaned GL chunk.
+        spill_dir (str): Spill folder of the run.
+        chunk_number (int): Position of the chunk, used in the file names.
+        partitions (int): Number of hash partitions.
+
+    Returns:
+        int: Rows of partial sums written.
+    """
+    partial = gl_cleaned.groupby(GL_AGGREGATE_KEYS, as_index=False)[GL_ACCOUNTED_SUM_COL].sum()
+    buckets = pd.util.hash_array(partial[GL_TRANSACTION_NUMBER_COL].to_numpy(dtype=object)) % partitions
+    for bucket, part in partial.groupby(buckets, sort=False):
+        folder = os.path.join(spill_dir, 'aggregate', f"{bucket:03d}")
+        os.makedirs(folder, exist_ok=True)
+        part.to_parquet(os.path.join(folder, f"{chunk_number:06d}.parquet"), index=False)
+    return len(partial)
+
+
+def merge_partial_sums(spill_dir: str) -> pd.DataFrame:
+    """
+    Merges the spilled partial sums into the aggregated GL, one partition at a time.
+    Gives the same rows, in the same order, as the aggregate stage on the whole GL.
+
+    Args:
+        spill_dir (str): Spill folder of the run.
+
+    Returns:
+        pd.DataFrame: The aggregated GL, zero sums dropped.
+    """
+    merged = []
+    for folder in sorted(glob.glob(os.path.join(spill_dir, 'aggregate', '*'))):
+        parts = [pd.read_parquet(path) for path in sorted(glob.glob(os.path.join(folder, '*.parquet')))]
+        merged.append(pd.concat(parts, ignore_index=True)
+                      .groupby(GL_AGGREGATE_KEYS, as_index=False)[GL_ACCOUNTED_SUM_COL].sum())
+    if not merged:
+        return pd.DataFrame(columns=GL_AGGREGATE_KEYS + [GL_ACCOUNTED_SUM_COL])
+    gl_agg = pd.concat(merged, ignore_index=True).sort_values(GL_AGGREGATE_KEYS, ignore_index=True)
+    return gl_agg[gl_agg[GL_ACCOUNTED_SUM_COL] != 0].copy() # Filter out zero accounted sum
+
+
+def pivot_partial_sums(gl_cleaned: pd.DataFrame) -> pd.DataFrame:
+    """
+    Accounted CR and DR of one cleaned chunk summed per Type. The GL pivot of the
+    concatenated partials equals the GL pivot of the whole GL; rows without a Type
+    are kept, as they count in the pivot's Total row.
+    """
+    amounts = gl_cleaned[[GL_TYPE_COL, GL_ACCOUNTED_CR_COL, GL_ACCOUNTED_DR_COL]].copy()
+    for col in [GL_ACCOUNTED_CR_COL, GL_ACCOUNTED_DR_COL]:
+        amounts[col] = pd.to_numeric(amounts[col], errors='coerce').fillna(0)
+    return amounts.groupby(GL_TYPE_COL, as_index=False, dropna=False, sort=False).sum()
+
+
+def read_spilled_descriptions(spill_dir: str, check_numbers: pd.Index) -> pd.DataFrame:
+    """
+    Reads back the spilled GL transaction numbers and descriptions of the given checks, in GL row order.
+
+    Args:
+        spill_dir (str): Spill folder of the run.
+        check_numbers (pd.Index): Transaction numbers to keep.
+
+    Returns:
+        pd.DataFrame: 'Transaction Number' and 'Description' of every GL row of those checks.
+    """
+    parts = []
+    for path in sorted(glob.glob(os.path.join(spill_dir, 'descriptions', '*.parquet'))):
+        part = pd.read_parquet(path)
+        parts.append(part[part[GL_TRANSACTION_NUMBER_COL].isin(check_numbers)])
+    if not parts:
+        return pd.DataFrame(columns=[GL_TRANSACTION_NUMBER_COL, 'Description'])
+    return pd.concat(parts, ignore_index=True)
+
+
+@profiled('chunked_reconciliation')
+def run_chunked_reconciliation(gl_source, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame,
+                               categorize: bool | None = None,
+                               memory_budget_mb: float = CHUNKED_MEMORY_BUDGET_MB,
+                               chunk_rows: int | None = None,
+                               spill_dir: str | None = CHUNKED_SPILL_DIR,
+                               partitions: int = CHUNKED_SPILL_PARTITIONS,
+                               money_in_cents: bool = MONEY_IN_CENTS,
+                               aggregate_bank: bool = AGGREGATE_BANK_BEFORE_MATCH,
+                               amount_date_match: bool = AMOUNT_DATE_MATCH_ENABLED,
+                               batch_deposit_match: bool = BATCH_DEPOSIT_MATCH_ENABLED,
+                               stats: dict | None = None) -> io.BytesIO | None:
+    """
+    Reconciles a GL too large for memory. The GL is streamed in chunks that are cleaned,
+    categorized and reduced one at a time: partial sums per aggregate key are spilled to
+    Parquet and merged per hash partition at the end, and only the GL columns the pivots
+    and outstanding checks need are kept. Matching, outstanding checks, pivots and the
+    export then run on the reduced data with the regular stages.
+
+    The report equals run_full_reconciliation on the categorized GL (exactly so with money
+    in cents; float sums may differ in the last digits). The memory budget bounds the chunk
+    phase; the bank statement, the aggregated GL and the report sheets are held in memory
+    and grow with the number of distinct transactions.
+
+    Args:
+        gl_source: GL workbook (.xlsx) or Parquet path, or a typed GL DataFrame.
+        bank_df (pd.DataFrame): The typed Bank DataFrame.
+        outstanding_df (pd.DataFrame): The typed Outstanding Checks DataFrame.
+        categorize (bool | None): Categorize each chunk; None does so when the GL has no Type column.
+        memory_budget_mb (float): Memory budget of the chunk phase, used to size the chunks.
+        chunk_rows (int | None): Fixed rows per chunk instead of sizing them from the budget.
+        spill_dir (str | None): Parent folder of the run's spill folder; None uses the system temp folder.
+        partitions (int): Hash partitions of the spilled partial sums.
+        money_in_cents (bool): Run amounts as exact int64 cents and convert back to dollars at export.
+        aggregate_bank (bool): Aggregate bank lines per comparison key before matching.
+        amount_date_match (bool): Pair the rows left unmatched by transaction number on amount and date.
+        batch_deposit_match (bool): Match unmatched batch deposits with the GL rows summing to them.
+        stats (dict | None): If given, filled with 'timings', 'rows', 'comments' and 'chunks'
+                             (chunk count, rows per chunk, spilled rows, peak RSS seen).
+
+    Returns:
+        io.BytesIO | None: BytesIO object of the Excel report if successful, None otherwise.
+    """
+    logger.info(f"Starting chunked reconciliation with a {memory_budget_mb} MB budget.")
+    if stats is not None:
+        stats.update(timings={}, rows={}, comments={}, chunks={})
+    lap = start_stage_clock(stats['timings'] if stats is not None else None)
+    sizing = {}
+    run_spill_dir = None
+    try:
+        bank_cleaned = prepare_bank_for_chunks(bank_df, money_in_cents)
+        lap('clean_bank')
+
+        run_spill_dir = tempfile.mkdtemp(prefix='recon_chunks_', dir=spill_dir)
+        os.makedirs(os.path.join(run_spill_dir, 'descriptions'))
+        gl_rows, spilled_rows, missing_start, peak_rss = 0, 0, 1, 0
+        pivot_parts, party_parts, dateposted_parts, date_parts = [], [], [], []
+        chunk_number = -1
+        for chunk_number, gl_chunk in enumerate(iter_budgeted_gl_chunks(gl_source, memory_budget_mb, chunk_rows, sizing)):
+            if categorize is None:
+                categorize = GL_TYPE_COL not in gl_chunk.columns
+            with profile_step('chunk', inputs=gl_chunk) as record:
+                gl_cleaned, missing_start = clean_gl_chunk(gl_chunk, bank_cleaned, missing_start, categorize, money_in_cents)
+                spilled_rows += spill_partial_sums(gl_cleaned, run_spill_dir, chunk_number, partitions)
+                pivot_parts.append(pivot_partial_sums(gl_cleaned))
+                if amount_date_match or batch_deposit_match:
+                    date_parts.append(gl_transaction_dates(gl_cleaned))
+                party_rows, dateposted, descriptions = gl_outstanding_inputs(gl_cleaned)
+                party_parts.append(party_rows)
+                dateposted_parts.append(dateposted)
+                descriptions.to_parquet(os.path.join(run_spill_dir, 'descriptions', f"{chunk_number:06d}.parquet"), index=False)
+                if record is not None:
+                    record['outputs'] = pivot_parts[-1]
+            gl_rows += len(gl_chunk)
+            rss = current_rss_bytes() or 0
+            if rss > memory_budget_mb * MB > peak_rss:
+                logger.warning(f"Process memory {rss / MB:.0f} MB is over the {memory_budget_mb} MB chunk budget.")
+            peak_rss = max(peak_rss, rss)
+            del gl_chunk, gl_cleaned, party_rows, dateposted, descriptions
+        logger.info(f"Streamed {gl_rows} GL rows in {chunk_number + 1} chunks; spilled {spilled_rows} partial sums.")
+        lap('chunks')
+
+        gl_agg = merge_partial_sums(run_spill_dir)
+        lap('aggregate_gl')
+
+        gl_dates = pd.concat(date_parts).groupby(level=0).min() if date_parts else None
+        del date_parts
+        matched_gl_bank_with_comments, matched_gl_bank_formatted = match_stage(
+            gl_agg, bank_cleaned, aggregate_bank, money_in_cents, gl_dates,
+            amount_date_match, batch_deposit_match)
+        lap('match')
+
+        # Only the GL lines of checks that can appear on the outstanding sheet are read back
+        checks = matched_gl_bank_with_comments[matched_gl_bank_with_comments[GL_TYPE_COL] == 'Checks']
+        check_numbers = pd.Index(pd.concat([checks[GL_TRANSACTION_NUMBER_COL],
+                                            outstanding_df[OUTSTANDING_CHECK_NUMBER_COL]]).dropna().unique())
+        gl_outstanding = (
+            pd.concat(party_parts).drop_duplicates(),
+            pd.concat(dateposted_parts).drop_duplicates(),
+            read_spilled_descriptions(run_spill_dir, check_numbers),
+        )
+        ost_bank_chks_manualchecks = outstanding_stage(outstanding_df, gl_outstanding, bank_cleaned,
+                                                       matched_gl_bank_with_comments, money_in_cents)
+        lap('outstanding')
+
+        pivots = pivots_stage(pd.concat(pivot_parts, ignore_index=True), bank_cleaned, money_in_cents)
+        lap('pivots')
+
+        report_bytes = export_stage(matched_gl_bank_formatted, ost_bank_chks_manualchecks, pivots)
+        if report_bytes is None:
+            return None
+        lap('export')
+        if stats is not None:
+            stats['rows'] = {
+                'gl_input': gl_rows, 'bank_input': len(bank_df), 'outstanding_input': len(outstanding_df),
+                GL_VS_BANK_SHEET_NAME: len(matched_gl_bank_formatted),
+                OUTSTANDING_CHECK_SHEET_NAME: len(ost_bank_chks_manualchecks),
+            }
+            stats['comments'] = {str(comment): int(count) for comment, count in
+                                 matched_gl_bank_formatted['comment'].value_counts(dropna=False).items()}
+            stats['chunks'] = {'count': chunk_number + 1, 'rows_per_chunk': sizing['rows'],
+                               'spilled_partial_sums': spilled_rows, 'peak_rss_mb': round(peak_rss / MB, 1)}
+        return io.BytesIO(report_bytes)
+
+    except Exception as e:
+        logger.error(f"An unhandled error occurred during the chunked reconciliation: {e}", exc_info=True)
+        return None
+    finally:
+        if run_spill_dir is not None:
+            shutil.rmtree(run_spill_dir, ignore_errors=True)
+
+
+def check_chunked_equivalence(gl_df: pd.DataFrame, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame,
+                              chunk_rows: int, money_in_cents: bool = MONEY_IN_CENTS) -> dict:
+    """
+    Runs the chunked and the full reconciliation on the same inputs and compares every report sheet.
+    The chunked run categorizes the GL chunk by chunk; the full run categorizes it at once.
+
+    Args:
+        gl_df (pd.DataFrame): Typed GL, uncategorized.
+        bank_df (pd.DataFrame): Typed bank statement.
+        outstanding_df (pd.DataFrame): Typed outstanding checks.
+        chunk_rows (int): GL rows per chunk of the chunked run.
+        money_in_cents (bool): Run both on exact int64 cents instead of float dollars.
+
+    Returns:
+        dict: Sheet name -> None when equal, else the first difference found.
+    """
+    if money_in_cents: # the app converts at upload, before categorization
+        gl_df = money_columns_to_cents(gl_df, GL_MONEY_COLUMNS)
+        bank_df = money_columns_to_cents(bank_df, BANK_MONEY_COLUMNS)
+        outstanding_df = money_columns_to_cents(outstanding_df, OUTSTANDING_MONEY_COLUMNS)
+    categorized_gl = categorize_gl_with_bank(gl_df, bank_df)
+    full_report = run_full_reconciliation(categorized_gl, bank_df, outstanding_df, money_in_cents=money_in_cents,
+                                          use_stage_cache=False)
+    chunked_report = run_chunked_reconciliation(gl_df, bank_df, outstanding_df, chunk_rows=chunk_rows,
+                                                money_in_cents=money_in_cents)
+    if full_report is None or chunked_report is None:
+        raise RuntimeError("A reconciliation failed; see the log for details.")
+    return compare_report_workbooks(full_report, chunked_report)
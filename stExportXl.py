@@ -1,15 +1,17 @@
 import pandas as pd
-import streamlit as st
+from pandas.io.formats.style import Styler
 import io
 import logging
 
 # Import constants from config.py
 from config import (
-    COMMENT_FULL_MATCH, COMMENT_GL_YES_BANK_NO, COMMENT_PARTIAL_MATCH,
+    COMMENT_FULL_MATCH, COMMENT_GL_YES_BANK_NO, COMMENT_PARTIAL_MATCH, COMMENT_AMOUNT_DATE_MATCH,
+    COMMENT_BATCH_DEPOSIT_MATCH,
     HEADER_BG_COLOR_PIVOT, HEADER_TEXT_COLOR_PIVOT, DATA_CELL_BORDER_COLOR_PIVOT,
     HEADER_BG_COLOR_RECON, HEADER_TEXT_COLOR_RECON, DATA_CELL_BORDER_COLOR_RECON,
     GL_VS_BANK_SHEET_NAME,PARTY_NAME_SEARCH1,PARTY_NAME_SEARCH2, OUTSTANDING_CHECK_SHEET_NAME, CURRENCY_COLUMNS# Import sheet names
 )
+from stProfile import profiled
 
 logger = logging.getLogger(__name__)
 
@@ -31,9 +33,14 @@ def get_comment_format_style(comment: str) -> str:
         return 'background-color: blue; color: white'
     elif comment == COMMENT_PARTIAL_MATCH:
         return 'background-color: yellow; color: Black'
+    elif comment == COMMENT_AMOUNT_DATE_MATCH:
+        return 'background-color: lightgreen; color: Black'
+    elif comment == COMMENT_BATCH_DEPOSIT_MATCH:
+        return 'background-color: lightblue; color: Black'
     else:
         return 'background-color: red; color: white'
 
+@profiled()
 def write_reconciliation_summary_sheet(
     writer: pd.ExcelWriter,
     bank_pivot_df: pd.DataFrame,
@@ -228,9 +235,9 @@ def write_reconciliation_summary_sheet(
         return True
     except Exception as e:
         logger.error(f"Error writing combined summary sheet '{sheet_name}': {e}", exc_info=True)
-        st.error(f"An error occurred during Excel summary export: {e}")
         return False
 
+@profiled()
 def export_formatted_excel(dataframes_dict: dict, writer_obj: pd.ExcelWriter = None,
                            header_bg_color: str = HEADER_BG_COLOR_RECON,
                            header_text_color: str = HEADER_TEXT_COLOR_RECON) -> io.BytesIO | None:
@@ -299,12 +306,16 @@ def export_formatted_excel(dataframes_dict: dict, writer_obj: pd.ExcelWriter = N
         comment_blue_format = workbook.add_format({'bg_color': 'blue', 'font_color': 'white', 'border': 1, 'border_color': 'black'})
         comment_yellow_format = workbook.add_format({'bg_color': 'yellow', 'font_color': 'black', 'border': 1, 'border_color': 'black'})
         comment_red_format = workbook.add_format({'bg_color': 'red', 'font_color': 'white', 'border': 1, 'border_color': 'black'})
+        comment_light_green_format = workbook.add_format({'bg_color': '#90EE90', 'font_color': 'black', 'border': 1, 'border_color': 'black'})
+        comment_light_blue_format = workbook.add_format({'bg_color': '#ADD8E6', 'font_color': 'black', 'border': 1, 'border_color': 'black'})
 
         # Map comment values to xlsxwriter formats
         comment_formats = {
             COMMENT_FULL_MATCH: comment_green_format,
             COMMENT_GL_YES_BANK_NO: comment_blue_format,
             COMMENT_PARTIAL_MATCH: comment_yellow_format,
+            COMMENT_AMOUNT_DATE_MATCH: comment_light_green_format,
+            COMMENT_BATCH_DEPOSIT_MATCH: comment_light_blue_format,
             # Default for other comments (e.g., COMMENT_GL_NO_BANK_YES, COMMENT_TRANS_MATCH_DIFF_AMT)
             'default': comment_red_format
         }
@@ -319,7 +330,7 @@ def export_formatted_excel(dataframes_dict: dict, writer_obj: pd.ExcelWriter = N
 
         for sheet_name, df in dataframes_dict.items():
             # Ensure original_df_data is always a DataFrame, even if df is a Styler
-            if isinstance(df, pd.io.formats.style.Styler):
+            if isinstance(df, Styler):
                 original_df_data = df.data
             else:
                 original_df_data = df
@@ -425,7 +436,6 @@ def export_formatted_excel(dataframes_dict: dict, writer_obj: pd.ExcelWriter = N
 
     except Exception as e:
         logger.error(f"An error occurred during Excel export: {e}", exc_info=True)
-        st.error(f"An error occurred during Excel export: {e}")
         # If an error occurs and writer was created internally, ensure it's closed
         if created_writer_internally and writer:
             try:
@@ -433,4 +443,32 @@ def export_formatted_excel(dataframes_dict: dict, writer_obj: pd.ExcelWriter = N
                 logger.info("Internal ExcelWriter closed due to error.")
             except Exception as close_e:
                 logger.error(f"Error closing internal ExcelWriter after failure: {close_e}")
-        return None
\ No newline at end of file
+        return None
+
+
+@profiled()
+def dataframe_to_bytes(df: pd.DataFrame, file_format: str, sheet_name: str = 'Sheet1') -> bytes:
+    """
+    Serializes a DataFrame for download, without formatting.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to export.
+        file_format (str): 'xlsx', 'csv' or 'parquet'.
+        sheet_name (str): Sheet name, for 'xlsx' only.
+
+    Returns:
+        bytes: The file content.
+    """
+    if file_format == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    output = io.BytesIO()
+    if file_format == 'parquet':
+        # Object columns can mix text and numbers (e.g. 'NA' fills); Parquet needs one type per column
+        text_columns = {col: 'string' for col in df.columns[df.dtypes == object]}
+        df.astype(text_columns).to_parquet(output, index=False)
+    elif file_format == 'xlsx':
+        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    else:
+        raise ValueError(f"Unsupported download format '{file_format}'.")
+    return output.getvalue()
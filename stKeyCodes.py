@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_key_dictionary(*key_columns: pd.Series) -> pd.Index:
+    """
+    Builds a shared key dictionary over several key columns.
+
+    The dictionary holds every distinct key once, sorted, with missing keys last.
+    A key's code is its position in the dictionary, so codes compare in the same
+    order as the strings.
+
+    Args:
+        *key_columns (pd.Series): Key columns, e.g. GL transaction numbers,
+                                  bank comparison keys and outstanding check numbers.
+
+    Returns:
+        pd.Index: The sorted distinct keys.
+    """
+    values = pd.Series(np.concatenate([col.to_numpy(dtype=object) for col in key_columns]) if key_columns else [], dtype=object)
+    key_dictionary = pd.factorize(values, sort=True, use_na_sentinel=False)[1]
+    logger.info(f"Key dictionary built with {len(key_dictionary)} distinct keys from {len(values)} values.")
+    return pd.Index(key_dictionary, dtype=object)
+
+
+def encode_keys(key_column: pd.Series, key_dictionary: pd.Index) -> np.ndarray:
+    """
+    Encodes a key column as int64 codes of the key dictionary.
+
+    Args:
+        key_column (pd.Series): The key column to encode.
+        key_dictionary (pd.Index): Output of build_key_dictionary.
+
+    Returns:
+        np.ndarray: int64 code per row. Missing keys get the code of the missing-key entry.
+    """
+    values = key_column.to_numpy(dtype=object)
+    # NA/None are not found by get_indexer; the dictionary stores missing keys as NaN
+    values = np.where(pd.isna(values), np.nan, values)
+    codes = key_dictionary.get_indexer(values)
+    if (codes < 0).any():
+        raise ValueError(f"Column '{key_column.name}' has keys that are not in the key dictionary.")
+    return codes.astype(np.int64)
+
+
+def analyze_join_cardinality(left_keys: pd.Series, right_keys: pd.Series,
+                             key_dictionary: pd.Index | None = None, examples: int = 5) -> dict:
+    """
+    Analyzes the key cardinality of both sides of a join before it runs.
+
+    Reports duplicate keys on each side and the exact row count of the outer merge,
+    including how many of those rows come from fan-out (keys duplicated on both sides,
+    which produce every left x right combination).
+
+    Args:
+        left_keys (pd.Series): Join keys of the left side.
+        right_keys (pd.Series): Join keys of the right side.
+        key_dictionary (pd.Index | None): Shared key dictionary. Built from both key columns if None.
+        examples (int): Number of most duplicated keys to list per side.
+
+    Returns:
+        dict: Cardinality report.
+    """
+    if key_dictionary is None:
+        key_dictionary = build_key_dictionary(left_keys, right_keys)
+    left_counts = np.bincount(encode_keys(left_keys, key_dictionary), minlength=len(key_dictionary))
+    right_counts = np.bincount(encode_keys(right_keys, key_dictionary), minlength=len(key_dictionary))
+
+    matched = (left_counts > 0) & (right_counts > 0)
+    outer_rows = int(np.where(matched, left_counts * right_counts, left_counts + right_counts).sum())
+    fanout_rows = outer_rows - int(np.maximum(left_counts, right_counts).sum())
+
+    def duplicate_examples(counts: np.ndarray) -> dict:
+        top = np.argsort(counts)[::-1][:examples]
+        return {str(key_dictionary[i]): int(counts[i]) for i in top if counts[i] > 1}
+
+    return {
+        'left_rows': int(len(left_keys)),
+        'right_rows': int(len(right_keys)),
+        'matched_keys': int(matched.sum()),
+        'left_duplicate_keys': int((left_counts > 1).sum()),
+        'left_duplicate_rows': int(left_counts[left_counts > 1].sum()),
+        'right_duplicate_keys': int((right_counts > 1).sum()),
+        'right_duplicate_rows': int(right_counts[right_counts > 1].sum()),
+        'outer_merge_rows': outer_rows,
+        'fanout_rows': fanout_rows,
+        'left_duplicate_examples': duplicate_examples(left_counts),
+        'right_duplicate_examples': duplicate_examples(right_counts),
+    }
@@ -0,0 +1,109 @@
+import pandas as pd
+import numpy as np
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_KEYWORDS_PER_COLUMN = 63 # one bit per keyword in an int64 hit code
+
+
+def compile_keyword_matcher(keywords: list) -> tuple[re.Pattern, np.ndarray]:
+    """
+    Compiles a list of keywords into a single multi-pattern matcher.
+
+    The pattern is a zero-width lookahead alternation, so every start position is
+    tested and overlapping keywords are all found. Alternatives are ordered longest
+    first; when a keyword matches, every keyword that is a prefix of it matches at
+    the same position too, so their bits are implied by the longer match.
+
+    Args:
+        keywords (list): Keywords to match (case-insensitive, literal text).
+
+    Returns:
+        tuple[re.Pattern, np.ndarray]: The compiled pattern and, per alternative,
+                                       the bit mask of keywords it implies.
+    """
+    if len(keywords) > MAX_KEYWORDS_PER_COLUMN:
+        raise ValueError(f"At most {MAX_KEYWORDS_PER_COLUMN} keywords can be matched per column, got {len(keywords)}.")
+
+    lowered = [keyword.lower() for keyword in keywords]
+    order = sorted(range(len(lowered)), key=lambda i: len(lowered[i]), reverse=True)
+
+    alternatives = []
+    implied_bits = np.zeros(len(order), dtype=np.int64)
+    for group, i in enumerate(order):
+        alternatives.append(f"({re.escape(lowered[i])})")
+        for j, other in enumerate(lowered):
+            if lowered[i].startswith(other):
+                implied_bits[group] |= np.int64(1) << j
+
+    pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))")
+    return pattern, implied_bits
+
+
+def match_keywords(values: pd.Series, matcher: tuple[re.Pattern, np.ndarray]) -> np.ndarray:
+    """
+    Matches every row of a text column against a compiled keyword matcher.
+
+    Each distinct value is lowercased and scanned once; the results are
+    broadcast back to the rows by their factorized codes.
+
+    Args:
+        values (pd.Series): Text column to match.
+        matcher (tuple[re.Pattern, np.ndarray]): Output of compile_keyword_matcher.
+
+    Returns:
+        np.ndarray: int64 hit code per row. Bit i is set when keyword i (in the order
+                    given to compile_keyword_matcher) occurs in the row's text.
+                    Missing values have no hits.
+    """
+    pattern, implied_bits = matcher
+    codes, uniques = pd.factorize(values)
+
+    unique_hits = np.zeros(len(uniques) + 1, dtype=np.int64) # last slot holds missing values (code -1)
+    for position, text in enumerate(uniques):
+        hits = 0
+        for match in pattern.finditer(str(text).lower()):
+            hits |= int(implied_bits[match.lastindex - 1])
+        unique_hits[position] = hits
+    return unique_hits[codes]
+
+
+def build_keyword_hit_codes(df: pd.DataFrame, column_keywords: dict) -> dict:
+    """
+    Builds per-row keyword hit codes for several text columns, one pass per column.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+        column_keywords (dict): Column name -> list of keywords to match in that column.
+
+    Returns:
+        dict: Column name -> int64 hit code array aligned to df's rows.
+    """
+    hit_codes = {}
+    for col, keywords in column_keywords.items():
+        if col not in df.columns:
+            logger.warning(f"Column '{col}' not found for keyword matching. No hits recorded.")
+            hit_codes[col] = np.zeros(len(df), dtype=np.int64)
+            continue
+        hit_codes[col] = match_keywords(df[col], compile_keyword_matcher(keywords))
+    return hit_codes
+
+
+def keyword_mask(keywords: list, selected: list) -> int:
+    """
+    Returns the hit-code bit mask for a subset of a column's keywords.
+
+    Args:
+        keywords (list): The full keyword list of the column, as passed to compile_keyword_matcher.
+        selected (list): Keywords whose bits should be set.
+
+    Returns:
+        int: Bit mask with one bit per selected keyword.
+    """
+    lowered = [keyword.lower() for keyword in keywords]
+    mask = 0
+    for keyword in selected:
+        mask |= 1 << lowered.index(keyword.lower())
+    return mask
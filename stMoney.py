@@ -0,0 +1,95 @@
+import pandas as pd
+
+# df.attrs key listing the columns money_columns_to_cents has converted
+CENTS_COLUMNS_ATTR = 'cents_columns'
+
+
+def to_cents(values: pd.Series) -> pd.Series:
+    """
+    Converts a dollar amount column to exact integer cents.
+    The values are always taken as dollars, whatever their dtype; columns that are
+    already in cents are skipped by money_columns_to_cents, not here.
+
+    Args:
+        values (pd.Series): Dollar amounts (float, integer or text).
+
+    Returns:
+        pd.Series: Nullable Int64 cents; unparseable or missing amounts are <NA>.
+    """
+    dollars = pd.to_numeric(values, errors='coerce').astype('float64')
+    return (dollars * 100).round().astype('Int64')
+
+
+def to_dollars(values: pd.Series) -> pd.Series:
+    """
+    Converts a cents column back to float dollars, for export.
+
+    Args:
+        values (pd.Series): Amounts in cents.
+
+    Returns:
+        pd.Series: float64 dollars; missing amounts are NaN.
+    """
+    return pd.to_numeric(values, errors='coerce').astype('float64') / 100
+
+
+def cents_columns(df: pd.DataFrame) -> list:
+    """Returns the columns of df that money_columns_to_cents has already converted to cents."""
+    return list(df.attrs.get(CENTS_COLUMNS_ATTR, []))
+
+
+def convert_money_columns(df: pd.DataFrame, columns: list, to_cents_direction: bool) -> pd.DataFrame:
+    """
+    Converts the money columns of a DataFrame between dollars and cents.
+    Only the listed columns that exist in df are converted; df itself is not modified.
+
+    The converted frame records its cents columns in df.attrs, so converting it to
+    cents again leaves those columns alone instead of multiplying them by 100 twice.
+    pandas does not carry df.attrs through every merge, concat or file round trip, so
+    the dtype is checked as well: an Int64 column that is not marked, or a marked
+    column that is no longer Int64, raises instead of being converted.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+        columns (list): Candidate money columns.
+        to_cents_direction (bool): True for dollars -> cents, False for cents -> dollars.
+
+    Returns:
+        pd.DataFrame: A DataFrame sharing all other columns with df.
+
+    Raises:
+        ValueError: If a column's cents marker and its dtype disagree.
+    """
+    converted = df.copy(deep=False)
+    in_cents = cents_columns(df)
+    for col in columns:
+        if col not in converted.columns:
+            continue
+        if to_cents_direction:
+            # Dollar amounts are never read as Int64; only to_cents produces it
+            is_int64 = isinstance(converted[col].dtype, pd.Int64Dtype)
+            if col in in_cents:
+                if not is_int64:
+                    raise ValueError(f"Column '{col}' is marked as cents but has dtype {converted[col].dtype}.")
+                continue
+            if is_int64:
+                raise ValueError(f"Column '{col}' is already Int64 cents but its cents marker was lost "
+                                 f"(df.attrs['{CENTS_COLUMNS_ATTR}']); it would be converted twice.")
+            converted[col] = to_cents(converted[col])
+            in_cents.append(col)
+        else:
+            converted[col] = to_dollars(converted[col])
+            if col in in_cents:
+                in_cents.remove(col)
+    converted.attrs[CENTS_COLUMNS_ATTR] = in_cents
+    return converted
+
+
+def money_columns_to_cents(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Converts the listed dollar columns of df to Int64 cents; columns already converted are kept."""
+    return convert_money_columns(df, columns, to_cents_direction=True)
+
+
+def money_columns_to_dollars(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Converts the listed cents columns of df back to float dollars."""
+    return convert_money_columns(df, columns, to_cents_direction=False)
@@ -364,6 +364,19 @@ def update_descriptions_OST(final_ost:pd.DataFrame,gl_cleaned:pd.DataFrame) -> p
                         how='left', 
                         suffixes=('', '_gl'))
     
+    return fill_party_names_from_descriptions(ost_final_chks_desc_merged)
+
+def fill_party_names_from_descriptions(ost_final_chks_desc_merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fills the empty party names of the outstanding checks merged with their GL
+    descriptions, and drops the merged GL columns.
+
+    Args:
+    ost_final_chks_desc_merged: Outstanding checks left-merged with the GL 'Transaction Number' and 'Description'
+
+    Returns:
+    return ost_final_chks_desc_merged : with descriptions filled in empty party name column
+    """
     # Step 2: Fill missing values in 'description' column of ost_final with values from gl_cleaned
     ost_final_chks_desc_merged ['Party Name'] = ost_final_chks_desc_merged ['Party Name'].fillna(ost_final_chks_desc_merged ['Description'])
     
@@ -0,0 +1,180 @@
+import pandas as pd
+import io
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pandas.io.formats.style import Styler
+
+from config import PIPELINE_STAGE_CACHE_ENABLED, PIPELINE_STAGE_CACHE_MAX_ENTRIES, PIPELINE_STAGE_CACHE_MAX_BYTES
+from stProfile import annotate_step
+
+logger = logging.getLogger(__name__)
+
+# Stage key -> (stage result, its size in bytes), least recently used first
+_stage_cache = OrderedDict()
+_stage_cache_bytes = 0
+_stage_cache_lock = threading.Lock() # Streamlit sessions run in threads of one process
+
+
+def frame_fingerprint(df: pd.DataFrame | None) -> str:
+    """
+    Hashes the content of a DataFrame: column labels, dtypes, index and every value.
+
+    Args:
+        df (pd.DataFrame | None): The frame to hash. None hashes to a fixed key.
+
+    Returns:
+        str: Hex digest identifying the frame content.
+    """
+    digest = hashlib.sha256()
+    if df is None:
+        digest.update(b'None')
+        return digest.hexdigest()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def result_nbytes(obj, depth: int = 0) -> int:
+    """
+    Approximate memory held by a stage result: DataFrames and Series (text values
+    included), report buffers and bytes, inside tuples, lists and dicts three levels deep.
+
+    Args:
+        obj: A stage result.
+        depth (int): Current nesting level.
+
+    Returns:
+        int: Bytes; values of other types count as 0.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, io.BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, Styler):
+        return result_nbytes(obj.data, depth)
+    if depth < 3 and isinstance(obj, (list, tuple, dict)):
+        values = obj.values() if isinstance(obj, dict) else obj
+        return sum(result_nbytes(value, depth + 1) for value in values)
+    return 0
+
+
+def shallow_copy_result(obj):
+    """
+    Shallow copies the DataFrames and Series of a stage result, inside tuples and lists,
+    so a caller adding, replacing or dropping columns does not change the cached result.
+
+    Args:
+        obj: A stage result.
+
+    Returns:
+        The result with new frame objects sharing the cached data.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj.copy(deep=False)
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(shallow_copy_result(value) for value in obj)
+    return obj
+
+
+def stage_key(stage: str, input_keys: list, params: dict | None = None) -> str:
+    """
+    Builds the cache key of a stage run from the keys of its inputs and its parameters.
+
+    Args:
+        stage (str): Stage name.
+        input_keys (list): Fingerprints of root inputs or keys of upstream stages.
+        params (dict | None): Flags that change the stage output.
+
+    Returns:
+        str: Hex key naming the stage result.
+    """
+    fingerprint = json.dumps({'stage': stage, 'inputs': list(input_keys), 'params': params or {}},
+                             sort_keys=True, default=str)
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def run_cached_stage(stage: str, func, input_keys: list, params: dict | None = None,
+                     enabled: bool = PIPELINE_STAGE_CACHE_ENABLED,
+                     cache_log: dict | None = None,
+                     max_entries: int = PIPELINE_STAGE_CACHE_MAX_ENTRIES,
+                     max_bytes: int = PIPELINE_STAGE_CACHE_MAX_BYTES):
+    """
+    Runs one pipeline stage, or returns its cached result when the same stage already
+    ran on the same inputs with the same parameters.
+
+    Cached results are shared between runs. Callers get shallow copies of their frames
+    (see shallow_copy_result), so column changes stay local, but values are shared:
+    stages must not modify what they receive from upstream stages in place.
+    A None result is treated as a failure and not cached.
+    The least recently used results are evicted once the cache holds more than max_entries
+    results or max_bytes bytes; a result larger than max_bytes is not cached at all.
+
+    Args:
+        stage (str): Stage name, used in the key and in the log.
+        func: Zero-argument callable computing the stage result.
+        input_keys (list): Fingerprints of root inputs or keys of upstream stages.
+        params (dict | None): Flags that change the stage output.
+        enabled (bool): When False, always runs func.
+        cache_log (dict | None): If given, receives stage -> 'hit', 'miss' or 'off'.
+        max_entries (int): Stage results kept in memory.
+        max_bytes (int): Total size of the stage results kept in memory, see result_nbytes.
+
+    Returns:
+        tuple: (stage result, stage key). Pass the key to downstream stages as an input key.
+    """
+    key = stage_key(stage, input_keys, params)
+    if not enabled:
+        if cache_log is not None:
+            cache_log[stage] = 'off'
+        result = func()
+        annotate_step(stage, cache='off')
+        return result, key
+
+    with _stage_cache_lock:
+        hit = key in _stage_cache
+        if hit:
+            _stage_cache.move_to_end(key)
+            result = _stage_cache[key][0]
+    if hit:
+        logger.info(f"Stage cache hit: '{stage}' ({key[:12]}).")
+        if cache_log is not None:
+            cache_log[stage] = 'hit'
+        annotate_step(stage, cache='hit', seconds=0.0)
+        return shallow_copy_result(result), key
+
+    logger.info(f"Stage cache miss: '{stage}' ({key[:12]}). Running stage.")
+    if cache_log is not None:
+        cache_log[stage] = 'miss'
+    result = func()
+    annotate_step(stage, cache='miss')
+    if result is None:
+        return result, key
+    nbytes = result_nbytes(result)
+    if nbytes > max_bytes:
+        logger.info(f"Stage '{stage}' result of {nbytes / 1024 ** 2:.0f} MB exceeds the stage cache size. Not cached.")
+        return result, key
+    global _stage_cache_bytes
+    with _stage_cache_lock:
+        if key in _stage_cache: # another session stored it meanwhile
+            _stage_cache_bytes -= _stage_cache.pop(key)[1]
+        _stage_cache[key] = (result, nbytes)
+        _stage_cache_bytes += nbytes
+        while len(_stage_cache) > max_entries or _stage_cache_bytes > max_bytes:
+            _stage_cache_bytes -= _stage_cache.popitem(last=False)[1][1]
+    return shallow_copy_result(result), key
+
+
+def clear_stage_cache() -> None:
+    """Drops every cached stage result."""
+    global _stage_cache_bytes
+    with _stage_cache_lock:
+        _stage_cache.clear()
+        _stage_cache_bytes = 0
+    logger.info("Stage cache cleared.")
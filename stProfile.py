@@ -0,0 +1,268 @@
+import pandas as pd
+import os
+import sys
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pandas.io.formats.style import Styler
+
+from config import RUN_PROFILE_DIR, RUN_PROFILE_DEEP_MEMORY
+
+try:
+    import psutil
+except ImportError: # optional; RSS is read from /proc or getrusage without it
+    psutil = None
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# The run profile being recorded in this thread/context, and the path of open steps
+_active_profile = ContextVar('active_run_profile', default=None)
+_open_steps = ContextVar('open_profile_steps', default=())
+
+MB = 1024 ** 2
+
+
+def current_rss_bytes() -> int | None:
+    """Returns the resident set size of this process in bytes, None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> int | None:
+    """Returns the peak resident set size of this process so far in bytes, None if unknown."""
+    if psutil is not None and hasattr(psutil.Process().memory_info(), 'peak_wset'): # Windows
+        return psutil.Process().memory_info().peak_wset
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024 # kilobytes on Linux
+    return None
+
+
+def collect_frames(obj, depth: int = 0) -> list:
+    """
+    Finds the DataFrames in a step's inputs or outputs: frames, stylers, and frames
+    inside tuples, lists and dicts (three levels deep, e.g. a dict argument of a call).
+
+    Args:
+        obj: Any value.
+        depth (int): Current nesting level.
+
+    Returns:
+        list: The DataFrames found, each once.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return [obj]
+    if isinstance(obj, Styler):
+        return [obj.data]
+    if depth < 3 and isinstance(obj, (list, tuple, dict)):
+        values = obj.values() if isinstance(obj, dict) else obj
+        frames = {}
+        for value in values:
+            for frame in collect_frames(value, depth + 1):
+                frames[id(frame)] = frame
+        return list(frames.values())
+    return []
+
+
+def describe_frames(obj, deep: bool = RUN_PROFILE_DEEP_MEMORY) -> tuple[int | None, float | None]:
+    """
+    Row count and memory of the DataFrames in obj.
+
+    Args:
+        obj: Value searched with collect_frames.
+        deep (bool): Count the bytes of text values, not just their pointers. Slower on wide text columns.
+
+    Returns:
+        tuple[int | None, float | None]: Total rows and total MB, both None when obj holds no DataFrame.
+    """
+    frames = collect_frames(obj)
+    if not frames:
+        return None, None
+    rows = sum(len(frame) for frame in frames)
+    memory = sum(int(frame.memory_usage(index=True, deep=deep).sum()) for frame in frames)
+    return rows, round(memory / MB, 3)
+
+
+def memory_delta_mb(before: int | None, after: int | None) -> float | None:
+    """Difference of two byte counts in MB, None if either is unknown."""
+    if before is None or after is None:
+        return None
+    return round((after - before) / MB, 3)
+
+
+@contextmanager
+def run_profile(run: str):
+    """
+    Records a run profile: every profiled step executed inside the block, in start order.
+
+    Usage: with run_profile('reconciliation') as profile: run_full_reconciliation(...)
+
+    RSS figures are for the whole process, so steps of concurrent runs in other
+    threads (e.g. other Streamlit sessions) show up in them too.
+
+    Args:
+        run (str): Name of the run, e.g. 'reconciliation'.
+
+    Yields:
+        dict: The profile: 'run', 'started_at', 'steps' (list of step records),
+              and after the block 'total_seconds', 'rss_start_mb', 'rss_end_mb', 'peak_rss_mb'.
+    """
+    rss_start = current_rss_bytes()
+    profile = {
+        'run': run,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'pid': os.getpid(),
+        'rss_start_mb': round(rss_start / MB, 3) if rss_start is not None else None,
+        'steps': [],
+    }
+    profile_token = _active_profile.set(profile)
+    steps_token = _open_steps.set(())
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        _open_steps.reset(steps_token)
+        _active_profile.reset(profile_token)
+        rss_end, peak = current_rss_bytes(), peak_rss_bytes()
+        profile['total_seconds'] = round(time.perf_counter() - start, 4)
+        profile['rss_end_mb'] = round(rss_end / MB, 3) if rss_end is not None else None
+        profile['peak_rss_mb'] = round(peak / MB, 3) if peak is not None else None
+        logger.info(f"Run profile '{run}': {len(profile['steps'])} steps in {profile['total_seconds']:.2f}s.")
+
+
+@contextmanager
+def profile_step(step: str, inputs=None):
+    """
+    Records one step of the active run profile: wall time, rows and DataFrame memory
+    in and out, the RSS change and how far the step raised the process's peak RSS.
+    Does nothing outside run_profile.
+
+    Usage: with profile_step('merge', inputs=(gl, bank)) as record: record['outputs'] = merged
+
+    Args:
+        step (str): Step name. Nested steps are recorded as 'parent/child'.
+        inputs: The step's inputs, searched for DataFrames.
+
+    Yields:
+        dict | None: The step record; set 'outputs' on it to measure the result. None when not profiling.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        yield None
+        return
+
+    path = _open_steps.get() + (step,)
+    rows_in, mb_in = describe_frames(inputs)
+    record = {'step': '/'.join(path), 'depth': len(path) - 1, 'status': 'ok', 'rows_in': rows_in, 'frame_mb_in': mb_in}
+    profile['steps'].append(record) # appended at the start so parents precede their children
+    steps_token = _open_steps.set(path)
+    rss_before, peak_before = current_rss_bytes(), peak_rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record['status'] = 'error'
+        raise
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        _open_steps.reset(steps_token)
+        record['rss_delta_mb'] = memory_delta_mb(rss_before, current_rss_bytes())
+        record['peak_rss_delta_mb'] = memory_delta_mb(peak_before, peak_rss_bytes())
+        record['rows_out'], record['frame_mb_out'] = describe_frames(record.pop('outputs', None))
+
+
+def profiled(step: str | None = None):
+    """
+    Decorator recording each call of a function as a step of the active run profile.
+    Arguments are the step inputs and the return value its outputs. Outside run_profile
+    the function is called directly.
+
+    Args:
+        step (str | None): Step name. Defaults to the function name.
+    """
+    def decorate(func):
+        name = step or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_profile.get() is None:
+                return func(*args, **kwargs)
+            with profile_step(name, inputs=(args, kwargs)) as record:
+                result = func(*args, **kwargs)
+                record['outputs'] = result
+                return result
+        return wrapper
+    return decorate
+
+
+def annotate_step(step: str, **fields) -> None:
+    """
+    Adds fields to the latest record of a step directly under the current step, or
+    records it when it did not run (e.g. a stage served from cache). No-op outside run_profile.
+
+    Args:
+        step (str): Step name, as given to profile_step or profiled.
+        **fields: Values to store on the record, e.g. cache='hit'.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return
+    path = '/'.join(_open_steps.get() + (step,))
+    for record in reversed(profile['steps']):
+        if record['step'] == path:
+            record.update(fields)
+            return
+    profile['steps'].append({'step': path, 'depth': len(_open_steps.get()), 'status': 'ok', **fields})
+
+
+def write_run_profile(profile: dict, path: str | None = None) -> str:
+    """
+    Writes a run profile as JSON.
+
+    Args:
+        profile (dict): Profile yielded by run_profile.
+        path (str | None): Output file. Defaults to '<run>_<timestamp>_<pid>.json' in RUN_PROFILE_DIR.
+
+    Returns:
+        str: Path of the written file.
+    """
+    if path is None:
+        stamp = profile['started_at'].replace(':', '').replace('-', '')
+        path = os.path.join(RUN_PROFILE_DIR, f"{profile['run']}_{stamp}_{profile['pid']}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(profile, handle, indent=2, default=str)
+    logger.info(f"Run profile written to {path}.")
+    return path
+
+
+def profile_steps_frame(profile: dict) -> pd.DataFrame:
+    """
+    The steps of a run profile as a table, with nested steps indented, for display.
+
+    Args:
+        profile (dict): Profile yielded by run_profile.
+
+    Returns:
+        pd.DataFrame: One row per step.
+    """
+    columns = ['step', 'cache', 'seconds', 'rows_in', 'rows_out', 'frame_mb_in', 'frame_mb_out',
+               'rss_delta_mb', 'peak_rss_delta_mb', 'status']
+    steps = pd.DataFrame(profile['steps']).reindex(columns=columns)
+    if not steps.empty:
+        depths = pd.DataFrame(profile['steps'])['depth'].fillna(0).astype(int)
+        steps['step'] = ['  ' * depth + name.rsplit('/', 1)[-1] for depth, name in zip(depths, steps['step'])]
+    return steps
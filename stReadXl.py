@@ -0,0 +1,358 @@
+import pandas as pd
+import numpy as np
+import logging
+from array import array
+import openpyxl
+from openpyxl.cell.cell import ERROR_CODES
+
+from config import (
+    GL_FILE_SHEET_NAME, BANK_FILE_SHEET_NAME, OUTSTANDING_CHECK_REPORT_SHEET_NAME,
+    GL_COLUMNS_REQUIRED, GL_COLUMN_TYPES, BANK_COLUMNS_REQUIRED, BANK_COLUMN_TYPES,
+    OUTSTANDING_CHECK_COLUMN_TYPES, MISSING_VALUE_TEXT
+)
+
+logger = logging.getLogger(__name__)
+
+# Cell text that pd.read_excel treats as missing, plus Excel error values
+MISSING_CELL_TEXT = frozenset(MISSING_VALUE_TEXT) | frozenset(ERROR_CODES)
+
+# Sheets read from each workbook: sheet name -> (columns or None for all, column types)
+GL_WORKBOOK_SHEETS = {
+    GL_FILE_SHEET_NAME: (GL_COLUMNS_REQUIRED, GL_COLUMN_TYPES),
+    OUTSTANDING_CHECK_REPORT_SHEET_NAME: (None, OUTSTANDING_CHECK_COLUMN_TYPES),
+}
+BANK_WORKBOOK_SHEETS = {
+    BANK_FILE_SHEET_NAME: (BANK_COLUMNS_REQUIRED, BANK_COLUMN_TYPES),
+}
+# When the outstanding check report comes as its own workbook
+GL_SHEET_ONLY = {GL_FILE_SHEET_NAME: GL_WORKBOOK_SHEETS[GL_FILE_SHEET_NAME]}
+OUTSTANDING_WORKBOOK_SHEETS = {OUTSTANDING_CHECK_REPORT_SHEET_NAME: GL_WORKBOOK_SHEETS[OUTSTANDING_CHECK_REPORT_SHEET_NAME]}
+
+
+def cell_to_text(value):
+    """
+    Converts a raw openpyxl cell value to text the way pd.read_excel(dtype=str) does:
+    whole floats lose their '.0', dates print as 'YYYY-MM-DD HH:MM:SS' and
+    empty, NA-like or error cells are missing.
+
+    Args:
+        value: Cell value from openpyxl.
+
+    Returns:
+        str | float: The cell text, or NaN when the cell is missing.
+    """
+    if value is None or (isinstance(value, str) and value in MISSING_CELL_TEXT):
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def cell_to_float(value) -> float:
+    """
+    Converts a raw openpyxl cell value to float, as reading it as text and then
+    casting with astype(float) would.
+
+    Args:
+        value: Cell value from openpyxl.
+
+    Returns:
+        float: The number, or NaN when the cell is missing.
+
+    Raises:
+        ValueError: If the cell holds text that is not a number.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = cell_to_text(value)
+    return np.nan if isinstance(text, float) else float(text)
+
+
+def header_labels(header_row: tuple) -> list:
+    """
+    Builds column labels from a header row like pd.read_excel: blank headers become
+    'Unnamed: i' and repeated headers get '.1', '.2', ... suffixes.
+
+    Args:
+        header_row (tuple): Raw values of the sheet's first row.
+
+    Returns:
+        list: One label per header cell, up to the last non-blank header.
+    """
+    cells = list(header_row)
+    while cells and (cells[-1] is None or cells[-1] == ''):
+        cells.pop()
+
+    labels, seen = [], {}
+    for i, value in enumerate(cells):
+        if value is None or value == '':
+            label = f"Unnamed: {i}"
+        elif isinstance(value, float) and value.is_integer():
+            label = int(value)
+        else:
+            label = value
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        labels.append(label)
+    return labels
+
+
+def sheet_frame(columns: list, column_types: dict, values: list, start: int = 0) -> pd.DataFrame:
+    """
+    Builds the typed DataFrame of a run of sheet rows from their converted column values.
+
+    Args:
+        columns (list): Column labels, in output order.
+        column_types (dict): Column -> 'string' or 'float'. Other columns are text (object).
+        values (list): One list (array('d') for float columns) of values per column.
+        start (int): Position of the first row in the sheet data, used as the index start.
+
+    Returns:
+        pd.DataFrame: The typed rows.
+    """
+    data = {}
+    for col, column_values in zip(columns, values):
+        col_type = column_types.get(col)
+        if col_type == 'float':
+            data[col] = pd.Series(np.frombuffer(column_values, dtype=np.float64) if column_values else [], dtype='float64')
+        elif col_type is None:
+            data[col] = pd.Series(column_values, dtype=object)
+        else:
+            data[col] = pd.Series(column_values, dtype=object).astype(col_type)
+    frame = pd.DataFrame(data, columns=columns)
+    if start:
+        frame.index = pd.RangeIndex(start, start + len(frame))
+    return frame
+
+
+def iter_sheet_chunks(worksheet, columns: list | None, column_types: dict, chunk_rows=None):
+    """
+    Streams one worksheet as typed DataFrames of at most chunk_rows rows each.
+
+    Only the requested columns are kept and each cell is converted to its target
+    type as its row is read, so no all-text copy of the sheet is ever built.
+    Blank rows inside the data are kept as missing rows; trailing blank rows are
+    dropped, as pd.read_excel does. Chunks are indexed by their row position in
+    the sheet data, so concatenating them gives the whole sheet.
+
+    Args:
+        worksheet: A read-only openpyxl worksheet whose first row is the header.
+        columns (list | None): Columns to read, in output order. None reads every column.
+        column_types (dict): Column -> 'string' or 'float'. Other columns are read as text (object).
+        chunk_rows (int | Callable[[], int] | None): Rows per chunk, or a callable asked
+            before each chunk (so the size can be tuned while reading). None reads the
+            sheet as one chunk.
+
+    Yields:
+        pd.DataFrame: The typed rows of each chunk. An empty sheet yields one empty frame.
+
+    Raises:
+        KeyError: If a requested column is not in the header.
+    """
+    # Read-only sheets trust the stored dimensions, which some exporters get wrong
+    worksheet.reset_dimensions()
+    rows = worksheet.iter_rows(values_only=True)
+    labels = header_labels(next(rows, ()))
+
+    if columns is None:
+        columns = labels
+    missing = [col for col in list(columns) + list(column_types) if col not in labels]
+    if missing:
+        raise KeyError(f"{missing} not in sheet '{worksheet.title}'")
+
+    positions = [labels.index(col) for col in columns]
+    width = max(positions, default=-1) + 1
+    converters = [cell_to_float if column_types.get(col) == 'float' else cell_to_text for col in columns]
+
+    def data_rows():
+        """Sheet rows after the header, None for blank rows followed by data."""
+        blank_rows = 0
+        for row in rows:
+            if all(value is None or value == '' for value in row):
+                blank_rows += 1
+                continue
+            yield from [None] * blank_rows
+            blank_rows = 0
+            yield row + (None,) * (width - len(row)) if len(row) < width else row
+
+    def chunk_limit() -> int:
+        limit = chunk_rows() if callable(chunk_rows) else chunk_rows
+        return max(int(limit), 1) if limit else 0 # 0: no limit
+
+    def new_targets():
+        # Float columns go straight into a packed double array
+        values = [array('d') if column_types.get(col) == 'float' else [] for col in columns]
+        return values, list(zip(positions, converters, values))
+
+    values, targets = new_targets()
+    limit, count, start, emitted = chunk_limit(), 0, 0, False
+    for row in data_rows():
+        if row is None:
+            for _, convert, column_values in targets:
+                column_values.append(convert(None))
+        else:
+            for position, convert, column_values in targets:
+                column_values.append(convert(row[position]))
+        count += 1
+        if count == limit:
+            yield sheet_frame(columns, column_types, values, start)
+            emitted, start, count = True, start + count, 0
+            values, targets = new_targets()
+            limit = chunk_limit()
+    if count or not emitted:
+        yield sheet_frame(columns, column_types, values, start)
+
+
+def read_sheet(worksheet, columns: list | None, column_types: dict) -> pd.DataFrame:
+    """
+    Streams one worksheet into a typed DataFrame (see iter_sheet_chunks).
+
+    Args:
+        worksheet: A read-only openpyxl worksheet whose first row is the header.
+        columns (list | None): Columns to read, in output order. None reads every column.
+        column_types (dict): Column -> 'string' or 'float'. Other columns are read as text (object).
+
+    Returns:
+        pd.DataFrame: The typed sheet data.
+
+    Raises:
+        KeyError: If a requested column is not in the header.
+    """
+    return next(iter_sheet_chunks(worksheet, columns, column_types))
+
+
+def read_xlsx_sheets(file, sheets: dict) -> dict:
+    """
+    Opens a workbook once in read-only mode and streams every requested sheet from it.
+
+    Args:
+        file: Path or binary file-like object (e.g. a Streamlit upload).
+        sheets (dict): Sheet name -> (columns or None for all, column types dict).
+
+    Returns:
+        dict: Sheet name -> typed DataFrame.
+
+    Raises:
+        KeyError: If a sheet or a requested column does not exist.
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        frames = {}
+        for sheet_name, (columns, column_types) in sheets.items():
+            if sheet_name not in workbook.sheetnames:
+                raise KeyError(f"Worksheet named '{sheet_name}' not found")
+            frames[sheet_name] = read_sheet(workbook[sheet_name], columns, column_types)
+            logger.info(f"Read sheet '{sheet_name}': {frames[sheet_name].shape[0]} rows, {frames[sheet_name].shape[1]} columns.")
+        return frames
+    finally:
+        workbook.close()
+
+
+def iter_gl_sheet_chunks(gl_file, chunk_rows):
+    """
+    Streams the required columns of the GL sheet in chunks, for GLs too large to
+    hold in memory at once. The workbook stays open until the chunks are consumed.
+
+    Args:
+        gl_file: Path or file-like object of the GL workbook.
+        chunk_rows (int | Callable[[], int]): Rows per chunk (see iter_sheet_chunks).
+
+    Yields:
+        pd.DataFrame: Typed GL chunks, in sheet order.
+
+    Raises:
+        KeyError: If the GL sheet or a required column does not exist.
+    """
+    if hasattr(gl_file, 'seek'):
+        gl_file.seek(0)
+    workbook = openpyxl.load_workbook(gl_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        if GL_FILE_SHEET_NAME not in workbook.sheetnames:
+            raise KeyError(f"Worksheet named '{GL_FILE_SHEET_NAME}' not found")
+        columns, column_types = GL_WORKBOOK_SHEETS[GL_FILE_SHEET_NAME]
+        yield from iter_sheet_chunks(workbook[GL_FILE_SHEET_NAME], columns, column_types, chunk_rows)
+    finally:
+        workbook.close()
+
+
+def read_gl_workbook(gl_file) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads the GL sheet (required columns only) and the outstanding check sheet
+    from the GL workbook in one pass.
+
+    Args:
+        gl_file: Path or file-like object of the GL workbook.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Typed GL and outstanding check DataFrames.
+    """
+    frames = read_xlsx_sheets(gl_file, GL_WORKBOOK_SHEETS)
+    return frames[GL_FILE_SHEET_NAME], frames[OUTSTANDING_CHECK_REPORT_SHEET_NAME]
+
+
+def read_bank_workbook(bank_file) -> pd.DataFrame:
+    """
+    Reads the required columns of the bank sheet.
+
+    Args:
+        bank_file: Path or file-like object of the bank workbook.
+
+    Returns:
+        pd.DataFrame: Typed bank DataFrame.
+    """
+    return read_xlsx_sheets(bank_file, BANK_WORKBOOK_SHEETS)[BANK_FILE_SHEET_NAME]
+
+
+def read_gl_sheet(gl_file) -> pd.DataFrame:
+    """
+    Reads only the GL sheet, for GL workbooks without the outstanding check sheet.
+
+    Args:
+        gl_file: Path or file-like object of the GL workbook.
+
+    Returns:
+        pd.DataFrame: Typed GL DataFrame.
+    """
+    return read_xlsx_sheets(gl_file, GL_SHEET_ONLY)[GL_FILE_SHEET_NAME]
+
+
+def read_outstanding_workbook(outstanding_file) -> pd.DataFrame:
+    """
+    Reads the outstanding check sheet from a workbook of its own.
+
+    Args:
+        outstanding_file: Path or file-like object of the outstanding check workbook.
+
+    Returns:
+        pd.DataFrame: Typed outstanding check DataFrame.
+    """
+    return read_xlsx_sheets(outstanding_file, OUTSTANDING_WORKBOOK_SHEETS)[OUTSTANDING_CHECK_REPORT_SHEET_NAME]
+
+
+def compare_report_workbooks(expected_report, actual_report) -> dict:
+    """
+    Compares two reconciliation reports sheet by sheet, cell by cell, header rows included.
+
+    Args:
+        expected_report: Path or file-like object of the reference report.
+        actual_report: Path or file-like object of the report to check.
+
+    Returns:
+        dict: Sheet name -> None when equal, else the first difference found.
+              A sheet missing from either report is a difference.
+    """
+    expected = pd.read_excel(expected_report, sheet_name=None, header=None)
+    actual = pd.read_excel(actual_report, sheet_name=None, header=None)
+    differences = {}
+    for sheet in expected.keys() | actual.keys():
+        try:
+            pd.testing.assert_frame_equal(expected.get(sheet), actual.get(sheet))
+            differences[sheet] = None
+        except (AssertionError, TypeError) as e:
+            differences[sheet] = str(e)
+    return differences
@@ -0,0 +1,630 @@
+"""
+stSqlEngine.py
+
+SQLite reconciliation engine. The cleaned GL (streamed in chunks), the bank statement
+and the outstanding checks are bulk-loaded into a local SQLite database with indexes
+on transaction number, comparison key, customer reference and check number. The GL
+aggregation, the GL vs bank outer match with its variance and comments, and the
+outstanding check joins run as SQL; the database is left behind as a queryable
+result store when a path is given. The report equals the pandas engine's.
+
+Usage:
+    python stSqlEngine.py --rows 20000 [--seed 0] [--db result.sqlite]
+    python stSqlEngine.py --gl GL.xlsx --bank Bank.xlsx [--db result.sqlite]
+"""
+import os
+import io
+import sys
+import sqlite3
+import argparse
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+from config import (
+    GL_TRANSACTION_NUMBER_COL, GL_ACCOUNTED_SUM_COL, GL_ACCOUNTED_CR_COL, GL_ACCOUNTED_DR_COL, GL_TYPE_COL,
+    BANK_COMPARISON_KEY_COL, CUSTOMER_REFERENCE_COL, BANK_CREDIT_AMOUNT_COL, BANK_DEBIT_AMOUNT_COL,
+    OUTSTANDING_CHECK_NUMBER_COL, OUTSTANDING_AMOUNT_COL, OUTSTANDING_CLEARED_COL, DESCRIPTION_COL,
+    GL_NO_TRANS_NUMBER, NO_REFERENCE_NUMBER, COMMENT_GL_NO_BANK_YES, COMMENT_GL_YES_BANK_NO,
+    COMMENT_FULL_MATCH, COMMENT_PARTIAL_MATCH, GL_VS_BANK_SHEET_NAME, OUTSTANDING_CHECK_SHEET_NAME,
+    MONEY_IN_CENTS, GL_MONEY_COLUMNS, BANK_MONEY_COLUMNS, OUTSTANDING_MONEY_COLUMNS, MONEY_EXPORT_COLUMNS,
+    AGGREGATE_BANK_BEFORE_MATCH, CHUNKED_MEMORY_BUDGET_MB, CHUNKED_SPILL_DIR,
+    SQLITE_INSERT_BATCH_ROWS, SQLITE_CACHE_MB, AMOUNT_DATE_MATCH_ENABLED, BATCH_DEPOSIT_MATCH_ENABLED,
+    GL_TRANSACTION_DATE_COL
+)
+from reconciliation_core import (
+    GL_AGGREGATE_KEYS, categorize_gl_with_bank, run_full_reconciliation, match_unmatched_rows, format_gl_vs_bank_sheet,
+    pivots_stage, export_stage
+)
+from stBankGL import aggregate_bank_by_comparison_key
+from stAmountDateMatch import gl_transaction_dates
+from stOutstanding import (
+    get_party_dimension_table, process_outstanding_bank_checks, get_new_outstanding_from_gl,
+    consolidate_outstanding_checks, fill_party_names_from_descriptions
+)
+from stChunked import iter_budgeted_gl_chunks, prepare_bank_for_chunks, clean_gl_chunk
+from stMoney import money_columns_to_cents, money_columns_to_dollars
+from stReadXl import compare_report_workbooks
+from stTimings import start_stage_clock
+from stProfile import profiled
+
+logger = logging.getLogger(__name__)
+
+# Row position column added to every loaded table; SQL results are ordered by it like pandas keeps row order
+POSITION_COL = '_pos'
+
+
+def quote(name) -> str:
+    """Quotes a column or table name for SQL."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class CompensatedSum:
+    """
+    SQLite aggregate that sums floats with the Kahan compensation of pandas' groupby sum.
+    SQLite's GROUP BY sorter is stable, so each group is summed in rowid order, as pandas
+    sums it in row order, and dollar sums come out bit for bit the same.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        y = value - self.compensation
+        t = self.total + y
+        self.compensation = t - self.total - y
+        if self.compensation != self.compensation: # an infinite value makes it NaN
+            self.compensation = 0.0
+        self.total = t
+
+    def finalize(self):
+        return self.total
+
+
+def register_sql_functions(conn: sqlite3.Connection) -> None:
+    """Adds the functions the engine's SQL uses to a connection."""
+    conn.create_aggregate('compensated_sum', 1, CompensatedSum)
+
+
+def money_sum(column: str, money_in_cents: bool) -> str:
+    """
+    SQL sum of a money column: exact integer SUM on cents, compensated_sum on float dollars.
+
+    Args:
+        column (str): Column name, unquoted.
+        money_in_cents (bool): The column holds int64 cents.
+
+    Returns:
+        str: The SQL expression.
+    """
+    return f'{"SUM" if money_in_cents else "compensated_sum"}({quote(column)})'
+
+
+def merged_column_names(left_columns: list, right_columns: list, suffixes: tuple) -> tuple[list, list]:
+    """
+    Column names of a merge on differently named keys, as pd.merge gives them:
+    names present on both sides get the suffixes.
+
+    Returns:
+        tuple[list, list]: Output names of the left and of the right columns.
+    """
+    overlap = set(left_columns) & set(right_columns)
+    return ([col + suffixes[0] if col in overlap else col for col in left_columns],
+            [col + suffixes[1] if col in overlap else col for col in right_columns])
+
+
+def merged_key_dtypes(left_dtype, right_dtype) -> tuple:
+    """Like pd.merge, key columns of different dtypes both come back as object."""
+    return (left_dtype, right_dtype) if left_dtype == right_dtype else (object, object)
+
+
+def open_result_store(db_path: str | None) -> tuple[sqlite3.Connection, str]:
+    """
+    Creates a fresh SQLite database for one run.
+
+    Args:
+        db_path (str | None): Database file; an existing file is replaced. None creates a temporary file.
+
+    Returns:
+        tuple[sqlite3.Connection, str]: The connection and the database path.
+    """
+    if db_path is None:
+        handle, db_path = tempfile.mkstemp(prefix='recon_', suffix='.sqlite', dir=CHUNKED_SPILL_DIR)
+        os.close(handle)
+    else:
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    register_sql_functions(conn)
+    # The store is rebuilt by every run, so it needs no rollback journal or fsyncs
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute(f'PRAGMA cache_size=-{int(SQLITE_CACHE_MB * 1024)}')
+    return conn, db_path
+
+
+def load_frame(conn: sqlite3.Connection, table: str, df: pd.DataFrame, start: int = 0) -> None:
+    """
+    Appends a DataFrame to a table (created from the first frame), with a row position column.
+
+    Args:
+        conn (sqlite3.Connection): Result store.
+        table (str): Table name.
+        df (pd.DataFrame): Rows to load. Not modified.
+        start (int): Position of the first row.
+    """
+    positioned = df.copy(deep=False)
+    positioned.columns = [str(col) for col in positioned.columns]
+    positioned.insert(0, POSITION_COL, np.arange(start, start + len(df), dtype=np.int64))
+    positioned.to_sql(table, conn, if_exists='append', index=False, chunksize=SQLITE_INSERT_BATCH_ROWS)
+
+
+def create_index(conn: sqlite3.Connection, table: str, column: str) -> None:
+    """Indexes one column of a table."""
+    conn.execute(f'CREATE INDEX {quote(f"{table}_{column}")} ON {quote(table)} ({quote(column)})')
+
+
+def restore_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Casts query results back to the dtypes the pandas engine has; missing values of
+    object columns become NaN, as after a pandas merge.
+
+    Args:
+        df (pd.DataFrame): Query result. Modified in place.
+        dtypes (dict): Column -> dtype. Columns not in df are ignored.
+
+    Returns:
+        pd.DataFrame: df.
+    """
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+        if dtype == object:
+            values = df[col].astype(object)
+            df[col] = values.where(values.notna(), np.nan)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def fetch(conn: sqlite3.Connection, sql: str, dtypes: dict, params: tuple = ()) -> pd.DataFrame:
+    """Runs a query into a DataFrame without the position column, with dtypes restored."""
+    result = pd.read_sql_query(sql, conn, params=params)
+    result = result.drop(columns=[POSITION_COL], errors='ignore')
+    return restore_dtypes(result, dtypes)
+
+
+def table_rows(conn: sqlite3.Connection, table: str) -> int:
+    """Row count of a table."""
+    return conn.execute(f'SELECT COUNT(*) FROM {quote(table)}').fetchone()[0]
+
+
+def sql_aggregate_gl(conn: sqlite3.Connection, money_in_cents: bool) -> None:
+    """
+    Builds table gl_agg: the accounted sum per aggregate key, zero sums dropped, in key order.
+    Same rows, order and sums as the aggregate stage (groupby drops rows with a missing key).
+    """
+    keys = ', '.join(quote(col) for col in GL_AGGREGATE_KEYS)
+    total = f'COALESCE({money_sum(GL_ACCOUNTED_SUM_COL, money_in_cents)}, 0)'
+    conn.execute(f'''
+        CREATE TABLE gl_agg AS
+        SELECT ROW_NUMBER() OVER (ORDER BY {keys}) - 1 AS {POSITION_COL}, {keys}, {total} AS {quote(GL_ACCOUNTED_SUM_COL)}
+        FROM gl
+        WHERE {' AND '.join(f'{quote(col)} IS NOT NULL' for col in GL_AGGREGATE_KEYS)}
+        GROUP BY {keys}
+        HAVING {total} != 0
+    ''')
+    create_index(conn, 'gl_agg', GL_TRANSACTION_NUMBER_COL)
+    logger.info(f"GL aggregated in SQL to {table_rows(conn, 'gl_agg')} rows.")
+
+
+def sql_match_gl_bank(conn: sqlite3.Connection, gl_agg_columns: list, bank_columns: list) -> None:
+    """
+    Builds table matched: the outer match of gl_agg with bank_match on transaction number
+    and comparison key, with 'Bnk Accounted Sum', 'variance' and 'comment' computed as in
+    calculate_variance_and_comments. Rows come in pd.merge(how='outer') order: by key,
+    then GL row, then bank row.
+    """
+    gl_names, bank_names = merged_column_names(gl_agg_columns, bank_columns, ('_x', '_y'))
+    gl_key, bank_key = quote(GL_TRANSACTION_NUMBER_COL), quote(BANK_COMPARISON_KEY_COL)
+    credit = f'COALESCE(b.{quote(BANK_CREDIT_AMOUNT_COL)}, 0)'
+    debit = f'COALESCE(b.{quote(BANK_DEBIT_AMOUNT_COL)}, 0)'
+    filled = {
+        GL_ACCOUNTED_SUM_COL: f'COALESCE(g.{quote(GL_ACCOUNTED_SUM_COL)}, 0)',
+        BANK_CREDIT_AMOUNT_COL: credit,
+        BANK_DEBIT_AMOUNT_COL: debit,
+        GL_TRANSACTION_NUMBER_COL: f"COALESCE(g.{gl_key}, '{GL_NO_TRANS_NUMBER}')",
+        BANK_COMPARISON_KEY_COL: f"COALESCE(b.{bank_key}, '{NO_REFERENCE_NUMBER}')",
+    }
+    select = [f'{filled.get(col, f"g.{quote(col)}")} AS {quote(name)}' for col, name in zip(gl_agg_columns, gl_names)]
+    select += [f'{filled.get(col, f"b.{quote(col)}")} AS {quote(name)}' for col, name in zip(bank_columns, bank_names)]
+    variance = f'({filled[GL_ACCOUNTED_SUM_COL]} - ({credit} + {debit}))'
+    select += [
+        f"{credit} + {debit} AS {quote('Bnk Accounted Sum')}",
+        f'{variance} AS variance',
+        f'''CASE WHEN {filled[GL_TRANSACTION_NUMBER_COL]} = '{GL_NO_TRANS_NUMBER}' THEN '{COMMENT_GL_NO_BANK_YES}'
+                 WHEN {filled[BANK_COMPARISON_KEY_COL]} = '{NO_REFERENCE_NUMBER}' THEN '{COMMENT_GL_YES_BANK_NO}'
+                 WHEN {variance} = 0 THEN '{COMMENT_FULL_MATCH}'
+                 ELSE '{COMMENT_PARTIAL_MATCH}' END AS comment''',
+    ]
+    # Outer join as the left join plus the bank rows without a GL match
+    conn.execute(f'''
+        CREATE TABLE matched AS
+        WITH joined AS (
+            SELECT g.{POSITION_COL} AS g_pos, b.{POSITION_COL} AS b_pos, COALESCE(g.{gl_key}, b.{bank_key}) AS join_key,
+                   {', '.join(select)}
+            FROM gl_agg g LEFT JOIN bank_match b ON b.{bank_key} = g.{gl_key}
+            UNION ALL
+            SELECT NULL, b.{POSITION_COL}, b.{bank_key}, {', '.join(select)}
+            FROM bank_match b LEFT JOIN gl_agg g ON g.{gl_key} = b.{bank_key}
+            WHERE g.{POSITION_COL} IS NULL
+        )
+        SELECT ROW_NUMBER() OVER (ORDER BY join_key IS NULL, join_key, g_pos, b_pos) - 1 AS {POSITION_COL},
+               {', '.join(quote(name) for name in gl_names + bank_names + ['Bnk Accounted Sum', 'variance', 'comment'])}
+        FROM joined
+    ''')
+    create_index(conn, 'matched', 'comment')
+    logger.info(f"GL and bank matched in SQL: {table_rows(conn, 'matched')} rows.")
+
+
+def sql_outstanding_bank_checks(conn: sqlite3.Connection, outstanding_columns: list, bank_columns: list) -> str:
+    """
+    SQL of process_outstanding_bank_checks: outstanding checks (without 'Manual Checks')
+    left-joined with the bank lines on check number and customer reference, amounts
+    filled with 0, variance, updated status and 'Cleared?'.
+
+    Returns:
+        str: The query, ordered like the pandas left merge.
+    """
+    ost_names, bank_names = merged_column_names(outstanding_columns, bank_columns, ('_ost', '_bank'))
+    sources = [(f'o.{quote(col)}', name) for col, name in zip(outstanding_columns, ost_names)]
+    sources += [(f'b.{quote(col)}', name) for col, name in zip(bank_columns, bank_names)]
+    expressions = {name: source for source, name in sources}
+    for col in [OUTSTANDING_AMOUNT_COL, BANK_CREDIT_AMOUNT_COL, BANK_DEBIT_AMOUNT_COL]:
+        if col in expressions:
+            expressions[col] = f'COALESCE({expressions[col]}, 0)'
+
+    variance = (f'CASE WHEN {expressions[CUSTOMER_REFERENCE_COL]} IS NOT NULL THEN '
+                f'{expressions[OUTSTANDING_AMOUNT_COL]} - {expressions[BANK_CREDIT_AMOUNT_COL]} - {expressions[BANK_DEBIT_AMOUNT_COL]} END')
+    status = (f"CASE WHEN ({variance}) IS NULL THEN 'check not cleared' WHEN ({variance}) = 0 THEN 'Check cleared' "
+              f"ELSE 'Check cleared but difference in transaction amount' END")
+    # Assigned columns replace existing ones in place and are appended otherwise
+    expressions['variance'] = variance
+    expressions['updated status'] = status
+    expressions[OUTSTANDING_CLEARED_COL] = f"CASE WHEN ({status}) = 'Check cleared' THEN 'yes' ELSE 'no' END"
+
+    return f'''
+        SELECT {', '.join(f'{expression} AS {quote(name)}' for name, expression in expressions.items())}
+        FROM outstanding o LEFT JOIN bank b ON b.{quote(CUSTOMER_REFERENCE_COL)} = o.{quote(OUTSTANDING_CHECK_NUMBER_COL)}
+        WHERE o.{quote(OUTSTANDING_CHECK_NUMBER_COL)} IS NOT 'Manual Checks'
+        ORDER BY o.{POSITION_COL}, b.{POSITION_COL}
+    '''
+
+
+def sql_outstanding_descriptions(conn: sqlite3.Connection, final_ost: pd.DataFrame, gl_dtypes: dict) -> pd.DataFrame:
+    """
+    update_descriptions_OST as SQL: the consolidated outstanding checks left-joined with
+    the GL lines on check number and transaction number, then party names filled.
+
+    Only the check numbers are loaded; the join returns row positions and the GL columns,
+    so the mixed-type outstanding columns never pass through SQLite.
+
+    Args:
+        conn (sqlite3.Connection): Result store holding table gl.
+        final_ost (pd.DataFrame): Output of consolidate_outstanding_checks.
+        gl_dtypes (dict): dtypes of the cleaned GL columns.
+
+    Returns:
+        pd.DataFrame: The outstanding check sheet, before conversion to dollars.
+    """
+    load_frame(conn, 'outstanding_final_keys', final_ost[[OUTSTANDING_CHECK_NUMBER_COL]])
+    joined = pd.read_sql_query(f'''
+        SELECT k.{POSITION_COL} AS left_pos, g.{quote(GL_TRANSACTION_NUMBER_COL)}, g.{quote(DESCRIPTION_COL)}
+        FROM outstanding_final_keys k
+        LEFT JOIN gl g ON g.{quote(GL_TRANSACTION_NUMBER_COL)} = k.{quote(OUTSTANDING_CHECK_NUMBER_COL)}
+        ORDER BY k.{POSITION_COL}, g.{POSITION_COL}
+    ''', conn)
+
+    left_dtype, right_dtype = merged_key_dtypes(final_ost[OUTSTANDING_CHECK_NUMBER_COL].dtype,
+                                                gl_dtypes[GL_TRANSACTION_NUMBER_COL])
+    left = final_ost.take(joined['left_pos'].to_numpy()).reset_index(drop=True)
+    left[OUTSTANDING_CHECK_NUMBER_COL] = left[OUTSTANDING_CHECK_NUMBER_COL].astype(left_dtype)
+    right = restore_dtypes(joined.drop(columns=['left_pos']),
+                           {GL_TRANSACTION_NUMBER_COL: right_dtype, DESCRIPTION_COL: gl_dtypes[DESCRIPTION_COL]})
+    left.columns, right.columns = merged_column_names(list(left.columns), list(right.columns), ('', '_gl'))
+    return fill_party_names_from_descriptions(pd.concat([left, right], axis=1))
+
+
+def matched_column_dtypes(gl_dtypes: dict, bank_dtypes: dict) -> dict:
+    """
+    dtypes of the matched rows as match_stage returns them, from the cleaned GL and the
+    matched bank columns.
+
+    Args:
+        gl_dtypes (dict): dtypes of the cleaned GL columns.
+        bank_dtypes (dict): dtypes of the bank columns matched against.
+
+    Returns:
+        dict: Column -> dtype of the table matched.
+    """
+    gl_key_dtype, bank_key_dtype = merged_key_dtypes(gl_dtypes[GL_TRANSACTION_NUMBER_COL], bank_dtypes[BANK_COMPARISON_KEY_COL])
+    amount_dtype = (pd.Series(dtype=gl_dtypes[GL_ACCOUNTED_SUM_COL])
+                    - pd.Series(dtype=bank_dtypes[BANK_CREDIT_AMOUNT_COL])).dtype
+    return {**{col: gl_dtypes[col] for col in GL_AGGREGATE_KEYS + [GL_ACCOUNTED_SUM_COL]}, **bank_dtypes,
+            GL_TRANSACTION_NUMBER_COL: gl_key_dtype, BANK_COMPARISON_KEY_COL: bank_key_dtype,
+            'Bnk Accounted Sum': bank_dtypes[BANK_CREDIT_AMOUNT_COL], 'variance': amount_dtype, 'comment': object}
+
+
+def sql_unmatched_gl_dates(conn: sqlite3.Connection, gl_dtypes: dict) -> pd.Series:
+    """
+    gl_transaction_dates of the GL transactions that table matched leaves unmatched,
+    read from table gl.
+    """
+    date_cols = ', '.join(quote(col) for col in [GL_TRANSACTION_NUMBER_COL, GL_TRANSACTION_DATE_COL])
+    return gl_transaction_dates(fetch(conn, f'''
+        SELECT {date_cols} FROM gl WHERE {quote(GL_TRANSACTION_NUMBER_COL)} IN (
+            SELECT {quote(GL_TRANSACTION_NUMBER_COL)} FROM matched WHERE comment = ?)
+        GROUP BY {date_cols}''', gl_dtypes, (COMMENT_GL_YES_BANK_NO,)))
+
+
+def sql_outstanding_sheet(conn: sqlite3.Connection, outstanding_df: pd.DataFrame, bank_cleaned: pd.DataFrame,
+                          matched_gl_bank_with_comments: pd.DataFrame, gl_dtypes: dict,
+                          money_in_cents: bool) -> pd.DataFrame:
+    """
+    The outstanding stage with its joins against tables bank and gl run in SQL. The
+    outstanding checks are (re)loaded as table outstanding.
+
+    Args:
+        conn (sqlite3.Connection): Store holding tables gl and bank.
+        outstanding_df (pd.DataFrame): The typed Outstanding Checks DataFrame, in cents when money_in_cents.
+        bank_cleaned (pd.DataFrame): Cleaned bank lines; only their columns and dtypes are read
+                                     when the outstanding sheet has its check number and amount.
+        matched_gl_bank_with_comments (pd.DataFrame): The matched rows, after the passes over the unmatched rows.
+        gl_dtypes (dict): dtypes of the cleaned GL columns.
+        money_in_cents (bool): Amounts are cents; the sheet is converted back to dollars.
+
+    Returns:
+        pd.DataFrame: The Outstanding Check sheet.
+    """
+    for table in ['outstanding', 'outstanding_bank', 'outstanding_final_keys']:
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+    load_frame(conn, 'outstanding', outstanding_df)
+    create_index(conn, 'outstanding', OUTSTANDING_CHECK_NUMBER_COL)
+
+    # 5. Outstanding checks: the joins with bank and GL rows run in SQL
+    required = [OUTSTANDING_CHECK_NUMBER_COL, OUTSTANDING_AMOUNT_COL]
+    if all(col in outstanding_df.columns for col in required):
+        ost_key_dtype, ref_dtype = merged_key_dtypes(outstanding_df[OUTSTANDING_CHECK_NUMBER_COL].dtype,
+                                                     bank_cleaned[CUSTOMER_REFERENCE_COL].dtype)
+        ost_names, bank_names = merged_column_names(list(outstanding_df.columns), list(bank_cleaned.columns),
+                                                    ('_ost', '_bank'))
+        ost_dtypes = {**dict(zip(bank_names, bank_cleaned.dtypes)), **dict(zip(ost_names, outstanding_df.dtypes)),
+                      OUTSTANDING_CHECK_NUMBER_COL: ost_key_dtype, CUSTOMER_REFERENCE_COL: ref_dtype,
+                      'variance': np.float64, 'updated status': object, OUTSTANDING_CLEARED_COL: object}
+        query = sql_outstanding_bank_checks(conn, list(outstanding_df.columns), list(bank_cleaned.columns))
+        conn.execute(f'CREATE TABLE outstanding_bank AS {query}')
+        ost_bank_chks = fetch(conn, 'SELECT * FROM outstanding_bank ORDER BY rowid', ost_dtypes)
+    else:
+        ost_bank_chks = process_outstanding_bank_checks(outstanding_df, bank_cleaned) # logs the missing columns
+
+    matched = matched_gl_bank_with_comments
+    matched_checks = matched[(matched['comment'] == COMMENT_GL_YES_BANK_NO)
+                             & (matched[GL_TYPE_COL] == 'Checks')].reset_index(drop=True)
+    party_cols = [col for col in [GL_TRANSACTION_NUMBER_COL, 'Party Number', 'Party Name'] if col in gl_dtypes]
+    party_rows = fetch(conn, f'''SELECT {', '.join(quote(col) for col in party_cols)} FROM gl
+                                 GROUP BY {', '.join(quote(col) for col in party_cols)} ORDER BY MIN({POSITION_COL})''',
+                       gl_dtypes)
+    dateposted_cols = ', '.join(quote(col) for col in [GL_TRANSACTION_NUMBER_COL, 'Transaction Date'])
+    dateposted = fetch(conn, f'''SELECT {dateposted_cols} FROM gl WHERE {quote(GL_TYPE_COL)} = 'Checks'
+                                 GROUP BY {dateposted_cols} ORDER BY MIN({POSITION_COL})''', gl_dtypes)
+    new_ost_checks = get_new_outstanding_from_gl(matched_checks, ost_bank_chks,
+                                                 get_party_dimension_table(party_rows), dateposted)
+    final_ost = consolidate_outstanding_checks(ost_bank_chks, new_ost_checks)
+    ost_bank_chks_manualchecks = sql_outstanding_descriptions(conn, final_ost, gl_dtypes)
+    if money_in_cents:
+        ost_bank_chks_manualchecks = money_columns_to_dollars(ost_bank_chks_manualchecks, MONEY_EXPORT_COLUMNS)
+    return ost_bank_chks_manualchecks
+
+
+def sql_gl_type_sums(conn: sqlite3.Connection, gl_dtypes: dict, money_in_cents: bool) -> pd.DataFrame:
+    """Accounted CR and DR of table gl summed per Type, the input the GL pivot needs."""
+    cr, dr, gl_type_col = quote(GL_ACCOUNTED_CR_COL), quote(GL_ACCOUNTED_DR_COL), quote(GL_TYPE_COL)
+    sums = f'{money_sum(GL_ACCOUNTED_CR_COL, money_in_cents)} AS {cr}, {money_sum(GL_ACCOUNTED_DR_COL, money_in_cents)} AS {dr}'
+    return fetch(conn, f'SELECT {gl_type_col}, {sums} FROM gl GROUP BY {gl_type_col}',
+                 {GL_TYPE_COL: gl_dtypes[GL_TYPE_COL]})
+
+
+@profiled('sqlite_reconciliation')
+def run_sqlite_reconciliation(gl_source, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame,
+                              db_path: str | None = None,
+                              categorize: bool | None = None,
+                              memory_budget_mb: float = CHUNKED_MEMORY_BUDGET_MB,
+                              chunk_rows: int | None = None,
+                              money_in_cents: bool = MONEY_IN_CENTS,
+                              aggregate_bank: bool = AGGREGATE_BANK_BEFORE_MATCH,
+                              amount_date_match: bool = AMOUNT_DATE_MATCH_ENABLED,
+                              batch_deposit_match: bool = BATCH_DEPOSIT_MATCH_ENABLED,
+                              stats: dict | None = None) -> io.BytesIO | None:
+    """
+    Reconciles with SQLite as the engine. The GL is streamed in chunks that are cleaned
+    (and categorized) in pandas and bulk-loaded; aggregation, matching, variance and
+    comments, and the outstanding check joins run as indexed SQL. The party dimension,
+    the pivots and the export run in pandas on the query results.
+
+    The report equals run_full_reconciliation on the categorized GL (exactly so with
+    money in cents; float sums may differ in the last digits).
+
+    Args:
+        gl_source: GL workbook (.xlsx) or Parquet path, or a typed GL DataFrame.
+        bank_df (pd.DataFrame): The typed Bank DataFrame.
+        outstanding_df (pd.DataFrame): The typed Outstanding Checks DataFrame.
+        db_path (str | None): Keep the database here as a result store (tables gl, bank,
+                              outstanding, gl_agg, matched, outstanding_bank). None uses a temporary file.
+        categorize (bool | None): Categorize each chunk; None does so when the GL has no Type column.
+        memory_budget_mb (float): Memory budget used to size the GL chunks.
+        chunk_rows (int | None): Fixed rows per chunk instead of sizing them from the budget.
+        money_in_cents (bool): Run amounts as exact int64 cents and convert back to dollars at export.
+        aggregate_bank (bool): Aggregate bank lines per comparison key before matching.
+        amount_date_match (bool): Pair the rows left unmatched by transaction number on amount and date.
+        batch_deposit_match (bool): Match unmatched batch deposits with the GL rows summing to them.
+        stats (dict | None): If given, filled with 'timings', 'rows', 'comments' and 'sqlite'
+                             (database path and rows per table).
+
+    Returns:
+        io.BytesIO | None: BytesIO object of the Excel report if successful, None otherwise.
+    """
+    logger.info("Starting SQLite reconciliation.")
+    if stats is not None:
+        stats.update(timings={}, rows={}, comments={}, sqlite={})
+    lap = start_stage_clock(stats['timings'] if stats is not None else None)
+    conn, store_path = None, db_path
+    try:
+        conn, store_path = open_result_store(db_path)
+
+        bank_cleaned = prepare_bank_for_chunks(bank_df, money_in_cents)
+        bank_to_match = aggregate_bank_by_comparison_key(bank_cleaned) if aggregate_bank else bank_cleaned
+        if money_in_cents:
+            outstanding_df = money_columns_to_cents(outstanding_df, OUTSTANDING_MONEY_COLUMNS)
+        load_frame(conn, 'bank', bank_cleaned)
+        load_frame(conn, 'bank_match', bank_to_match)
+        create_index(conn, 'bank', CUSTOMER_REFERENCE_COL)
+        create_index(conn, 'bank_match', BANK_COMPARISON_KEY_COL)
+        lap('load_bank')
+
+        gl_rows, missing_start, gl_dtypes = 0, 1, None
+        for gl_chunk in iter_budgeted_gl_chunks(gl_source, memory_budget_mb, chunk_rows):
+            if categorize is None:
+                categorize = GL_TYPE_COL not in gl_chunk.columns
+            gl_cleaned, missing_start = clean_gl_chunk(gl_chunk, bank_cleaned, missing_start, categorize, money_in_cents)
+            if gl_dtypes is None:
+                gl_dtypes = gl_cleaned.dtypes.to_dict()
+            load_frame(conn, 'gl', gl_cleaned, start=gl_rows)
+            gl_rows += len(gl_chunk)
+        create_index(conn, 'gl', GL_TRANSACTION_NUMBER_COL)
+        conn.commit()
+        logger.info(f"Loaded {gl_rows} GL rows into {store_path}.")
+        lap('load_gl')
+
+        sql_aggregate_gl(conn, money_in_cents)
+        lap('aggregate_gl')
+
+        gl_agg_columns = GL_AGGREGATE_KEYS + [GL_ACCOUNTED_SUM_COL]
+        sql_match_gl_bank(conn, gl_agg_columns, list(bank_to_match.columns))
+        matched_dtypes = matched_column_dtypes(gl_dtypes, bank_to_match.dtypes.to_dict())
+        matched_gl_bank_with_comments = fetch(conn, f'SELECT * FROM matched ORDER BY {POSITION_COL}', matched_dtypes)
+        if amount_date_match or batch_deposit_match:
+            # Dates of the unmatched GL transactions only; the passes themselves run in numpy
+            paired = match_unmatched_rows(matched_gl_bank_with_comments, sql_unmatched_gl_dates(conn, gl_dtypes),
+                                          gl_agg_columns, money_in_cents, amount_date_match, batch_deposit_match)
+            if paired is not matched_gl_bank_with_comments:
+                matched_gl_bank_with_comments = paired
+                conn.execute('DROP TABLE matched')
+                load_frame(conn, 'matched', matched_gl_bank_with_comments)
+                create_index(conn, 'matched', 'comment')
+        matched_gl_bank_formatted = format_gl_vs_bank_sheet(matched_gl_bank_with_comments, money_in_cents)
+        lap('match')
+
+        ost_bank_chks_manualchecks = sql_outstanding_sheet(conn, outstanding_df, bank_cleaned,
+                                                           matched_gl_bank_with_comments, gl_dtypes, money_in_cents)
+        lap('outstanding')
+
+        pivots = pivots_stage(sql_gl_type_sums(conn, gl_dtypes, money_in_cents), bank_cleaned, money_in_cents)
+        lap('pivots')
+
+        report_bytes = export_stage(matched_gl_bank_formatted, ost_bank_chks_manualchecks, pivots)
+        if report_bytes is None:
+            return None
+        lap('export')
+        conn.commit()
+        if stats is not None:
+            stats['rows'] = {
+                'gl_input': gl_rows, 'bank_input': len(bank_df), 'outstanding_input': len(outstanding_df),
+                GL_VS_BANK_SHEET_NAME: len(matched_gl_bank_formatted),
+                OUTSTANDING_CHECK_SHEET_NAME: len(ost_bank_chks_manualchecks),
+            }
+            stats['comments'] = {str(comment): int(count) for comment, count in
+                                 matched_gl_bank_formatted['comment'].value_counts(dropna=False).items()}
+            tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            stats['sqlite'] = {'path': db_path, 'tables': {name: table_rows(conn, name) for name in tables}}
+        return io.BytesIO(report_bytes)
+
+    except Exception as e:
+        logger.error(f"An unhandled error occurred during the SQLite reconciliation: {e}", exc_info=True)
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+        if db_path is None and store_path is not None and os.path.exists(store_path):
+            os.remove(store_path)
+
+
+def check_sqlite_equivalence(gl_df: pd.DataFrame, bank_df: pd.DataFrame, outstanding_df: pd.DataFrame,
+                             db_path: str | None = None, money_in_cents: bool = MONEY_IN_CENTS) -> dict:
+    """
+    Runs the pandas and the SQLite engines on the same inputs and compares every report sheet.
+
+    Args:
+        gl_df (pd.DataFrame): Typed GL, uncategorized.
+        bank_df (pd.DataFrame): Typed bank statement.
+        outstanding_df (pd.DataFrame): Typed outstanding checks.
+        db_path (str | None): Result store of the SQLite run.
+        money_in_cents (bool): Run both engines on exact int64 cents instead of float dollars.
+
+    Returns:
+        dict: Sheet name -> None when equal, else the first difference found.
+    """
+    if money_in_cents: # the app converts at upload, before categorization
+        gl_df = money_columns_to_cents(gl_df, GL_MONEY_COLUMNS)
+        bank_df = money_columns_to_cents(bank_df, BANK_MONEY_COLUMNS)
+        outstanding_df = money_columns_to_cents(outstanding_df, OUTSTANDING_MONEY_COLUMNS)
+    categorized_gl = categorize_gl_with_bank(gl_df, bank_df)
+    pandas_report = run_full_reconciliation(categorized_gl, bank_df, outstanding_df, money_in_cents=money_in_cents,
+                                            use_stage_cache=False)
+    sqlite_report = run_sqlite_reconciliation(gl_df, bank_df, outstanding_df, db_path=db_path,
+                                              money_in_cents=money_in_cents)
+    if pandas_report is None or sqlite_report is None:
+        raise RuntimeError("A reconciliation engine failed; see the log for details.")
+    return compare_report_workbooks(pandas_report, sqlite_report)
+
+
+def parse_args(argv: list | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check that the SQLite engine's report equals the pandas engine's.")
+    parser.add_argument('--rows', type=int, default=20_000, help="GL rows of the generated dataset.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gl', help="GL workbook (with the outstanding check sheet) instead of generated data.")
+    parser.add_argument('--bank', help="Bank workbook (with --gl).")
+    parser.add_argument('--db', help="Keep the SQLite result store at this path.")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+    if bool(args.gl) != bool(args.bank):
+        parser.error("--gl and --bank go together")
+    return args
+
+
+def main(argv: list | None = None) -> int:
+    """Command-line entry point. Returns 1 when a report sheet differs between the engines."""
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.gl:
+        from stReadXl import read_gl_workbook, read_bank_workbook
+        gl_df, outstanding_df = read_gl_workbook(args.gl)
+        bank_df = read_bank_workbook(args.bank)
+    else:
+        from stSynthData import generate_dataset
+        gl_df, bank_df, outstanding_df = generate_dataset(args.rows, seed=args.seed)
+
+    differences = check_sqlite_equivalence(gl_df, bank_df, outstanding_df, db_path=args.db)
+    for sheet, difference in sorted(differences.items()):
+        print(f"{sheet}: {'equal' if difference is None else 'DIFFERENT'}")
+        if difference is not None:
+            print(difference)
+    return 1 if any(difference is not None for difference in differences.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+stSynthData.py
+
+Synthetic GL, bank statement and outstanding check data for benchmarks and demos.
+The GL covers every GL_COLUMNS_REQUIRED field and every BANK_CATEGORY_LIST type,
+with CK#/REF# descriptions and missing transaction numbers; the bank statement
+matches, partially matches or misses GL transactions at controllable ratios.
+
+Usage:
+    python stSynthData.py --rows 100000 --out sample_data/ [--seed 0] [--periods 1]
+"""
+
+import os
+import sys
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+from config import (
+    GL_FILE_SHEET_NAME, BANK_FILE_SHEET_NAME, OUTSTANDING_CHECK_REPORT_SHEET_NAME,
+    GL_COLUMNS_REQUIRED, GL_COLUMN_TYPES, BANK_COLUMNS_REQUIRED, BANK_COLUMN_TYPES,
+    OUTSTANDING_CHECK_COLUMNS_REQUIRED, OUTSTANDING_CHECK_COLUMN_TYPES, BANK_CATEGORY_LIST
+)
+
+logger = logging.getLogger(__name__)
+
+EXCEL_MAX_ROWS = 1_048_576
+GL_LINES_PER_TRANSACTION = 1.5 # average GL lines sharing one transaction number
+
+# Per bank category: relative frequency, cash direction (1 = deposit, -1 = payment),
+# transaction number formats as (prefix, digits), the GL text that the SOP rules
+# recognise, and raw TRN TYPE spellings seen on bank statements (each resolves to
+# its category with the fuzzy matching of stBankGL.rename_bank_trn_type).
+CATEGORY_PROFILES = {
+    'AR Module': {'weight': 8, 'sign': 1, 'tn': [('AR', 8)], 'journal': ['AR Receipts'],
+                  'batch': ['Receivables', 'On Account', 'Cash Receipt'], 'description': ['Customer payment'],
+                  'party': None, 'trn_types': ['AR Module', 'AR module', 'AR-Module']},
+    'Autodebits': {'weight': 4, 'sign': -1, 'tn': [('AD', 8)], 'journal': ['Autodebit Utilities', 'AutoDebit Lease'],
+                   'batch': ['GL Batch'], 'description': ['Monthly autodebit'],
+                   'party': None, 'trn_types': ['Autodebits', 'Autodebit', 'Auto debits']},
+    'Brinks': {'weight': 2, 'sign': 1, 'tn': [('BR', 8)], 'journal': ['Table Sales Deposit'],
+               'batch': ['GL Batch'], 'description': ['Armored car pickup'],
+               'party': ['Brinks Inc'], 'trn_types': ['Brinks', 'Brink']},
+    'Checks': {'weight': 20, 'sign': -1, 'tn': [('340', 6), ('1112', 5)], 'journal': ['AP Checks'],
+               'batch': ['Check Run'], 'description': ['Vendor check'],
+               'party': None, 'trn_types': ['Checks', 'Check', 'Checks ']},
+    'EFTPS': {'weight': 2, 'sign': -1, 'tn': [('TX', 8)], 'journal': ['EFTPS Tax Payment'],
+              'batch': ['GL Batch'], 'description': ['Federal tax deposit'],
+              'party': ['IRS'], 'trn_types': ['EFTPS', 'EFTPS ']},
+    'Interest': {'weight': 2, 'sign': 1, 'tn': [('IN', 8)], 'journal': ['ZBA Interest'],
+                 'batch': ['GL Batch'], 'description': ['Interest earned'],
+                 'party': None, 'trn_types': ['Interest', 'Intrest']},
+    'LN ACH': {'weight': 12, 'sign': -1, 'tn': [('640', 7)], 'journal': ['ACH Payments'],
+               'batch': ['ACH Run'], 'description': ['ACH vendor payment'],
+               'party': None, 'trn_types': ['LN ACH', 'LN-ACH', 'LN ACH ']},
+    'Lockbox': {'weight': 6, 'sign': 1, 'tn': [('LB', 8)], 'journal': ['Lockbox Receipts'],
+                'batch': ['GL Batch'], 'description': ['Lockbox deposit'],
+                'party': None, 'trn_types': ['Lockbox', 'Lock box', 'Lockbox ']},
+    'Payroll': {'weight': 4, 'sign': -1, 'tn': [('PY', 8)], 'journal': ['Payroll Funding'],
+                'batch': ['GL Batch'], 'description': ['Payroll funding'],
+                'party': ['ADP'], 'trn_types': ['Payroll', 'Payrol']},
+    'Return': {'weight': 1, 'sign': -1, 'tn': [('RT', 8)], 'journal': ['Returned Items'],
+               'batch': ['GL Batch'], 'description': ['Returned deposit item'],
+               'party': None, 'trn_types': ['Return', 'Returns']},
+    'Square': {'weight': 4, 'sign': 1, 'tn': [('SQ', 8)], 'journal': ['Card Settlements'],
+               'batch': ['GL Batch'], 'description': ['Square settlement'],
+               'party': ['Square Inc'], 'trn_types': ['Square', 'Square ']},
+    'Stripe': {'weight': 4, 'sign': 1, 'tn': [('ST', 8)], 'journal': ['Stripe Payout'],
+               'batch': ['GL Batch'], 'description': ['Online sales payout'],
+               'party': ['Stripe Inc'], 'trn_types': ['Stripe', 'Stripe ']},
+    'Ticketing': {'weight': 4, 'sign': 1, 'tn': [('TK', 8)], 'journal': ['Ticket Sales'],
+                  'batch': ['GL Batch'], 'description': ['Ticket settlement'],
+                  'party': ['Front Gate Tickets', 'Vivendi Ticketing'], 'trn_types': ['Ticketing', 'Ticketting']},
+    'Vibee AR': {'weight': 2, 'sign': 1, 'tn': [('VB', 8)], 'journal': ['VIBEE AR Receipts'],
+                 'batch': ['GL Batch'], 'description': ['Vibee settlement'],
+                 'party': None, 'trn_types': ['Vibee AR', 'Vibee A/R']},
+    'Wires': {'weight': 8, 'sign': -1, 'tn': [('W', 9)], 'journal': ['Wire Payments'],
+              'batch': ['Wire Out', 'AP Payables'], 'description': ['Outgoing wire'],
+              'party': None, 'trn_types': ['Wires', 'Wire', 'Wires ']},
+    'ZBA': {'weight': 6, 'sign': 1, 'tn': [('ZB', 8)], 'journal': ['ZBA Transfer'],
+            'batch': ['GL Batch'], 'description': ['Zero balance sweep'],
+            'party': None, 'trn_types': ['ZBA', 'ZBA ']},
+}
+VENDOR_NAMES = ['Acme Supply', 'Globex Corp', 'Initech', 'Umbrella Services', 'Stark Industries',
+                'Wayne Enterprises', 'Hooli', 'Vandelay Industries', 'Soylent Foods', 'Wonka Industries']
+GL_SOURCES = {1: 'Receivables', -1: 'Payables'}
+GL_CATEGORIES = {1: 'Receipts', -1: 'Payments'}
+
+
+def pick(rng: np.random.Generator, options: list, size: int) -> np.ndarray:
+    """Draws size values from options into an object array."""
+    return np.asarray(options, dtype=object)[rng.integers(0, len(options), size)]
+
+
+def numbered(prefix: str, numbers: np.ndarray, digits: int) -> np.ndarray:
+    """Builds 'prefix' + zero-padded number strings, wrapping numbers that do not fit in digits."""
+    return (prefix + pd.Series(numbers % 10 ** digits).astype(str).str.zfill(digits)).to_numpy(dtype=object)
+
+
+def generate_dataset(n_gl: int, seed: int = 0, periods: int = 1, accounts: int = 3,
+                     match_ratio: float = 0.80, partial_ratio: float = 0.05,
+                     bank_only_ratio: float = 0.10, missing_tn_ratio: float = 0.03,
+                     outstanding_ratio: float = 0.02, cleared_ratio: float = 0.5) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Generates a GL, a bank statement and an outstanding check sheet that reconcile
+    against each other in controlled proportions.
+
+    GL lines are grouped into transactions (GL_LINES_PER_TRANSACTION lines on average).
+    Each transaction gets one bank line with the same amount (full match), a different
+    amount (partial match), or none (GL only). Bank-only lines are added on top.
+
+    Args:
+        n_gl (int): Number of GL rows.
+        seed (int): Random seed; the same arguments always give the same data.
+        periods (int): Number of monthly periods, starting Jan-25.
+        accounts (int): Number of CO/AU/Acct combinations.
+        match_ratio (float): Share of GL transactions with a bank line of the same amount.
+        partial_ratio (float): Share of GL transactions with a bank line of a different amount.
+        bank_only_ratio (float): Bank-only lines, as a share of the bank lines matching the GL.
+        missing_tn_ratio (float): Share of GL lines without a transaction number. Check lines
+                                  carry 'Manual Checks CK#', others 'REF#' or no description.
+        outstanding_ratio (float): Outstanding checks from earlier periods, as a share of GL rows.
+        cleared_ratio (float): Share of those outstanding checks that clear on this statement.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: GL, bank and outstanding check
+        DataFrames, typed like the workbook readers return them.
+    """
+    rng = np.random.default_rng(seed)
+    categories = list(CATEGORY_PROFILES)
+    missing_categories = sorted(set(BANK_CATEGORY_LIST) - set(categories))
+    if missing_categories:
+        raise ValueError(f"No synthetic data profile for bank categories {missing_categories}.")
+
+    # 1. Transactions: category, account, period, day and transaction number
+    lines_per_tx = 1 + rng.poisson(GL_LINES_PER_TRANSACTION - 1, int(n_gl / GL_LINES_PER_TRANSACTION) + 16)
+    while lines_per_tx.sum() < n_gl:
+        lines_per_tx = np.concatenate([lines_per_tx, 1 + rng.poisson(GL_LINES_PER_TRANSACTION - 1, 64)])
+    tx_of_line = np.repeat(np.arange(len(lines_per_tx)), lines_per_tx)[:n_gl]
+    n_tx = int(tx_of_line[-1]) + 1 if n_gl else 0
+
+    weights = np.array([CATEGORY_PROFILES[c]['weight'] for c in categories], dtype=float)
+    tx_category = rng.choice(len(categories), size=n_tx, p=weights / weights.sum())
+    tx_sign = np.array([CATEGORY_PROFILES[c]['sign'] for c in categories])[tx_category]
+    tx_account = rng.integers(0, accounts, n_tx)
+    tx_period = rng.integers(0, periods, n_tx)
+    tx_day = rng.integers(1, 29, n_tx)
+
+    tx_number = np.empty(n_tx, dtype=object)
+    for code, category in enumerate(categories):
+        rows = np.flatnonzero(tx_category == code)
+        formats = CATEGORY_PROFILES[category]['tn']
+        fmt_choice = rng.integers(0, len(formats), len(rows))
+        for fmt_code, (prefix, digits) in enumerate(formats):
+            chosen = rows[fmt_choice == fmt_code]
+            tx_number[chosen] = numbered(prefix, np.arange(len(chosen)) + 1 + 1000 * fmt_code, digits)
+
+    # Calendar lookup tables; rows index into them instead of formatting dates one by one
+    period_starts = pd.period_range('2025-01', periods=periods, freq='M')
+    period_names = np.asarray(period_starts.strftime('%b-%y'), dtype=object)
+    calendar = np.array([[f"{p.year}-{p.month:02d}-{day:02d}" for day in range(1, 32)] for p in period_starts], dtype=object)
+
+    # 2. GL lines
+    line_category = tx_category[tx_of_line]
+    line_sign = tx_sign[tx_of_line]
+    line_cents = rng.integers(100, 2_500_000, n_gl) * line_sign
+    gl_number = tx_number[tx_of_line].copy()
+    journal = np.empty(n_gl, dtype=object)
+    batch = np.empty(n_gl, dtype=object)
+    description = np.empty(n_gl, dtype=object)
+    party = pick(rng, VENDOR_NAMES, n_gl)
+    for code, category in enumerate(categories):
+        profile = CATEGORY_PROFILES[category]
+        rows = np.flatnonzero(line_category == code)
+        journal[rows] = pick(rng, profile['journal'], len(rows))
+        batch[rows] = pick(rng, profile['batch'], len(rows))
+        description[rows] = pick(rng, profile['description'], len(rows))
+        if profile['party']:
+            party[rows] = pick(rng, profile['party'], len(rows))
+
+    # Missing transaction numbers: CK# for checks, REF# or nothing for the rest
+    missing = np.flatnonzero(rng.random(n_gl) < missing_tn_ratio)
+    is_check = line_category[missing] == categories.index(BANK_CATEGORY_LIST[3])
+    with_ref = ~is_check & (rng.random(len(missing)) < 0.5)
+    description[missing[is_check]] = 'Manual Checks CK#' + gl_number[missing[is_check]]
+    description[missing[with_ref]] = 'Deposit REF# ' + gl_number[missing[with_ref]]
+    description[missing[~is_check & ~with_ref]] = None
+    gl_number[missing] = None
+
+    accounted_dr = np.where(line_cents > 0, line_cents, 0) / 100
+    accounted_cr = np.where(line_cents < 0, -line_cents, 0) / 100
+    line_account = tx_account[tx_of_line]
+    transaction_date = calendar[tx_period[tx_of_line], tx_day[tx_of_line] - 1]
+    transaction_date[rng.random(n_gl) < 0.01] = None
+    party_number = np.asarray(numbered('P', pd.factorize(party)[0] + 1, 5), dtype=object)
+    no_party = rng.random(n_gl) < 0.02
+    party[no_party] = None
+    party_number[no_party] = None
+
+    gl = pd.DataFrame({
+        'CO': numbered('', line_account % 2 + 1, 2), 'AU': numbered('', 100 + line_account * 10, 3),
+        'Acct': numbered('', 1000 + line_account, 4), 'Sub Acct': '0000', 'Project': '0000',
+        'Period Name': period_names[tx_period[tx_of_line]],
+        'Source': np.asarray([GL_SOURCES[1], GL_SOURCES[-1]], dtype=object)[(line_sign < 0).astype(int)],
+        'Category': np.asarray([GL_CATEGORIES[1], GL_CATEGORIES[-1]], dtype=object)[(line_sign < 0).astype(int)],
+        'Journal Name': journal, 'Batch Name': batch, 'Description': description,
+        'Entered DR': accounted_dr, 'Entered CR': accounted_cr,
+        'Accounted DR': accounted_dr, 'Accounted CR': accounted_cr,
+        'Transaction Number': gl_number, 'Transaction Date': transaction_date,
+        'Transaction Amount': np.abs(line_cents) / 100,
+        'Party Number': party_number, 'Party Name': party,
+        'Accounted Sum': line_cents / 100,
+    })
+    gl = gl[GL_COLUMNS_REQUIRED].astype(GL_COLUMN_TYPES)
+
+    # 3. Bank lines: one per matched or partially matched transaction, plus bank-only lines
+    tx_cents = np.bincount(tx_of_line, weights=line_cents, minlength=n_tx).astype(np.int64)
+    outcome = rng.random(n_tx)
+    has_bank = outcome < match_ratio + partial_ratio
+    is_partial = (outcome >= match_ratio) & has_bank
+    offsets = rng.integers(1, 5000, n_tx) * np.where(rng.random(n_tx) < 0.5, -1, 1)
+    bank_tx = np.flatnonzero(has_bank)
+    bank_cents = np.where(is_partial, tx_cents + offsets, tx_cents)[bank_tx]
+    bank_key = tx_number[bank_tx]
+    bank_category = tx_category[bank_tx]
+    bank_period, bank_day = tx_period[bank_tx], tx_day[bank_tx]
+
+    n_bank_only = int(round(bank_only_ratio * len(bank_tx)))
+    only_category = rng.choice(len(categories), size=n_bank_only, p=weights / weights.sum())
+    only_sign = np.array([CATEGORY_PROFILES[c]['sign'] for c in categories])[only_category]
+    bank_key = np.concatenate([bank_key, numbered('BK', np.arange(n_bank_only) + 1, 8)])
+    bank_cents = np.concatenate([bank_cents, rng.integers(100, 2_500_000, n_bank_only) * only_sign])
+    bank_category = np.concatenate([bank_category, only_category])
+    bank_period = np.concatenate([bank_period, rng.integers(0, periods, n_bank_only)])
+    bank_day = np.concatenate([bank_day, rng.integers(1, 29, n_bank_only)])
+
+    # 4. Outstanding checks from earlier periods; some of them clear on this statement
+    n_ost = int(round(outstanding_ratio * n_gl))
+    ost_numbers = numbered('339', np.arange(n_ost) + 1, 6)
+    ost_cents = rng.integers(100, 2_500_000, n_ost)
+    cleared = np.flatnonzero(rng.random(n_ost) < cleared_ratio)
+    check_code = categories.index(BANK_CATEGORY_LIST[3])
+    bank_key = np.concatenate([bank_key, ost_numbers[cleared]])
+    bank_cents = np.concatenate([bank_cents, -ost_cents[cleared]])
+    bank_category = np.concatenate([bank_category, np.full(len(cleared), check_code)])
+    bank_period = np.concatenate([bank_period, rng.integers(0, periods, len(cleared))])
+    bank_day = np.concatenate([bank_day, rng.integers(1, 29, len(cleared))])
+
+    # Reference columns as the bank reports them: checks by customer reference, wires by
+    # bank reference, other lines either way (NONREF bank reference means use the customer one)
+    n_bank = len(bank_key)
+    raw_type = np.empty(n_bank, dtype=object)
+    for code, category in enumerate(categories):
+        rows = np.flatnonzero(bank_category == code)
+        raw_type[rows] = pick(rng, CATEGORY_PROFILES[category]['trn_types'], len(rows))
+    by_customer = (bank_category == check_code) | (
+        (bank_category != categories.index(BANK_CATEGORY_LIST[14])) & (rng.random(n_bank) < 0.5))
+    other_reference = numbered('R', rng.integers(0, 10 ** 9, n_bank), 9)
+    padded_key = np.where(rng.random(n_bank) < 0.1, '00' + bank_key, bank_key) # leading zeros are stripped when cleaning
+    bank_reference = np.where(by_customer, np.where(bank_category == check_code, other_reference, 'NONREF'), padded_key)
+    customer_reference = np.where(by_customer, padded_key, other_reference)
+    post_day = np.minimum(bank_day + rng.integers(0, 3, n_bank), 31)
+
+    bank = pd.DataFrame({
+        'Bank reference': bank_reference, 'Customer reference': customer_reference,
+        'TRN TYPE': raw_type, 'TRN status': 'Posted',
+        'Value date': calendar[bank_period, bank_day - 1],
+        'Credit amount': np.where(bank_cents > 0, bank_cents, 0) / 100,
+        'Debit amount': np.where(bank_cents < 0, bank_cents, 0) / 100,
+        'Time': numbered('', rng.integers(8, 18, n_bank), 2) + ':00',
+        'Post date': calendar[bank_period, post_day - 1],
+    })
+    order = rng.permutation(n_bank)
+    bank = bank.iloc[order].reset_index(drop=True)[BANK_COLUMNS_REQUIRED].astype(BANK_COLUMN_TYPES)
+
+    ost = pd.DataFrame({
+        'Check number': ost_numbers,
+        'Date posted': pd.Series(pd.Timestamp('2024-12-01') - pd.to_timedelta(rng.integers(0, 90, n_ost), unit='D')).dt.strftime('%Y-%m-%d').to_numpy(dtype=object),
+        'Vendor Name': pick(rng, VENDOR_NAMES, n_ost),
+        'Amount': -ost_cents / 100, # payments carry the bank's debit sign
+        'Cleared?': 'No',
+    })
+    ost = ost[OUTSTANDING_CHECK_COLUMNS_REQUIRED].astype(OUTSTANDING_CHECK_COLUMN_TYPES)
+
+    logger.info(f"Generated {len(gl)} GL rows ({n_tx} transactions), {len(bank)} bank rows and {len(ost)} outstanding checks.")
+    return gl, bank, ost
+
+
+def write_dataset_workbooks(gl: pd.DataFrame, bank: pd.DataFrame, ost: pd.DataFrame,
+                            out_dir: str, name: str = 'synthetic') -> dict:
+    """
+    Writes a generated dataset as the workbooks the app and stBatch read: a GL workbook
+    with the GL and outstanding check sheets, and a bank workbook.
+
+    Args:
+        gl (pd.DataFrame): Generated GL.
+        bank (pd.DataFrame): Generated bank statement.
+        ost (pd.DataFrame): Generated outstanding checks.
+        out_dir (str): Output folder.
+        name (str): File name prefix.
+
+    Returns:
+        dict: 'gl' and 'bank' workbook paths.
+
+    Raises:
+        ValueError: If a sheet does not fit in an Excel worksheet.
+    """
+    for label, df in (('GL', gl), ('bank', bank), ('outstanding check', ost)):
+        if len(df) >= EXCEL_MAX_ROWS:
+            raise ValueError(f"The {label} sheet has {len(df)} rows; an Excel sheet holds at most {EXCEL_MAX_ROWS - 1}.")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {'gl': os.path.join(out_dir, f"{name}_gl.xlsx"), 'bank': os.path.join(out_dir, f"{name}_bank.xlsx")}
+    with pd.ExcelWriter(paths['gl'], engine='xlsxwriter') as writer:
+        gl.to_excel(writer, sheet_name=GL_FILE_SHEET_NAME, index=False)
+        ost.to_excel(writer, sheet_name=OUTSTANDING_CHECK_REPORT_SHEET_NAME, index=False)
+    with pd.ExcelWriter(paths['bank'], engine='xlsxwriter') as writer:
+        bank.to_excel(writer, sheet_name=BANK_FILE_SHEET_NAME, index=False)
+    logger.info(f"Wrote synthetic workbooks {paths['gl']} and {paths['bank']}.")
+    return paths
+
+
+def parse_args(argv: list | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate synthetic GL, bank and outstanding check workbooks.")
+    parser.add_argument('--rows', type=int, required=True, help="Number of GL rows.")
+    parser.add_argument('--out', required=True, help="Output folder.")
+    parser.add_argument('--name', default='synthetic', help="File name prefix.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--periods', type=int, default=1, help="Monthly periods, starting Jan-25.")
+    parser.add_argument('--accounts', type=int, default=3, help="CO/AU/Acct combinations.")
+    parser.add_argument('--match-ratio', type=float, default=0.80)
+    parser.add_argument('--partial-ratio', type=float, default=0.05)
+    parser.add_argument('--bank-only-ratio', type=float, default=0.10)
+    parser.add_argument('--missing-tn-ratio', type=float, default=0.03)
+    parser.add_argument('--outstanding-ratio', type=float, default=0.02)
+    return parser.parse_args(argv)
+
+
+def main(argv: list | None = None) -> int:
+    """Command-line entry point."""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    gl, bank, ost = generate_dataset(
+        args.rows, seed=args.seed, periods=args.periods, accounts=args.accounts,
+        match_ratio=args.match_ratio, partial_ratio=args.partial_ratio, bank_only_ratio=args.bank_only_ratio,
+        missing_tn_ratio=args.missing_tn_ratio, outstanding_ratio=args.outstanding_ratio,
+    )
+    paths = write_dataset_workbooks(gl, bank, ost, args.out, args.name)
+    print(f"GL workbook: {paths['gl']}\nBank workbook: {paths['bank']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def start_stage_clock(timings: dict | None):
+    """
+    Starts a clock that times consecutive pipeline stages.
+
+    Usage: lap = start_stage_clock(timings); ...work...; lap('clean'); ...work...; lap('match').
+    Each lap records the seconds since the previous lap (or the start) under the stage name.
+
+    Args:
+        timings (dict | None): Stage name -> seconds, filled in place. None only logs the laps.
+
+    Returns:
+        Callable[[str], float]: Records a stage and returns its duration in seconds.
+    """
+    last = time.perf_counter()
+
+    def lap(stage: str) -> float:
+        nonlocal last
+        now = time.perf_counter()
+        elapsed = now - last
+        last = now
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        logger.info(f"Stage '{stage}' took {elapsed:.2f}s.")
+        return elapsed
+
+    return lap
@@ -0,0 +1,186 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from config import UPLOAD_CACHE_ENABLED, UPLOAD_CACHE_DIR, UPLOAD_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Bump when the readers change how cells are converted, so old entries stop matching
+CACHE_FORMAT_VERSION = 1
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def file_content_hash(file) -> str:
+    """
+    Hashes the bytes of an uploaded file (or a path) with SHA-256, in chunks.
+
+    Args:
+        file: Path or binary file-like object. File objects are rewound before and after.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            while chunk := handle.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    file.seek(0)
+    while chunk := file.read(HASH_CHUNK_BYTES):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash: str, reader, schema: dict) -> str:
+    """
+    Builds the cache key of a parsed upload: the file content plus everything that
+    decides how it is parsed (reader, sheets, columns and column types).
+
+    Args:
+        content_hash (str): Output of file_content_hash.
+        reader: The function that parses the file.
+        schema (dict): The reader's sheet spec, e.g. stReadXl.GL_WORKBOOK_SHEETS.
+
+    Returns:
+        str: Hex key naming the cache entry.
+    """
+    fingerprint = json.dumps({
+        'version': CACHE_FORMAT_VERSION,
+        'reader': f"{reader.__module__}.{reader.__qualname__}",
+        'schema': schema,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}:{fingerprint}".encode()).hexdigest()
+
+
+def entry_size(entry_dir: str) -> int:
+    """Returns the total size in bytes of the files of a cache entry."""
+    return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+
+
+def load_cached_frames(key: str, cache_dir: str = UPLOAD_CACHE_DIR) -> list | None:
+    """
+    Loads the frames of a cache entry and marks the entry as recently used.
+
+    Args:
+        key (str): Output of cache_key.
+        cache_dir (str): Cache directory.
+
+    Returns:
+        list | None: The cached DataFrames in reader order, or None on a miss.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry_dir):
+        return None
+    try:
+        paths = sorted(name for name in os.listdir(entry_dir) if name.endswith('.parquet'))
+        frames = []
+        for name in paths:
+            frame = pd.read_parquet(os.path.join(entry_dir, name))
+            # Parquet returns missing text in untyped columns as None; the readers use NaN
+            for col in frame.columns[frame.dtypes == object]:
+                frame[col] = frame[col].where(frame[col].notna(), np.nan)
+            frames.append(frame)
+        os.utime(entry_dir) # directory mtime is the entry's last use, for LRU eviction
+        return frames
+    except Exception as e:
+        logger.warning(f"Discarding unreadable upload cache entry {key}: {e}")
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+
+def store_cached_frames(key: str, frames: list, cache_dir: str = UPLOAD_CACHE_DIR) -> None:
+    """
+    Writes frames to a new cache entry. The entry is written to a temporary
+    directory first and renamed into place, so readers never see a partial entry.
+
+    Args:
+        key (str): Output of cache_key.
+        frames (list): DataFrames to cache, in reader order.
+        cache_dir (str): Cache directory.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        for position, frame in enumerate(frames):
+            frame.to_parquet(os.path.join(tmp_dir, f"frame_{position:02d}.parquet"), index=False)
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, entry_dir)
+    except Exception as e:
+        # e.g. pyarrow missing or disk full: the upload still works, it is just not cached
+        logger.warning(f"Could not write upload cache entry {key}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def evict_lru_entries(cache_dir: str = UPLOAD_CACHE_DIR, max_bytes: int = UPLOAD_CACHE_MAX_BYTES) -> int:
+    """
+    Deletes least recently used cache entries until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): Cache directory.
+        max_bytes (int): Size budget of the cache.
+
+    Returns:
+        int: Number of entries evicted.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = [entry for entry in os.scandir(cache_dir) if entry.is_dir() and '.tmp' not in entry.name]
+    sizes = {entry.path: entry_size(entry.path) for entry in entries}
+    total = sum(sizes.values())
+
+    evicted = 0
+    for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry.path, ignore_errors=True)
+        total -= sizes[entry.path]
+        evicted += 1
+    if evicted:
+        logger.info(f"Evicted {evicted} upload cache entries; cache now {total / 1024 ** 2:.1f} MB.")
+    return evicted
+
+
+def read_with_cache(file, reader, schema: dict, enabled: bool = UPLOAD_CACHE_ENABLED,
+                    cache_dir: str = UPLOAD_CACHE_DIR, max_bytes: int = UPLOAD_CACHE_MAX_BYTES):
+    """
+    Parses an upload with reader, reusing the cached typed frames when the same
+    bytes were parsed before with the same schema.
+
+    Args:
+        file: Path or binary file-like object of the upload.
+        reader: Parsing function returning a DataFrame or a tuple of DataFrames,
+                e.g. stReadXl.read_gl_workbook.
+        schema (dict): The reader's sheet spec; part of the cache key.
+        enabled (bool): When False, always parses with reader.
+        cache_dir (str): Cache directory.
+        max_bytes (int): Size budget of the cache.
+
+    Returns:
+        Whatever reader returns.
+    """
+    if not enabled:
+        return reader(file)
+
+    key = cache_key(file_content_hash(file), reader, schema)
+    cached = load_cached_frames(key, cache_dir)
+    if cached is not None:
+        logger.info(f"Upload cache hit for {getattr(file, 'name', file)} ({key[:12]}).")
+        return cached[0] if len(cached) == 1 else tuple(cached)
+
+    logger.info(f"Upload cache miss for {getattr(file, 'name', file)} ({key[:12]}). Parsing workbook.")
+    result = reader(file)
+    frames = [result] if isinstance(result, pd.DataFrame) else list(result)
+    store_cached_frames(key, frames, cache_dir)
+    evict_lru_entries(cache_dir, max_bytes)
+    return result
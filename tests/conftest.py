@@ -0,0 +1,9 @@
+import pytest
+
+from stSynthData import generate_dataset
+
+
+@pytest.fixture(scope='session')
+def small_dataset():
+    """Generated GL, bank statement and outstanding checks, small enough to run every engine on."""
+    return generate_dataset(2000, seed=7)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import BANK_TRN_TYPE_COL, BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL, BANK_CATEGORY_LIST
+from stBankGL import clean_bank_data, rename_bank_trn_type, create_bank_comparison_key, create_bank_comparison_keys
+from stSynthData import generate_dataset
+
+CHECKS, WIRES = BANK_CATEGORY_LIST[3], BANK_CATEGORY_LIST[14]
+
+# TRN TYPE, Bank reference, Customer reference
+EDGE_ROWS = [
+    (CHECKS, 'R1', '1112001'),
+    (CHECKS, 'NONREF', '1112002'),
+    (CHECKS, 'R2', np.nan),          # check without a check number
+    (CHECKS, 'R3', ''),
+    (WIRES, 'NONREF', 'C1'),         # wires keep the bank reference even when it is NONREF
+    (WIRES, np.nan, 'C2'),
+    (np.nan, 'NONREF', 'C3'),        # missing TRN TYPE
+    (np.nan, 'R4', 'C4'),
+    ('', 'NONREF', 'C5'),            # blank TRN TYPE
+    ('', 'R5', np.nan),
+    ('Lockbox', 'NONREF', np.nan),
+    ('Lockbox', np.nan, np.nan),
+    ('Lockbox', '', 'C6'),
+]
+
+
+def as_read_excel(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns with NaN for missing text, as the per-row helper got them from pd.read_excel."""
+    return df.astype(object).where(df.notna(), np.nan)
+
+
+def assert_same_keys(bank: pd.DataFrame) -> None:
+    expected = bank.apply(create_bank_comparison_key, axis=1).astype(object)
+    pd.testing.assert_series_equal(create_bank_comparison_keys(bank), expected, check_names=False)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_keys_equal_row_wise_on_generated_statement(seed):
+    _, bank, _ = generate_dataset(3000, seed=seed)
+    edges = pd.DataFrame(EDGE_ROWS, columns=[BANK_TRN_TYPE_COL, BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL])
+    bank = pd.concat([as_read_excel(bank), edges], ignore_index=True)
+    assert_same_keys(bank)
+    # The typed reader gives string columns with <NA>; the keys must not depend on it
+    typed = bank.astype({col: 'string' for col in edges.columns})
+    pd.testing.assert_series_equal(as_read_excel(create_bank_comparison_keys(typed).to_frame())[0],
+                                   create_bank_comparison_keys(bank), check_names=False)
+
+
+def test_keys_equal_row_wise_after_cleaning_and_renaming():
+    _, bank, _ = generate_dataset(3000, seed=4)
+    bank.loc[bank.sample(50, random_state=0).index, BANK_TRN_TYPE_COL] = pd.NA
+    bank.loc[bank.sample(50, random_state=1).index, CUSTOMER_REFERENCE_COL] = pd.NA
+    cleaned = as_read_excel(rename_bank_trn_type(clean_bank_data(bank), alias_file=None))
+    assert_same_keys(cleaned)
+
+
+def test_edge_rows():
+    bank = pd.DataFrame(EDGE_ROWS, columns=[BANK_TRN_TYPE_COL, BANK_REFERENCE_COL, CUSTOMER_REFERENCE_COL])
+    keys = create_bank_comparison_keys(bank)
+    assert keys.tolist()[:2] == ['1112001', '1112002']
+    assert pd.isna(keys[2]) and keys[3] == ''
+    assert keys[4] == 'NONREF' and pd.isna(keys[5])
+    assert keys[6] == 'C3' and keys[8] == 'C5' and pd.isna(keys[10])
@@ -0,0 +1,42 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from stBatchDepositMatch import find_subset_with_sum
+
+NO_DEADLINE = float('inf')
+
+
+def smallest_subset_size(amounts: np.ndarray, target: int) -> int | None:
+    """Brute force: the fewest items (at least two) of amounts summing to target."""
+    for size in range(2, len(amounts) + 1):
+        if any(sum(amounts[list(items)]) == target for items in combinations(range(len(amounts)), size)):
+            return size
+    return None
+
+
+@pytest.mark.parametrize('amounts, target, expected', [
+    ([100, 200, 300, 5, 2, 3], 5, [4, 5]),
+    ([10, 20, 30, 7, 3, 4], 7, [4, 5]),
+    ([2, 3, 100, 200], 5, [0, 1]),
+    ([5, 100, 200, 300], 5, None),
+])
+def test_finds_subsets_within_one_half(amounts, target, expected):
+    found = find_subset_with_sum(np.array(amounts, dtype=np.int64), target, NO_DEADLINE)
+    assert (found if found is None else found.tolist()) == expected
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1, 10, rng.integers(2, 11))
+    target = int(rng.integers(2, 12))
+    found = find_subset_with_sum(amounts, target, NO_DEADLINE)
+    expected_size = smallest_subset_size(amounts, target)
+    if expected_size is None:
+        assert found is None
+    else:
+        assert found is not None
+        assert len(set(found.tolist())) == len(found) == expected_size
+        assert amounts[found].sum() == target
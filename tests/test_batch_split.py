@@ -0,0 +1,59 @@
+import pandas as pd
+
+from config import BATCH_ACCOUNT_COLUMNS, BATCH_MAP_BANK_FILE_COL, BATCH_MAP_OUTSTANDING_FILE_COL, OUTSTANDING_CHECK_NUMBER_COL
+from stBatch import split_gl_jobs
+from stSynthData import generate_dataset, write_dataset_workbooks
+
+
+def write_split_inputs(tmp_path, accounts: int, ost_accounts: bool):
+    """GL workbook with `accounts` accounts, plus a bank map CSV pairing every account with the bank workbook."""
+    gl, bank, ost = generate_dataset(600, seed=5, accounts=accounts)
+    account_values = gl[BATCH_ACCOUNT_COLUMNS].drop_duplicates().astype(str).reset_index(drop=True)
+    if ost_accounts:
+        # Deal the outstanding checks out over the accounts
+        positions = [i % len(account_values) for i in range(len(ost))]
+        ost = pd.concat([ost, account_values.iloc[positions].reset_index(drop=True)], axis=1)
+    paths = write_dataset_workbooks(gl, bank, ost, str(tmp_path))
+    bank_map = account_values.copy()
+    bank_map[BATCH_MAP_BANK_FILE_COL] = paths['bank']
+    bank_map[BATCH_MAP_OUTSTANDING_FILE_COL] = ''
+    map_path = tmp_path / 'banks.csv'
+    bank_map.to_csv(map_path, index=False)
+    return paths['gl'], str(map_path), ost, account_values
+
+
+def test_partitions_get_their_account_outstanding_checks(tmp_path):
+    gl_path, map_path, ost, account_values = write_split_inputs(tmp_path, accounts=3, ost_accounts=True)
+    jobs = split_gl_jobs(gl_path, map_path, str(tmp_path / 'out'), use_cache=False)
+    assert len(jobs) == 3
+    seen = []
+    for job in jobs:
+        assert 'error' not in job
+        account = job['name'].split('-')
+        assert (job['outstanding_df'][BATCH_ACCOUNT_COLUMNS].astype(str) == account).all(axis=None)
+        seen.extend(job['outstanding_df'][OUTSTANDING_CHECK_NUMBER_COL])
+    assert sorted(seen) == sorted(ost[OUTSTANDING_CHECK_NUMBER_COL].astype(str))
+
+
+def test_several_accounts_without_account_columns_need_an_outstanding_file(tmp_path):
+    gl_path, map_path, _, account_values = write_split_inputs(tmp_path, accounts=2, ost_accounts=False)
+    first = tuple(account_values.iloc[0])
+    # Map an outstanding file for the first account only
+    bank_map = pd.read_csv(map_path, dtype=str, keep_default_na=False)
+    bank_map.loc[0, BATCH_MAP_OUTSTANDING_FILE_COL] = 'first_outstanding.xlsx'
+    bank_map.to_csv(map_path, index=False)
+
+    jobs = {job['name']: job for job in split_gl_jobs(gl_path, map_path, str(tmp_path / 'out'), use_cache=False)}
+    mapped, unmapped = jobs['-'.join(first)], jobs['-'.join(account_values.iloc[1])]
+    assert 'error' not in mapped and 'outstanding_df' not in mapped
+    assert mapped['outstanding'].endswith('first_outstanding.xlsx')
+    assert 'outstanding_df' not in unmapped
+    assert 'no outstanding check file mapped' in unmapped['error']
+
+
+def test_single_account_uses_the_whole_sheet(tmp_path):
+    gl_path, map_path, ost, _ = write_split_inputs(tmp_path, accounts=1, ost_accounts=False)
+    jobs = split_gl_jobs(gl_path, map_path, str(tmp_path / 'out'), by_period=True, use_cache=False)
+    assert jobs and all('error' not in job for job in jobs)
+    for job in jobs:
+        assert len(job['outstanding_df']) == len(ost)
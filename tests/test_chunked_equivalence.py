@@ -0,0 +1,12 @@
+import pytest
+
+from stChunked import check_chunked_equivalence
+
+
+@pytest.mark.parametrize('money_in_cents', [True, False], ids=['cents', 'dollars'])
+def test_chunked_report_equals_full_report(small_dataset, money_in_cents):
+    gl_df, bank_df, outstanding_df = small_dataset
+    differences = check_chunked_equivalence(gl_df, bank_df, outstanding_df, chunk_rows=700,
+                                            money_in_cents=money_in_cents)
+    assert differences, "no report sheets compared"
+    assert {sheet: difference for sheet, difference in differences.items() if difference is not None} == {}
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import (
+    BANK_COMPARISON_KEY_COL, BANK_TRN_TYPE_COL, GL_TYPE_COL, GL_TRANSACTION_NUMBER_COL, JOURNAL_COL,
+    DESCRIPTION_COL, BATCHNAME_COL, PARTYNAME_COL, BANK_CATEGORY_LIST, ACH_TRANSNO_SEARCH,
+    ZBA_JOURNAL_SEARCH, INTEREST_DESC_SEARCH, PAYROLL_JOURNAL_SEARCH, AUTODEBIT_JOURNAL_SEARCH,
+    EFTPS_JOURNAL_SEARCH, VIBEE_JOURNAL_SEARCH, STRIPE_JOURNAL_SEARCH, BRINKS_JOURNAL_SEARCH,
+    SQUARE_DESC_JOURNAL_SEARCH, TICKET_PARTY_SEARCH1, TICKET_PARTY_SEARCH2, AR_BATCH_SEARCH,
+    WIRE_BATCH_SEARCH, TRANS_CHECK_SEARCH1, TRANS_CHECK_SEARCH2)
+from category_gl import gl_type
+from stBankGL import clean_and_prepare_gl_bank_data, rename_bank_trn_type, create_bank_comparison_keys
+from stSynthData import generate_dataset
+
+GL_INPUT_COLUMNS = [GL_TRANSACTION_NUMBER_COL, JOURNAL_COL, DESCRIPTION_COL, BATCHNAME_COL, PARTYNAME_COL]
+
+
+def original_gl_type(gl: pd.DataFrame, bank: pd.DataFrame) -> pd.Series:
+    """The column-per-rule chain gl_type replaced, kept as the oracle for its result."""
+    trn_no = gl[GL_TRANSACTION_NUMBER_COL]
+    journal, description = gl[JOURNAL_COL], gl[DESCRIPTION_COL]
+    batch, party = gl[BATCHNAME_COL], gl[PARTYNAME_COL]
+
+    comparison_map = dict(zip(bank[BANK_COMPARISON_KEY_COL], bank[BANK_TRN_TYPE_COL]))
+    bank_based = trn_no.map(comparison_map).fillna('NoCategory')
+    no_category = bank_based == 'NoCategory'
+
+    is_check = np.where(
+        no_category & (trn_no.str.len() <= 9) &
+        (trn_no.str.startswith(TRANS_CHECK_SEARCH1) | trn_no.str.startswith(TRANS_CHECK_SEARCH2)),
+        BANK_CATEGORY_LIST[3], '')
+    is_ach = np.where(no_category & trn_no.str.startswith(ACH_TRANSNO_SEARCH), BANK_CATEGORY_LIST[6], '')
+    zba = journal.str.contains(ZBA_JOURNAL_SEARCH, case=False, na=False)
+    interest = description.str.contains(INTEREST_DESC_SEARCH, case=False, na=False)
+    is_zba_interest = np.where(no_category & zba & interest, BANK_CATEGORY_LIST[5],
+                               np.where(zba & ~interest, BANK_CATEGORY_LIST[15], ''))
+
+    def categorize_transaction(text):
+        text_lower = str(text).lower()
+        for keyword, category in [(PAYROLL_JOURNAL_SEARCH, 8), (AUTODEBIT_JOURNAL_SEARCH, 1),
+                                  (EFTPS_JOURNAL_SEARCH, 4), (VIBEE_JOURNAL_SEARCH, 13),
+                                  (STRIPE_JOURNAL_SEARCH, 11), (BRINKS_JOURNAL_SEARCH, 2)]:
+            if keyword in text_lower:
+                return BANK_CATEGORY_LIST[category]
+        return ''
+    is_journal_keyword = journal.apply(categorize_transaction)
+
+    is_square = np.where(
+        no_category & (journal.str.contains(SQUARE_DESC_JOURNAL_SEARCH, case=False, na=False) |
+                       description.str.contains(SQUARE_DESC_JOURNAL_SEARCH, case=False, na=False)),
+        BANK_CATEGORY_LIST[10], '')
+    is_ticketing = np.where(
+        no_category & party.str.contains(TICKET_PARTY_SEARCH1, case=False, na=False) |
+        party.str.contains(TICKET_PARTY_SEARCH2, case=False, na=False),
+        BANK_CATEGORY_LIST[12], '')
+    is_ar = np.where(no_category & batch.str.contains('|'.join(AR_BATCH_SEARCH), case=False, na=False),
+                     BANK_CATEGORY_LIST[0], '')
+    is_wire = np.where(no_category & batch.str.contains('|'.join(WIRE_BATCH_SEARCH), case=False, na=False),
+                       BANK_CATEGORY_LIST[14], '')
+
+    result = np.full(len(gl), 'NoCategory', dtype=object)
+    # Lowest priority first, so each higher priority column overwrites it
+    for column in [is_ar, is_wire, is_ticketing, is_square, is_journal_keyword, is_zba_interest, is_ach, is_check]:
+        column = np.asarray(column, dtype=object)
+        result = np.where(column != '', column, result)
+    result = np.where(~no_category, bank_based, result)
+    return pd.Series(result, index=gl.index, name=GL_TYPE_COL)
+
+
+def as_object(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns with NaN for missing text, as the original chain got them from pd.read_excel."""
+    return df.astype(object).where(df.notna(), np.nan)
+
+
+def prepared_inputs(seed: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    gl, bank, _ = generate_dataset(3000, seed=seed)
+    gl, bank = clean_and_prepare_gl_bank_data(gl, bank)
+    bank = rename_bank_trn_type(bank, alias_file=None)
+    bank[BANK_COMPARISON_KEY_COL] = create_bank_comparison_keys(bank)
+    return gl, bank
+
+
+# Transaction number, Journal, Description, Batch, Party
+EDGE_ROWS = [
+    ('111200001', None, None, None, None),          # check: 9 characters
+    ('1112000001', None, None, None, None),         # too long for a check
+    ('340123', None, None, None, None),
+    ('640123', None, None, None, None),             # ACH
+    ('6401234567890', 'Payroll', None, None, None),  # ACH wins over payroll
+    (None, 'ZBA Sweep', 'Monthly interest', None, None),
+    (None, 'zba sweep', 'Transfer', None, None),
+    (None, 'ZBA Payroll', None, None, None),        # ZBA wins over payroll
+    (None, 'Payroll Autodebit', None, None, None),  # payroll wins over autodebit
+    (None, 'Autodebit EFTPS', None, None, None),
+    (None, 'EFTPS', None, None, None),
+    (None, 'VIBEE Stripe', None, None, None),
+    (None, 'Stripe', None, None, None),
+    (None, 'Table Sales', None, None, None),
+    (None, 'Stripe', 'Square deposit', None, None),  # journal keywords win over square
+    (None, None, 'SQUARE deposit', None, None),
+    (None, 'Square', None, 'Receivables', None),
+    (None, None, None, 'Wire Payables', 'Front Gate Tickets'),  # ticketing wins over wire
+    (None, None, None, 'Receivables', 'Vivendi'),
+    (None, None, None, 'Wire Receivables', None),   # wire wins over AR
+    (None, None, None, 'ON ACCOUNT', None),
+    (None, None, None, 'Cash receipts', None),
+    (None, None, None, 'Misc', 'Someone'),          # no rule holds
+    (None, None, None, None, None),
+]
+
+
+@pytest.mark.parametrize('dedupe_inputs', [True, False])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_gl_type_equals_original_on_generated_data(seed, dedupe_inputs):
+    gl, bank = prepared_inputs(seed)
+    expected = original_gl_type(as_object(gl), as_object(bank))
+    result = gl_type(gl.copy(), bank, dedupe_inputs=dedupe_inputs)
+    pd.testing.assert_series_equal(result[GL_TYPE_COL].astype(object), expected)
+
+
+@pytest.mark.parametrize('dedupe_inputs', [True, False])
+def test_gl_type_equals_original_on_edge_rows(dedupe_inputs):
+    _, bank = prepared_inputs(2)
+    edges = pd.DataFrame(EDGE_ROWS, columns=GL_INPUT_COLUMNS)
+    # The same rows again with a transaction number the bank statement knows
+    bank_known = edges.copy()
+    bank_known[GL_TRANSACTION_NUMBER_COL] = bank[BANK_COMPARISON_KEY_COL].iloc[:len(edges)].to_numpy()
+    gl = pd.concat([edges, edges, bank_known], ignore_index=True).astype('string')
+    expected = original_gl_type(as_object(gl), as_object(bank))
+    result = gl_type(gl.copy(), bank, dedupe_inputs=dedupe_inputs)
+    pd.testing.assert_series_equal(result[GL_TYPE_COL].astype(object), expected)
+    assert (expected.iloc[len(edges) * 2:].to_numpy()
+            == bank[BANK_TRN_TYPE_COL].iloc[:len(edges)].astype(object).to_numpy()).all()
+    assert expected.iloc[:len(edges)].tolist() == [
+        BANK_CATEGORY_LIST[3], 'NoCategory', BANK_CATEGORY_LIST[3], BANK_CATEGORY_LIST[6],
+        BANK_CATEGORY_LIST[6], BANK_CATEGORY_LIST[5], BANK_CATEGORY_LIST[15], BANK_CATEGORY_LIST[15],
+        BANK_CATEGORY_LIST[8], BANK_CATEGORY_LIST[1], BANK_CATEGORY_LIST[4], BANK_CATEGORY_LIST[13],
+        BANK_CATEGORY_LIST[11], BANK_CATEGORY_LIST[2], BANK_CATEGORY_LIST[11], BANK_CATEGORY_LIST[10],
+        BANK_CATEGORY_LIST[10], BANK_CATEGORY_LIST[12], BANK_CATEGORY_LIST[12], BANK_CATEGORY_LIST[14],
+        BANK_CATEGORY_LIST[0], BANK_CATEGORY_LIST[0], 'NoCategory', 'NoCategory',
+    ]
@@ -0,0 +1,13 @@
+import pytest
+
+from stIncremental import check_incremental_equivalence
+
+
+@pytest.mark.parametrize('money_in_cents', [True, False], ids=['cents', 'dollars'])
+def test_daily_incremental_runs_equal_full_report(small_dataset, money_in_cents, tmp_path):
+    gl_df, bank_df, outstanding_df = small_dataset
+    result = check_incremental_equivalence(gl_df, bank_df, outstanding_df, str(tmp_path / 'state.sqlite'), days=3,
+                                           money_in_cents=money_in_cents)
+    assert len(result['runs']) == 3
+    assert result['sheets'], "no report sheets compared"
+    assert {sheet: difference for sheet, difference in result['sheets'].items() if difference is not None} == {}
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from stMoney import money_columns_to_cents, money_columns_to_dollars, cents_columns
+
+AMOUNT = 'Amount'
+
+
+def dollar_frame() -> pd.DataFrame:
+    return pd.DataFrame({'Key': ['a', 'b', 'c', 'd'], AMOUNT: [1.10, 20.0, None, -3.335]})
+
+
+def assert_not_converted_twice(frame: pd.DataFrame, expected_cents: pd.Series) -> None:
+    """Converting again must keep the cents or refuse; it must never multiply them by 100 again."""
+    try:
+        again = money_columns_to_cents(frame, [AMOUNT])
+    except ValueError:
+        return
+    pd.testing.assert_series_equal(again[AMOUNT], expected_cents, check_index=False)
+
+
+def test_converts_once():
+    cents = money_columns_to_cents(dollar_frame(), [AMOUNT])
+    assert cents[AMOUNT].tolist()[:2] == [110, 2000]
+    assert cents_columns(cents) == [AMOUNT]
+    again = money_columns_to_cents(cents, [AMOUNT])
+    pd.testing.assert_series_equal(again[AMOUNT], cents[AMOUNT])
+    # Whole-dollar integers are dollars too
+    whole = money_columns_to_cents(pd.DataFrame({AMOUNT: [1, 2]}), [AMOUNT])
+    assert whole[AMOUNT].tolist() == [100, 200]
+
+
+def test_cents_frame_through_merge_and_concat():
+    cents = money_columns_to_cents(dollar_frame(), [AMOUNT])
+    other = pd.DataFrame({'Key': ['a', 'b', 'c', 'd'], 'Party': ['p', 'q', 'r', 's']})
+    merged = pd.merge(cents, other, on='Key', how='left')
+    assert_not_converted_twice(merged, cents[AMOUNT])
+    assert_not_converted_twice(pd.concat([cents, cents.iloc[:0]], ignore_index=True), cents[AMOUNT])
+    grouped = cents.groupby('Key', as_index=False)[AMOUNT].sum(min_count=1)
+    assert_not_converted_twice(grouped, cents[AMOUNT])
+
+
+def test_cents_frame_through_parquet(tmp_path):
+    cents = money_columns_to_cents(dollar_frame(), [AMOUNT])
+    path = tmp_path / 'cents.parquet'
+    cents.to_parquet(path)
+    assert_not_converted_twice(pd.read_parquet(path), cents[AMOUNT])
+
+
+def test_lost_marker_raises():
+    cents = money_columns_to_cents(dollar_frame(), [AMOUNT])
+    cents.attrs = {}
+    with pytest.raises(ValueError, match='marker was lost'):
+        money_columns_to_cents(cents, [AMOUNT])
+
+
+def test_marked_column_replaced_by_dollars_raises():
+    cents = money_columns_to_cents(dollar_frame(), [AMOUNT])
+    cents[AMOUNT] = dollar_frame()[AMOUNT]
+    with pytest.raises(ValueError, match='marked as cents'):
+        money_columns_to_cents(cents, [AMOUNT])
+
+
+def test_back_to_dollars_clears_marker():
+    dollars = money_columns_to_dollars(money_columns_to_cents(dollar_frame(), [AMOUNT]), [AMOUNT])
+    assert cents_columns(dollars) == []
+    assert dollars[AMOUNT].tolist()[:2] == [1.10, 20.0]
+    assert money_columns_to_cents(dollars, [AMOUNT])[AMOUNT].tolist()[:2] == [110, 2000]
@@ -0,0 +1,12 @@
+import pytest
+
+from stSqlEngine import check_sqlite_equivalence
+
+
+@pytest.mark.parametrize('money_in_cents', [True, False], ids=['cents', 'dollars'])
+def test_sqlite_report_equals_pandas_report(small_dataset, money_in_cents, tmp_path):
+    gl_df, bank_df, outstanding_df = small_dataset
+    differences = check_sqlite_equivalence(gl_df, bank_df, outstanding_df, db_path=str(tmp_path / 'result.sqlite'),
+                                           money_in_cents=money_in_cents)
+    assert differences, "no report sheets compared"
+    assert {sheet: difference for sheet, difference in differences.items() if difference is not None} == {}
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from config import BANK_TRN_TYPE_COL
+
+import reconciliation_core
+import stBankGL
+from reconciliation_core import categorize_gl_with_bank, run_full_reconciliation
+from stPipeline import run_cached_stage, clear_stage_cache
+
+
+def test_cached_frames_are_not_shared_with_callers():
+    clear_stage_cache()
+    frame = pd.DataFrame({'a': [1, 2, 3]})
+    first, key = run_cached_stage('test_stage', lambda: (frame, [frame]), ['input'])
+    first[0]['added'] = 0
+    first[1][0].drop(columns='a', inplace=True)
+
+    second, second_key = run_cached_stage('test_stage', lambda: None, ['input'])
+    assert second_key == key
+    assert list(second[0].columns) == ['a'] and list(second[1][0].columns) == ['a']
+    assert second[0] is not first[0]
+    clear_stage_cache()
+
+
+def test_alias_change_invalidates_the_clean_stage(small_dataset, monkeypatch):
+    gl, bank, ost = small_dataset
+    categorized = categorize_gl_with_bank(gl, bank)
+    aliases = {}
+    # The alias file is read both for the stage key and by rename_bank_trn_type itself
+    monkeypatch.setattr(reconciliation_core, 'load_trn_type_aliases', lambda *args: dict(aliases))
+    monkeypatch.setattr(stBankGL, 'load_trn_type_aliases', lambda *args: dict(aliases))
+
+    def clean_cache_status() -> str:
+        stats = {}
+        assert run_full_reconciliation(categorized, bank, ost, stats=stats, use_stage_cache=True) is not None
+        return stats['stage_cache']['clean']
+
+    clear_stage_cache()
+    assert clean_cache_status() == 'miss'
+    assert clean_cache_status() == 'hit'
+    aliases[bank[BANK_TRN_TYPE_COL].dropna().iloc[0]] = 'Wires'
+    assert clean_cache_status() == 'miss'
+    assert clean_cache_status() == 'hit'
+    clear_stage_cache()